@@ -1,17 +1,206 @@
-import gradio as gr
 import uuid
-from src.graph import app as graph_app
-from src.config.logger import get_logger
+from src.utils.scheduler import get_scheduler
+from src.utils.model_cascade import TierStats
+from src.utils.cancellation import RunCancelled, cancel_run, run_scope
+from src.config.logger import get_logger, setup_logging
+from src.config import load_env
 import os
 
 logger = get_logger("App")
 
-def process_chat(user_input, history, json_data, thread_id, is_initial):
+def _get_graph():
+    """Imports the compiled graph on first use (agents are built lazily by the graph itself)."""
+    from src.graph import app as graph_app
+    return graph_app
+
+def _blueprint_preview(blueprint):
+    """Approximate mesh of the blueprint for the 3D view (no Blender, no LLM); None on failure."""
+    from src.utils.sdf_preview import preview_blueprint
+    try:
+        return preview_blueprint(blueprint)
+    except Exception as e:
+        logger.warning(f"Blueprint preview failed: {e}")
+        return None
+
+def _parameter_rows(code):
+    """Rows for the Parameters table: the script's top-level numeric assignments."""
+    from src.utils.parametric import extract_parameters, format_value
+    return [[p["name"], format_value(p["value"])] for p in extract_parameters(code or "")]
+
+def _design_request(vals, change):
+    """Text describing the design once `change` is applied: the running request, plus `change` unless it only approves."""
+    from src.agents.supervisor import is_plain_approval
+    request = vals.get("design_request") or ""
+    if not request or is_plain_approval(change):
+        return request
+    return f"{request}\n{change}"
+
+def _apply_parameters(thread_id, values, change):
+    """
+    Writes new parameter values into the current script and re-executes it in a
+    warm Blender worker, without any agent or LLM call. On success the graph
+    state is updated as if the Tester had passed the new model; `change` is the
+    text of the edit, recorded in the design request.
+    Returns (message, stl_path, code, test_report).
+    """
+    import time
+    from src.graph import get_agent
+    from src.utils.parametric import apply_parameters, extract_parameters, format_value
+    from src.utils.quality_gate import QualityGate
+
+    t0 = time.perf_counter()
+    config = {"configurable": {"thread_id": thread_id}}
+    graph_app = _get_graph()
+    vals = graph_app.get_state(config).values
+    code = vals.get("bpy_code", "")
+    current = {p["name"]: p["value"] for p in extract_parameters(code)}
+    new_code = apply_parameters(code, values)
+
+    # code_origin is dropped so the re-run does not count towards the model tier statistics
+    result = get_agent("validator").run({**vals, "bpy_code": new_code, "code_origin": {}}, warm=True)
+    if result.get("errors"):
+        msg = "❌ **Parameter Update Failed**\n\nThe previous model is kept. Issues:\n" + "\n".join(f"- {e}" for e in result["errors"])
+        return msg, vals.get("stl_path"), code, vals.get("test_report", "")
+
+    test_report = QualityGate.render_report(QualityGate().evaluate(result["mesh_metrics"], result["mesh_issues"]))
+    graph_app.update_state(config, {
+        "bpy_code": new_code,
+        "stl_path": result["stl_path"],
+        "mesh_issues": result["mesh_issues"],
+        "mesh_metrics": result["mesh_metrics"],
+        "profile_report": result.get("profile_report", ""),
+        "test_report": test_report,
+        "errors": [],
+        "design_request": _design_request(vals, change),
+        **RETRY_RESET,
+    }, as_node="tester")
+    changes = ", ".join(f"`{name}` {format_value(current[name])} → {format_value(value)}" for name, value in values.items())
+    elapsed = time.perf_counter() - t0
+    logger.info(f"Parametric re-run finished in {elapsed:.2f}s: {values}")
+    msg = f"✅ **Model Updated** in {elapsed:.1f}s (parameters only, no agent cycle)\n\n{changes}"
+    return msg, result["stl_path"], new_code, test_report
+
+# Browser session (Gradio session_hash) -> thread_id, so closing the tab can cancel its runs
+_browser_sessions = {}
+
+def _sweep_run_id(thread_id):
+    return f"{thread_id}:sweep"
+
+def cancel_session(thread_id, reason):
+    """Cancels the in-flight chat turn and sweep of a session (LLM requests, Blender processes)."""
+    cancel_run(thread_id, reason)
+    cancel_run(_sweep_run_id(thread_id), reason)
+
+def _stopped_message(e):
+    return f"⏹️ **Run stopped:** {e.reason}."
+
+# Each user turn gets a fresh self-correction budget
+RETRY_RESET = {"retry_count": 0, "retry_history": [], "retry_strategy": "retry"}
+
+def process_chat(user_input, history, json_data, thread_id, is_initial, image_path=None):
     """
     Main handler for the Chat UI.
+    All LLM and Blender work of the turn is scheduled under this session's thread_id,
+    and is cancelled when the session sends a new message or closes the tab.
+    """
+    scheduler = get_scheduler()
+    with run_scope(thread_id), scheduler.session(thread_id):
+        outputs = _process_turn(user_input, history, json_data, thread_id, is_initial, image_path)
+    logger.info(f"Scheduler metrics: {scheduler.metrics()}")
+    logger.info(f"Model tier stats: {TierStats.summary()}")
+    rows = _parameter_rows(outputs[5])
+    if rows and outputs[3]:
+        # A built model with parameters: start a warm worker for the tweaks that usually follow
+        from src.utils.blender_ops import get_warm_pool
+        get_warm_pool().prewarm()
+    return (*outputs, rows)
+
+def apply_parameter_table(rows, history, thread_id):
+    """
+    Handler of the Parameters tab: re-runs the current script with the edited values.
+    """
+    from src.utils.parametric import extract_parameters, format_value, parse_value
+
+    history = history or []
+    config = {"configurable": {"thread_id": thread_id}}
+    vals = _get_graph().get_state(config).values
+    code = vals.get("bpy_code", "")
+    unchanged = (vals.get("stl_path"), vals.get("stl_path"), code, vals.get("test_report", ""))
+    current = {p["name"]: p["value"] for p in extract_parameters(code)}
+    if not current or not vals.get("stl_path"):
+        history.append(("Apply parameters", "There is no built model with parameters yet."))
+        return history, *unchanged, _parameter_rows(code)
+
+    values = {}
+    try:
+        for name, text in rows or []:
+            name = str(name).strip()
+            if not name:
+                continue
+            if name not in current:
+                raise ValueError(f"'{name}' is not a parameter of the current script")
+            value = parse_value(text)
+            if value != current[name]:
+                values[name] = value
+    except ValueError as e:
+        history.append(("Apply parameters", f"❌ {e}"))
+        return history, *unchanged, _parameter_rows(code)
+
+    if not values:
+        history.append(("Apply parameters", "No parameter was changed."))
+        return history, *unchanged, _parameter_rows(code)
+
+    request = ", ".join(f"{name} = {format_value(value)}" for name, value in values.items())
+    scheduler = get_scheduler()
+    try:
+        with run_scope(thread_id), scheduler.session(thread_id):
+            msg, stl, new_code, test_report = _apply_parameters(thread_id, values, request)
+    except RunCancelled as e:
+        history.append((f"Apply parameters: {request}", _stopped_message(e)))
+        return history, *unchanged, _parameter_rows(code)
+    history.append((f"Apply parameters: {request}", msg))
+    return history, stl, stl, new_code, test_report, _parameter_rows(new_code)
+
+def run_parameter_sweep(grid_text, thread_id):
+    """
+    Sweep section of the Parameters tab: builds every combination of the grid
+    from the current script in batched Blender processes, at batch priority.
+    Returns (status, results table, CSV path).
+    """
+    import time
+    from src.utils.sweep import parse_grid, run_sweep, write_csv
+
+    config = {"configurable": {"thread_id": thread_id}}
+    vals = _get_graph().get_state(config).values
+    code = vals.get("bpy_code", "")
+    if not code or not vals.get("stl_path"):
+        return "There is no built model to sweep yet.", None, None
+    try:
+        grid = parse_grid(grid_text or "")
+        if not grid:
+            return "Enter one parameter per line, e.g. `seat_height = 0.4, 0.45, 0.5` or `wall = 1:3:0.5`.", None, None
+        out_dir = os.path.join(os.getcwd(), "outputs", f"sweep_{thread_id[:8]}_{time.strftime('%Y%m%d_%H%M%S')}")
+        t0 = time.perf_counter()
+        with run_scope(_sweep_run_id(thread_id)):
+            rows = run_sweep(code, grid, out_dir, vals.get("json_blueprint") or {}, session=thread_id)
+    except (KeyError, ValueError) as e:
+        return f"❌ {e.args[0] if e.args else e}", None, None
+    except RunCancelled as e:
+        return f"⏹️ Sweep stopped: {e.reason}.", None, None
+    elapsed = time.perf_counter() - t0
+    csv_path = write_csv(rows, os.path.join(out_dir, "results.csv"))
+    ok = sum(1 for r in rows if r["success"])
+    status = f"✅ {ok}/{len(rows)} variants built in {elapsed:.1f}s ({60 * len(rows) / max(elapsed, 1e-9):.0f} variants/min)."
+    headers = list(rows[0]) if rows else []
+    return status, {"headers": headers, "data": [[r.get(h) for h in headers] for r in rows]}, csv_path
+
+def _process_turn(user_input, history, json_data, thread_id, is_initial, image_path=None):
+    """
+    Runs one chat turn through the graph.
     """
     logger.info(f"Chat Triggered: is_initial={is_initial}, thread_id={thread_id}")
     config = {"configurable": {"thread_id": thread_id}}
+    graph_app = _get_graph()
     
     # Append user message to history immediately for UI feedback
     if history is None:
@@ -21,12 +210,23 @@ def process_chat(user_input, history, json_data, thread_id, is_initial):
     # 1. INITIAL PHASE: User provides description -> Analyst -> Blueprint
     if is_initial:
         logger.info(f"Starting initial analysis with: {user_input[:50]}...")
-        inputs = {"input_data": user_input, "messages": []}
+        if image_path:
+            # Image requests: the Analyst receives the (preprocessed) photo, the text describes it
+            logger.info(f"Reference image provided: {image_path}")
+            inputs = {"input_data": image_path, "input_description": user_input, "design_request": "", "messages": [], **RETRY_RESET}
+        else:
+            inputs = {"input_data": user_input, "design_request": user_input, "messages": [], **RETRY_RESET}
         
         try:
             # Run graph until interrupt (after Analyst)
             for event in graph_app.stream(inputs, config=config):
                 pass
+        except RunCancelled as e:
+            logger.info(f"Analysis stopped: {e.reason}")
+            history[-1] = (user_input, _stopped_message(e))
+            # The checkpoint still holds the last good build, keep showing it
+            vals = graph_app.get_state(config).values
+            return history, vals.get("json_blueprint", {}), vals.get("stl_path"), vals.get("stl_path"), True, vals.get("bpy_code", ""), vals.get("test_report", "")
         except Exception as e:
             err_msg = f"Error during analysis: {str(e)}"
             logger.error(err_msg, exc_info=True)
@@ -41,13 +241,16 @@ def process_chat(user_input, history, json_data, thread_id, is_initial):
         code = vals.get("bpy_code", "")
         test_report = vals.get("test_report", "")
         
+        preview = _blueprint_preview(blueprint)
         bot_msg = "I've analyzed your request. Please review the **Blueprint** on the right.\n\nIf it looks good, type **'Proceed'** or **'Build'**. If you want changes, just tell me (e.g., 'Make it taller')."
+        if preview:
+            bot_msg += "\n\nThe **3D Preview** shows a quick approximation of the plan."
         history[-1] = (user_input, bot_msg)
         
         return (
             history,            # Updated Chat
             blueprint,          # JSON Output
-            None,               # 3D Model (None)
+            preview,            # 3D Model (blueprint preview)
             None,               # Download (None)
             False,              # is_initial -> False
             code,               # BPY Code
@@ -58,16 +261,36 @@ def process_chat(user_input, history, json_data, thread_id, is_initial):
     else:
         logger.info(f"Resuming with feedback: {user_input[:50]}...")
         snapshot = graph_app.get_state(config)
+
+        # Purely numeric tweaks of a built model ("make it 20% taller") skip the agents entirely
+        vals = snapshot.values
+        if vals.get("stl_path") and vals.get("bpy_code") and not vals.get("errors"):
+            from src.utils.parametric import extract_parameters, parse_numeric_feedback
+            values = parse_numeric_feedback(user_input, extract_parameters(vals["bpy_code"]))
+            if values:
+                logger.info(f"Numeric feedback recognized, re-running with {values} (no agent cycle).")
+                try:
+                    msg, stl, code, test_report = _apply_parameters(thread_id, values, user_input)
+                except RunCancelled as e:
+                    history[-1] = (user_input, _stopped_message(e))
+                    return history, vals.get("json_blueprint", {}), vals.get("stl_path"), vals.get("stl_path"), False, vals["bpy_code"], vals.get("test_report", "")
+                history[-1] = (user_input, msg)
+                return history, vals.get("json_blueprint", {}), stl, stl, False, code, test_report
         
+        design_request = _design_request(vals, user_input)
+
         # Decide if we are RESUMING or STARTING A NEW RUN
         if not snapshot.next:
             # Graph already completed, start fresh from supervisor with feedback
             logger.info("Graph at END. Starting new run from entry point.")
-            stream_input = {"feedback": user_input}
+            stream_input = {"feedback": user_input, "design_request": design_request, **RETRY_RESET}
         else:
             # Graph is interrupted (at Analyst or Tester)
             logger.info(f"Graph is interrupted at {snapshot.next}. Resuming.")
-            graph_app.update_state(config, {"json_blueprint": json_data, "feedback": user_input})
+            if json_data and json_data != vals.get("json_blueprint"):
+                # A blueprint edited by hand is no longer described by any text, so it is not indexed
+                design_request = ""
+            graph_app.update_state(config, {"json_blueprint": json_data, "feedback": user_input, "design_request": design_request, **RETRY_RESET})
             stream_input = None
 
         # Execute
@@ -75,6 +298,11 @@ def process_chat(user_input, history, json_data, thread_id, is_initial):
             for event in graph_app.stream(stream_input, config=config):
                 # We could stream partial status updates to chat here if we wanted
                 pass
+        except RunCancelled as e:
+            logger.info(f"Generation stopped: {e.reason}")
+            history[-1] = (user_input, _stopped_message(e))
+            vals = graph_app.get_state(config).values
+            return history, json_data, vals.get("stl_path"), vals.get("stl_path"), False, vals.get("bpy_code", ""), vals.get("test_report", "")
         except Exception as e:
             err_msg = f"Error during generation: {str(e)}"
             logger.error(err_msg, exc_info=True)
@@ -105,84 +333,162 @@ def process_chat(user_input, history, json_data, thread_id, is_initial):
             # If the graph is interrupted (meaning we are waiting for user review)
             next_nodes = list(snapshot.next) if snapshot.next else []
             
+            preview = None
             if "tester" in next_nodes:
                  bot_msg = "✅ **3D Model Ready!**\n\nI've generated the first version. Review the **Quality Report** and **3D Preview**. \n\nIf you want changes, type them here. Otherwise, we're done!"
             elif "supervisor" in next_nodes or "analyst" in next_nodes:
+                 preview = _blueprint_preview(vals.get("json_blueprint", {}))
                  bot_msg = "I've updated the plan. Review the **Blueprint** and type **'Build'** if it's ready."
             else:
                  bot_msg = "Processing complete. Check the tabs for results."
             
             history[-1] = (user_input, bot_msg)
-            return history, vals.get("json_blueprint", {}), None, None, False, final_code, test_report
+            return history, vals.get("json_blueprint", {}), preview, None, False, final_code, test_report
 
 
-with gr.Blocks(title="3D Designer Agent", theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate")) as demo:
-    gr.Markdown("# 🛠️ Autonomous 3D Designer Agent")
+def build_ui():
+    """Builds the Gradio interface; gradio is only imported when the UI is actually needed."""
+    import gradio as gr
+
+    with gr.Blocks(title="3D Designer Agent", theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate")) as demo:
+        gr.Markdown("# 🛠️ Autonomous 3D Designer Agent")
     
-    # Session State
-    thread_state = gr.State(lambda: str(uuid.uuid4()))
-    is_initial_state = gr.State(True)
-
-    with gr.Row(equal_height=True):
-        # LEFT COLUMN: Chat Interface
-        with gr.Column(scale=1):
-            chatbot = gr.Chatbot(
-                label="Designer Assistant", 
-                height=600,
-                avatar_images=(None, "https://api.dicebear.com/7.x/bottts/svg?seed=3dagent"),
-                bubble_full_width=False
-            )
-            with gr.Row():
-                msg_input = gr.Textbox(
-                    show_label=False, 
-                    placeholder="Describe a 3D object (e.g. 'A simple coffee mug')...",
-                    scale=4,
-                    container=False
+        # Session State
+        thread_state = gr.State(lambda: str(uuid.uuid4()))
+        is_initial_state = gr.State(True)
+
+        with gr.Row(equal_height=True):
+            # LEFT COLUMN: Chat Interface
+            with gr.Column(scale=1):
+                chatbot = gr.Chatbot(
+                    label="Designer Assistant", 
+                    height=600,
+                    avatar_images=(None, "https://api.dicebear.com/7.x/bottts/svg?seed=3dagent"),
+                    bubble_full_width=False
                 )
-                submit_btn = gr.Button("Send", variant="primary", scale=1)
-            
-            gr.Examples(
-                examples=["A futuristic chair with 3 legs", "A simple red cube", "A chess pawn"],
-                inputs=msg_input
-            )
-
-        # RIGHT COLUMN: Inspector (Blueprint & 3D View)
-        with gr.Column(scale=1):
-            with gr.Tabs():
-                with gr.TabItem("3D Preview"):
-                    model_output = gr.Model3D(
-                        label="Model Preview", 
-                        clear_color=[0.1, 0.1, 0.1, 1.0], 
-                        interactive=True,
-                        height=400
+                with gr.Row():
+                    msg_input = gr.Textbox(
+                        show_label=False, 
+                        placeholder="Describe a 3D object (e.g. 'A simple coffee mug')...",
+                        scale=4,
+                        container=False
                     )
-                    download_output = gr.File(label="Download Generated STL")
+                    submit_btn = gr.Button("Send", variant="primary", scale=1)
+                image_input = gr.Image(label="Reference Image (optional)", type="filepath", height=150)
+            
+                gr.Examples(
+                    examples=["A futuristic chair with 3 legs", "A simple red cube", "A chess pawn"],
+                    inputs=msg_input
+                )
+
+            # RIGHT COLUMN: Inspector (Blueprint & 3D View)
+            with gr.Column(scale=1):
+                with gr.Tabs():
+                    with gr.TabItem("3D Preview"):
+                        model_output = gr.Model3D(
+                            label="Model Preview", 
+                            clear_color=[0.1, 0.1, 0.1, 1.0], 
+                            interactive=True,
+                            height=400
+                        )
+                        download_output = gr.File(label="Download Generated STL")
                 
-                with gr.TabItem("Blueprint (JSON)"):
-                    json_output = gr.JSON(label="Reverse Engineering Plan", height=400)
+                    with gr.TabItem("Blueprint (JSON)"):
+                        json_output = gr.JSON(label="Reverse Engineering Plan", height=400)
                     
-                with gr.TabItem("Generated Code"):
-                    code_output = gr.Code(label="BPY Script", language="python", lines=20)
+                    with gr.TabItem("Generated Code"):
+                        code_output = gr.Code(label="BPY Script", language="python", lines=20)
                 
-                with gr.TabItem("Quality Report"):
-                    test_output = gr.Markdown(label="Technical Analysis")
+                    with gr.TabItem("Quality Report"):
+                        test_output = gr.Markdown(label="Technical Analysis")
+
+                    with gr.TabItem("Parameters"):
+                        params_output = gr.Dataframe(
+                            label="Script Parameters (edit values, then apply)",
+                            headers=["Parameter", "Value"],
+                            datatype=["str", "str"],
+                            col_count=(2, "fixed"),
+                            type="array",
+                            interactive=True
+                        )
+                        apply_btn = gr.Button("Apply Parameters", variant="secondary")
+                        with gr.Accordion("Design Sweep", open=False):
+                            sweep_input = gr.Textbox(
+                                label="Parameter Grid",
+                                placeholder="seat_height = 0.4, 0.45, 0.5\nleg_count = 3:5:1",
+                                lines=3
+                            )
+                            sweep_btn = gr.Button("Run Sweep", variant="secondary")
+                            sweep_status = gr.Markdown()
+                            sweep_output = gr.Dataframe(label="Variants", interactive=False)
+                            sweep_file = gr.File(label="Download Results (CSV)")
                     
-    # Event Handlers
-    submit_btn.click(
-        process_chat,
-        inputs=[msg_input, chatbot, json_output, thread_state, is_initial_state],
-        outputs=[chatbot, json_output, model_output, download_output, is_initial_state, code_output, test_output]
-    ).then(
-        lambda: "", None, msg_input # Clear input box
-    )
+        # Event Handlers
+        submit_btn.click(
+            process_chat,
+            inputs=[msg_input, chatbot, json_output, thread_state, is_initial_state, image_input],
+            outputs=[chatbot, json_output, model_output, download_output, is_initial_state, code_output, test_output, params_output],
+            concurrency_limit=None  # Sessions run concurrently; the resource scheduler arbitrates LLM/Blender capacity
+        ).then(
+            lambda: "", None, msg_input # Clear input box
+        )
     
-    msg_input.submit(
-        process_chat,
-        inputs=[msg_input, chatbot, json_output, thread_state, is_initial_state],
-        outputs=[chatbot, json_output, model_output, download_output, is_initial_state, code_output, test_output]
-    ).then(
-        lambda: "", None, msg_input
-    )
+        msg_input.submit(
+            process_chat,
+            inputs=[msg_input, chatbot, json_output, thread_state, is_initial_state, image_input],
+            outputs=[chatbot, json_output, model_output, download_output, is_initial_state, code_output, test_output, params_output],
+            concurrency_limit=None  # Sessions run concurrently; the resource scheduler arbitrates LLM/Blender capacity
+        ).then(
+            lambda: "", None, msg_input
+        )
+
+        apply_btn.click(
+            apply_parameter_table,
+            inputs=[params_output, chatbot, thread_state],
+            outputs=[chatbot, model_output, download_output, code_output, test_output, params_output],
+            concurrency_limit=None
+        )
+
+        # Closing the tab cancels the session's in-flight LLM requests and Blender processes
+        def bind_browser_session(thread_id, request: gr.Request):
+            _browser_sessions[request.session_hash] = thread_id
+
+        def close_browser_session(request: gr.Request):
+            thread_id = _browser_sessions.pop(request.session_hash, None)
+            if thread_id:
+                cancel_session(thread_id, "browser tab closed")
+
+        demo.load(bind_browser_session, inputs=[thread_state])
+        demo.unload(close_browser_session)
+
+        sweep_btn.click(
+            run_parameter_sweep,
+            inputs=[sweep_input, thread_state],
+            outputs=[sweep_status, sweep_output, sweep_file],
+            concurrency_limit=None  # Sweep batches queue for Blender slots at batch priority
+        )
+
+    return demo
+
+_demo = None
+
+def _get_demo():
+    """The app's UI, built (with environment and logging set up) on first use."""
+    global _demo
+    if _demo is None:
+        load_env()
+        setup_logging()
+        _demo = build_ui()
+    return _demo
+
+def __getattr__(name):
+    # `app.demo` is built lazily, so `gradio app.py` (reload mode) finds it while plain imports stay cheap
+    if name == "demo":
+        return _get_demo()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def main():
+    _get_demo().launch()
 
 if __name__ == "__main__":
-    demo.launch()
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold-start import benchmark.
+
+Each module is imported in a fresh interpreter (so nothing is cached in
+`sys.modules`), repeated a few times; the median wall time is reported
+together with any side effects the import must not have: log output, new
+files under logs/, and eagerly loaded heavy packages.
+
+    python benchmarks/import_time.py [--runs 5] [module ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["app", "src.graph"]
+HEAVY_MODULES = ["gradio", "langchain_openai", "openai", "dotenv"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _log_files():
+    logs_dir = os.path.join(ROOT, "logs")
+    return set(os.listdir(logs_dir)) if os.path.isdir(logs_dir) else set()
+
+
+def measure(module: str, runs: int) -> dict:
+    times, loaded, noisy, created = [], set(), False, set()
+    for _ in range(runs):
+        before = _log_files()
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+        *output, last = proc.stdout.strip().splitlines()
+        probe = json.loads(last)
+        times.append(probe["seconds"])
+        loaded.update(probe["loaded"])
+        noisy = noisy or bool(output) or bool(proc.stderr.strip())
+        created |= _log_files() - before
+    return {
+        "module": module,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "heavy_loaded": sorted(loaded),
+        "log_output": noisy,
+        "log_files_created": sorted(created),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = [measure(m, args.runs) for m in args.modules]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'module':<12} {'median':>9} {'min':>9}  side effects")
+    for r in results:
+        effects = []
+        if r["heavy_loaded"]:
+            effects.append("loads " + ", ".join(r["heavy_loaded"]))
+        if r["log_output"]:
+            effects.append("writes log output")
+        if r["log_files_created"]:
+            effects.append(f"creates {len(r['log_files_created'])} log file(s)")
+        print(f"{r['module']:<12} {r['median_s']:>8.3f}s {r['min_s']:>8.3f}s  {'; '.join(effects) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
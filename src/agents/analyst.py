@@ -1,19 +1,21 @@
 import json
+import os
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
 from src.state import GraphState
-from src.config import config
+from src.utils.model_cascade import ModelCascade, CascadeParseError
+from src.utils.design_index import get_design_index, REUSE_THRESHOLD, ADAPT_THRESHOLD
+from src.utils.image_prep import get_image_preprocessor, is_image_path
+from src.utils.blueprint import optimize_blueprint, primitive_nodes
 from src.config.logger import get_logger
 
 logger = get_logger("Analyst")
 
 class AnalystAgent:
     def __init__(self, model_name=None):
-        # Use LiteLLM configuration
-        llm_config = config.get_openai_config()
-        if model_name:
-            llm_config["model"] = model_name
-        self.llm = ChatOpenAI(**llm_config)
+        # Use LiteLLM configuration (per-agent model tiers)
+        self.llm = ModelCascade("analyst", model_name)
+        # Local pruning/merging of the blueprint before code generation (BLUEPRINT_OPTIMIZE=0 disables)
+        self.optimize = os.getenv("BLUEPRINT_OPTIMIZE", "1").lower() not in ("0", "false", "no")
         self.system_prompt = """You are the **Visual Decomposition Specialist**. Your role is to perform 3D reverse engineering on 2D inputs.
 **Task:**
 1. **Analyze**: First, describe the object's structure in natural language. Think about how to break it down into simple shapes.
@@ -27,7 +29,8 @@ You must output a JSON object with two keys:
 **Blueprint Schema:**
 *   **primitive_type**: Must be a standard Blender primitive.
 *   **dimensions**: Precise scale factors.
-*   **transform**: Location and Rotation.
+*   **transform**: Location and Rotation (XYZ Euler angles in degrees).
+*   **rotation_unit**: Set `"rotation_unit": "degrees"` at the top level of the blueprint.
 *   **boolean_op**: UNION or DIFFERENCE.
 
 **Operational Constraint:**
@@ -38,46 +41,84 @@ Wrap your JSON output in ```json ... ``` blocks.
         logger.info(f"Analyzing input: {state.get('input_data', 'No input')[:50]}...")
         input_data = state["input_data"]
         messages = [SystemMessage(content=self.system_prompt)]
+        is_image = is_image_path(input_data)
         
-        # Simple text handling
-        messages.append(HumanMessage(content=f"Decompose this object: {input_data}"))
+        # Reuse or adapt a previously successful design for near-duplicate requests
+        matches = [] if state.get("feedback") or is_image else get_design_index().search(input_data, k=1)
+        if matches and matches[0][0] >= REUSE_THRESHOLD:
+            score, record = matches[0]
+            logger.info(f"Reusing stored blueprint for '{record['input'][:50]}' (similarity {score:.2f}). Skipping LLM.")
+            return {
+                "json_blueprint": record["blueprint"],
+                "reasoning": f"Reused the blueprint of a previous successful design ('{record['input']}', similarity {score:.2f})."
+            }
+        if matches and matches[0][0] >= ADAPT_THRESHOLD:
+            score, record = matches[0]
+            logger.info(f"Providing similar past design as reference (similarity {score:.2f}).")
+            messages.append(HumanMessage(content=(
+                f"Reference: a previous successful design for '{record['input']}' used this blueprint. "
+                f"Adapt it if it fits, otherwise ignore it:\n{json.dumps(record['blueprint'])}"
+            )))
+
+        if is_image:
+            # Multimodal input: downscaled, metadata-free and cached by content hash
+            description = state.get("input_description") or "the object shown in this image"
+            messages.append(HumanMessage(content=[
+                {"type": "text", "text": f"Decompose this object: {description}"},
+                {"type": "image_url", "image_url": {"url": get_image_preprocessor().to_data_url(input_data), "detail": "high"}}
+            ]))
+        else:
+            # Simple text handling
+            messages.append(HumanMessage(content=f"Decompose this object: {input_data}"))
         
         if state.get("feedback"):
              logger.info(f"Incorporating user feedback: {state['feedback']}")
              messages.append(HumanMessage(content=f"User Feedback on previous iteration: {state['feedback']}"))
 
-        response = self.llm.invoke(messages)
-        
+        try:
+            (reasoning, blueprint), _ = self.llm.invoke(messages, parser=self._parse_response)
+        except CascadeParseError as e:
+            logger.error(f"Failed to parse JSON response from LLM. Raw content: {e.content[:200]}...")
+            return {"json_blueprint": {"error": "Failed to parse JSON", "raw": e.content}}
+
+        num_primitives = len(blueprint.get('primitives', [])) if isinstance(blueprint, dict) else "unknown"
+        logger.info(f"Analysis Complete. Reasoning: {reasoning[:100]}...")
+        logger.info(f"Blueprint generated with {num_primitives} primitives.")
+
+        if self.optimize and primitive_nodes(blueprint):
+            blueprint, report = optimize_blueprint(blueprint)
+            logger.info(
+                f"Blueprint optimized: {report['primitives_before']} -> {report['primitives_after']} primitives "
+                f"({report['removed_operations']} boolean operations removed: {report['removed_noops']} no-ops, "
+                f"{report['removed_contained']} contained, {report['merged']} merged; "
+                f"{report['boolean_steps_before']} -> {report['boolean_steps_after']} sequential boolean steps)."
+            )
+
+        return {"json_blueprint": blueprint, "reasoning": reasoning}
+
+    @staticmethod
+    def _parse_response(content: str):
+        """Extracts `(reasoning, blueprint)` from the LLM answer; raises on malformed JSON."""
         # Parse JSON from markdown
-        content = response.content
         if "```json" in content:
             json_str = content.split("```json")[1].split("```")[0].strip()
         elif "```" in content:
             json_str = content.split("```")[1].split("```")[0].strip()
         else:
             json_str = content
-            
-        try:
-            parsed = json.loads(json_str)
-            # Handle both new CoT format and potential legacy format
-            if "reasoning" in parsed and "blueprint" in parsed:
-                reasoning = parsed["reasoning"]
-                blueprint = parsed["blueprint"]
-            else:
-                reasoning = "No explicit reasoning provided."
-                blueprint = parsed
 
-            # Safety check for list-based blueprints
-            if isinstance(blueprint, list):
-                blueprint = {"primitives": blueprint}
-            
-            num_primitives = len(blueprint.get('primitives', [])) if isinstance(blueprint, dict) else "unknown"
-            logger.info(f"Analysis Complete. Reasoning: {reasoning[:100]}...")
-            logger.info(f"Blueprint generated with {num_primitives} primitives.")
-            
-            return {"json_blueprint": blueprint, "reasoning": reasoning, "retry_count": 0}
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse JSON response from LLM. Raw content: {content[:200]}...")
-            blueprint = {"error": "Failed to parse JSON", "raw": content}
+        parsed = json.loads(json_str)
+        # Handle both new CoT format and potential legacy format
+        if isinstance(parsed, dict) and "reasoning" in parsed and "blueprint" in parsed:
+            reasoning = parsed["reasoning"]
+            blueprint = parsed["blueprint"]
+        else:
+            reasoning = "No explicit reasoning provided."
+            blueprint = parsed
 
-        return {"json_blueprint": blueprint, "retry_count": 0}
+        # Safety check for list-based blueprints
+        if isinstance(blueprint, list):
+            blueprint = {"primitives": blueprint}
+        if not isinstance(blueprint, dict):
+            raise ValueError("Blueprint is not a JSON object")
+        return str(reasoning), blueprint
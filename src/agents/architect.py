@@ -1,40 +1,60 @@
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
 from src.state import GraphState
-from src.config import config
+from src.utils.model_cascade import ModelCascade
+from src.utils.retry_policy import RetryController
+from src.agents.supervisor import is_plain_approval
+from src.utils.design_index import get_design_index
+from src.utils.blueprint import primitive_nodes, split_assemblies, combine_keys
+from src.utils.assembly import part_blueprint
 from src.config.logger import get_logger
 import json
+import os
 
 logger = get_logger("Architect")
 
 class ArchitectAgent:
     def __init__(self, model_name=None):
-        # Use LiteLLM configuration
-        llm_config = config.get_openai_config()
-        if model_name:
-            llm_config["model"] = model_name
-        self.llm = ChatOpenAI(**llm_config)
+        # Use LiteLLM configuration (per-agent model tiers)
+        self.llm = ModelCascade("architect", model_name)
         self.system_prompt = """You are the **BPY Code Architect**, a senior software engineer specialized in the Blender Python API.
 **Coding Standards:**
 1. **Parametric Logic:** Use variables for all dimensions and transforms to allow for non-destructive editing.
-2. **Library Usage:** Use `bpy.ops` for object creation and `bpy.data` for precise attribute manipulation.
-3. **Printability:** Ensure all primitive intersections use Boolean Modifiers to create a single 'watertight' and 'manifold' mesh suitable for STL export. 
-4. **Export Logic:** Always include a final block of code that ensures all created objects are selected and visible. Then export using a robust method that handles different Blender versions:
-   ```python
-   # Select all objects to ensure they are exported
-   bpy.ops.object.select_all(action='SELECT')
-   
-   # Export logic (handles newer Blender 4.0+ and older versions)
-   try:
-       bpy.ops.wm.stl_export(filepath=output_path)
-   except AttributeError:
-       bpy.ops.export_mesh.stl(filepath=output_path)
-   ```
+   Declare the key dimensions once at the top of the script as plain numeric literals with descriptive names
+   (e.g. `seat_height = 0.45`, `leg_size = (0.05, 0.05, 0.4)`) and derive everything else from them; users edit these values directly.
+2. **Fast Geometry Library:** A helper module is preloaded as `fg` (do NOT import it). Prefer it over `bpy.ops` for primitives and booleans:
+   - `fg.cube(name, size=(x, y, z), location=(x, y, z), rotation=(rx, ry, rz))` (size = full edge lengths)
+   - `fg.cylinder(name, radius, depth, segments=32, location=..., rotation=...)`
+   - `fg.cone(name, radius1, radius2, depth, segments=32, location=..., rotation=...)`
+   - `fg.sphere(name, radius, segments=32, rings=16, location=..., rotation=...)`
+   - `fg.torus(name, major_radius, minor_radius, location=..., rotation=...)`
+   - `fg.union(target, [obj, ...])` / `fg.difference(target, [cutter, ...])`: batch ALL operands into ONE call; operands are consumed.
+   - `fg.join([obj, ...], name)`: merges objects that do not overlap into one, without a boolean.
+   - `fg.export_stl(output_path)`: selects all meshes and exports with the right operator for the Blender version.
+   - `fg.build_blueprint(blueprint)`: builds the whole primitive/boolean tree of the blueprint (injected as the variable `blueprint`) into one object.
+     It caches every subtree mesh, so when only one primitive changes, only that branch is recomputed. Prefer it whenever the blueprint primitives
+     already describe the shape, then add any extra detail on the returned object.
+   Every builder returns the created object. Use `bpy.data` for any other precise attribute manipulation.
+   Rotations passed to `fg` builders and Blender are in radians. Blueprint rotations are in the blueprint's `rotation_unit`
+   (degrees when it is missing): convert degrees with `math.radians`, never guess the unit from the magnitude.
+3. **Printability:** Ensure all primitive intersections are merged with `fg.union` / `fg.difference` into a single 'watertight' and 'manifold' mesh suitable for STL export.
+4. **Export Logic:** Always end the script with `fg.export_stl(output_path)`.
    - The variable `output_path` will be injected into your script's local namespace.
    - IMPORANT: Start the script with `import bpy` and `import math`.
    - IMPORTANT: Clear existing usage with `bpy.ops.wm.read_factory_settings(use_empty=True)` at the very start.
+   - Keep the script short: no comments restating the blueprint, no redundant selection or mode switching.
 
 """
+        self.part_prompt = self.system_prompt + """
+**Sub-assembly Mode (overrides the Export Logic above):**
+You are writing ONE part of a larger model; other parts are built separately and joined later.
+- Build ONLY the primitives of this part. Its normalized blueprint is injected as the variable `part_blueprint`
+  (locations are already in world space), so `fg.build_blueprint(part_blueprint)` is a valid starting point.
+- Assign the single finished object of this part to the variable `part`.
+- Do NOT reset the scene and do NOT export: no `read_factory_settings`, no `fg.export_stl`.
+"""
+        # Blueprints with at least this many primitives are split into sub-assemblies (0 disables)
+        self.parallel_min_primitives = int(os.getenv("ARCHITECT_PARALLEL_MIN_PRIMITIVES", "6"))
+        self.max_parts = int(os.getenv("ARCHITECT_MAX_PARTS", "6"))
 
     def run(self, state: GraphState):
         blueprint = state.get("json_blueprint", {})
@@ -43,6 +63,29 @@ class ArchitectAgent:
         if not blueprint:
             logger.warning("Architect called but no blueprint found.")
             
+        # A blueprint that already produced a validated script is not regenerated,
+        # unless the feedback asks for more than a plain approval.
+        feedback = state.get("feedback") or ""
+        if blueprint and not errors and is_plain_approval(feedback):
+            record = get_design_index().find_by_blueprint(blueprint)
+            if record:
+                logger.info(f"Reusing stored script for identical blueprint ('{record['input'][:50]}'). Skipping LLM.")
+                return {"bpy_code": record["bpy_code"], "code_origin": {"agent": "architect", "model": "design_index"}, "assembly_plan": {}}
+
+        # Large blueprints fan out into parts that are generated and validated in parallel.
+        # A failed part is regenerated alone; failures of the assembled model fall back to one script.
+        plan = self.plan_assembly(blueprint, feedback) if blueprint else None
+        if plan:
+            if not errors:
+                # A new plan starts empty, so parts of an earlier blueprint are never assembled into it
+                logger.info(f"Blueprint split into {len(plan['parts'])} sub-assemblies.")
+                return {"assembly_plan": plan, "part_results": None}
+            results = state.get("part_results") or {}
+            failed = [p for p in plan["parts"] if p["key"] in results and not results[p["key"]]["success"]]
+            if failed:
+                logger.info(f"Blueprint split into {len(plan['parts'])} sub-assemblies, {len(failed)} to regenerate.")
+                return {"assembly_plan": plan}
+
         logger.info("Synthesizing BPY code from blueprint...")
         
         # Base Prompt
@@ -57,19 +100,47 @@ class ArchitectAgent:
             logger.info(f"Self-Correction Mode: Fixing {len(errors)} errors.")
             msg_content += f"\n\nCRITICAL: The previous code failed with the following errors. You MUST fix them:\n" + "\n".join(errors)
 
+        # Failures escalate to a stronger model tier; a stalled loop jumps to the strongest
+        hint, start_tier = RetryController.escalation(state, len(self.llm.tiers))
+        if hint:
+            msg_content += f"\n\n{hint}"
+
         messages = [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=msg_content)
         ]
-        
-        response = self.llm.invoke(messages)
-        
-        code = response.content
-        # Extract code from markdown
-        if "```python" in code:
-            code = code.split("```python")[1].split("```")[0].strip()
-        elif "```" in code:
-            code = code.split("```")[1].split("```")[0].strip()
-            
+        code, model = self.llm.generate_code(messages, start_tier)
+
         logger.info(f"BPY script generated ({len(code)} characters).")
-        return {"bpy_code": code}
+        return {"bpy_code": code, "code_origin": {"agent": "architect", "model": model}, "assembly_plan": {}}
+
+    def plan_assembly(self, blueprint, feedback: str = ""):
+        """Sub-assembly plan for large blueprints, or None to generate a single script."""
+        if not self.parallel_min_primitives or len(primitive_nodes(blueprint)) < self.parallel_min_primitives:
+            return None
+        plan = split_assemblies(blueprint, self.max_parts)
+        if plan and not is_plain_approval(feedback):
+            # Feedback that requests changes applies to every part, so it is part of the cache key
+            for part in plan["parts"]:
+                part["key"] = combine_keys("PART", [part["key"], feedback])
+        return plan
+
+    def build_part(self, part: dict, previous: dict = None, feedback: str = ""):
+        """Generates the code of one sub-assembly; returns `(code, model)`."""
+        msg_content = (
+            f"Generate BPY code for the sub-assembly '{part['name']}' ({', '.join(str(l) for l in part['labels'])}).\n"
+            f"part_blueprint:\n{json.dumps(part_blueprint(part), indent=2)}"
+        )
+        if feedback:
+            msg_content += f"\n\nContext/User Feedback: {feedback}"
+        start_tier = 0
+        if previous and not previous.get("success"):
+            msg_content += (f"\n\nCRITICAL: The previous code for this part failed. You MUST fix it:\n{previous['error']}"
+                            f"\n\nPrevious code:\n```python\n{previous['code']}\n```")
+            start_tier = previous.get("attempts", 1)
+
+        messages = [
+            SystemMessage(content=self.part_prompt),
+            HumanMessage(content=msg_content)
+        ]
+        return self.llm.generate_code(messages, start_tier, f"Generated code for {part['name']}")
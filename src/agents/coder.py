@@ -1,18 +1,15 @@
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
 from src.state import GraphState
-from src.config import config
+from src.utils.model_cascade import ModelCascade
+from src.utils.retry_policy import RetryController
 from src.config.logger import get_logger
 
 logger = get_logger("Coder")
 
 class CoderAgent:
     def __init__(self, model_name=None):
-        # Use LiteLLM configuration
-        llm_config = config.get_openai_config()
-        if model_name:
-            llm_config["model"] = model_name
-        self.llm = ChatOpenAI(**llm_config)
+        # Use LiteLLM configuration (per-agent model tiers)
+        self.llm = ModelCascade("coder", model_name)
         self.system_prompt = """You are the **BPY Scripting Expert**.
 **Task:**
 Generate a complete, runnable Blender Python (BPY) script based on the user's request.
@@ -21,15 +18,12 @@ Generate a complete, runnable Blender Python (BPY) script based on the user's re
 2.  **Runnable**: The script must be executable in Blender 4.x.
 3.  **Imports**: Always start with `import bpy` and `import math`.
 4.  **Cleanup**: Always include `bpy.ops.wm.read_factory_settings(use_empty=True)` at the start to clear the scene.
-5.  **Export Logic**: Always include a final block to select all objects and export to STL. Use the variable `output_path` which will be injected.
-    ```python
-    # ... code ...
-    bpy.ops.object.select_all(action='SELECT')
-    try:
-        bpy.ops.wm.stl_export(filepath=output_path)
-    except AttributeError:
-        bpy.ops.export_mesh.stl(filepath=output_path)
-    ```
+5.  **Fast Geometry Library**: A helper module is preloaded as `fg` (do NOT import it). Prefer it over `bpy.ops` primitives and one-by-one boolean modifiers:
+    `fg.cube(name, size, location, rotation)`, `fg.cylinder(name, radius, depth, ...)`, `fg.cone(name, radius1, radius2, depth, ...)`,
+    `fg.sphere(name, radius, ...)`, `fg.torus(name, major_radius, minor_radius, ...)`,
+    `fg.union(target, [objs])` and `fg.difference(target, [cutters])` (one batched call per target, operands are consumed).
+6.  **Export Logic**: Always end the script with `fg.export_stl(output_path)`. The variable `output_path` will be injected.
+7.  **Parameters**: Declare the key dimensions once at the top as plain numeric literals with descriptive names (e.g. `height = 0.1`, `handle_size = (0.02, 0.06, 0.08)`) and compute everything else from them.
 
 **Output:**
 Return ONLY the Python code, wrapped in ```python ... ``` blocks.
@@ -49,16 +43,11 @@ Return ONLY the Python code, wrapped in ```python ... ``` blocks.
             logger.info(f"Self-Correction: Fixing {len(errors)} errors.")
             messages.append(HumanMessage(content=f"Previous attempt failed with errors:\n" + "\n".join(errors) + "\nPlease fix the script."))
 
-        response = self.llm.invoke(messages)
-        content = response.content
-        
-        # Extract code
-        if "```python" in content:
-            code = content.split("```python")[1].split("```")[0].strip()
-        elif "```" in content:
-            code = content.split("```")[1].split("```")[0].strip()
-        else:
-            code = content.strip()
-            
+        # Failures escalate to a stronger model tier; a stalled loop jumps to the strongest
+        hint, start_tier = RetryController.escalation(state, len(self.llm.tiers))
+        if hint:
+            messages.append(HumanMessage(content=hint))
+        code, model = self.llm.generate_code(messages, start_tier)
+
         logger.info(f"Script generated ({len(code)} chars).")
-        return {"bpy_code": code}
+        return {"bpy_code": code, "code_origin": {"agent": "coder", "model": model}}
@@ -1,19 +1,31 @@
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
 from src.state import GraphState
-from src.config import config
+from src.utils.model_cascade import ModelCascade, CascadeParseError
+from src.utils.image_prep import is_image_path
 from src.config.logger import get_logger
 import json
+import re
 
 logger = get_logger("Supervisor")
 
+APPROVAL_KEYWORDS = ["proceed", "build", "looks good", "go", "yes", "confirm", "generate"]
+# Words that may accompany an approval without asking for any change
+_APPROVAL_FILLER = {"ok", "okay", "sure", "please", "it", "this", "that", "now", "the", "model", "design", "plan",
+                    "ahead", "let's", "lets", "and", "then", "good", "great", "fine", "perfect", "thanks", "thank", "you"}
+
+
+def is_plain_approval(feedback: str) -> bool:
+    """True when `feedback` is empty or only approves the current blueprint ("Yes, build it!") without requesting changes."""
+    text = re.sub(r"[^a-z']+", " ", (feedback or "").lower())
+    for keyword in APPROVAL_KEYWORDS:
+        text = re.sub(rf"\b{keyword}\b", " ", text)
+    return all(word in _APPROVAL_FILLER for word in text.split())
+
+
 class SupervisorAgent:
     def __init__(self, model_name=None):
-        # Use LiteLLM configuration
-        llm_config = config.get_openai_config()
-        if model_name:
-            llm_config["model"] = model_name
-        self.llm = ChatOpenAI(**llm_config)
+        # Use LiteLLM configuration (per-agent model tiers)
+        self.llm = ModelCascade("supervisor", model_name)
         self.system_prompt = """You are the **Workflow Supervisor**.
 Your goal is to route the user's request to the appropriate worker agent.
 **Workers:**
@@ -47,9 +59,13 @@ Return a JSON object: `{"next_agent": "analyst" | "architect" | "coder" | "finis
             logger.info("No new feedback and build successful. Routing to FINISH.")
             return {"next_agent": "finish"}
 
+        # New image requests always need a visual decomposition first
+        if not blueprint and not feedback and is_image_path(input_data):
+            logger.info("Image input without blueprint. Routing to ANALYST.")
+            return {"next_agent": "analyst"}
+
         # 1. KEYWORD OVERRIDES
-        approval_keywords = ["proceed", "build", "looks good", "go", "yes", "confirm", "generate"]
-        if any(k in feedback for k in approval_keywords) and blueprint:
+        if any(k in feedback for k in APPROVAL_KEYWORDS) and blueprint:
             logger.info("Universal Approval detected. Routing to ARCHITECT.")
             return {"next_agent": "architect"}
 
@@ -71,29 +87,29 @@ Return a JSON object: `{"next_agent": "analyst" | "architect" | "coder" | "finis
             HumanMessage(content=f"User Request/Feedback: {prompt_input}")
         ]
         
-        response = self.llm.invoke(messages)
-        content = response.content
-        
+        # Fallback based on state
+        default_agent = "analyst" if not blueprint else "architect"
         try:
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            result = json.loads(content)
-            
-            # Fallback based on state
-            default_agent = "analyst" if not blueprint else "architect"
-
-            # Safety check: if result is a list, extract the first dict if possible or default
-            if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
-                result = result[0]
-            elif not isinstance(result, dict):
-                result = {"next_agent": default_agent}
-
-            decision = result.get('next_agent', default_agent)
+            decision, _ = self.llm.invoke(messages, parser=self._parse_decision)
             logger.info(f"Decision: Route to {decision.upper()}.")
             return {"next_agent": decision}
-        except Exception as e:
-            default_agent = "analyst" if not blueprint else "architect"
-            logger.error(f"Error parsing decision: {str(e)}. Raw content: {content[:200]}...")
+        except CascadeParseError as e:
+            logger.error(f"Error parsing decision: {str(e)}. Raw content: {e.content[:200]}...")
             return {"next_agent": default_agent}
+
+    @staticmethod
+    def _parse_decision(content: str) -> str:
+        """Extracts a valid `next_agent` from the LLM answer; raises on anything else."""
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0].strip()
+        result = json.loads(content)
+
+        # Safety check: if result is a list, extract the first dict if possible
+        if isinstance(result, list) and len(result) > 0 and isinstance(result[0], dict):
+            result = result[0]
+        decision = result.get("next_agent") if isinstance(result, dict) else None
+        if decision not in ("analyst", "architect", "coder", "finish"):
+            raise ValueError(f"Unknown next_agent: {decision!r}")
+        return decision
@@ -1,15 +1,25 @@
 from src.state import GraphState
 from src.utils.blender_ops import BlenderOps
+from src.utils.model_cascade import TierStats
+from src.utils.assembly import part_script
+from src.utils.cancellation import RunCancelled
 from src.config.logger import get_logger
 import os
+import json
 
 logger = get_logger("Validator")
 
 class ValidatorAgent:
     def __init__(self):
-        pass
+        # Line-level profiling of the generated script (BPY_PROFILE=1)
+        self.profile = os.getenv("BPY_PROFILE", "0").lower() in ("1", "true", "yes")
 
-    def run(self, state: GraphState):
+    def run(self, state: GraphState, warm: bool = False):
+        """
+        Executes the script and validates its STL. `warm=True` reuses a warm
+        Blender worker; it is meant for re-running known-good scripts with new
+        parameter values, not for freshly generated code.
+        """
         bpy_code = state.get("bpy_code", "")
         logger.info("Executing BPY script and checking for STL generation...")
         
@@ -25,18 +35,32 @@ class ValidatorAgent:
         
         # Prepend logic to force set filepath if the variable is used.
         # We use raw string for path to avoid escape issue on Windows
-        script = f"output_path = r'{output_stl}'\n" + bpy_code
+        preamble = f"output_path = r'{output_stl}'\n"
+        # The current blueprint is exposed so scripts can call fg.build_blueprint(blueprint),
+        # which reuses cached meshes for every unchanged subtree.
+        preamble += f"blueprint = json.loads({json.dumps(json.dumps(state.get('json_blueprint') or {}))})\n"
+        script = preamble + bpy_code
         
-        result = BlenderOps.execute_bpy(script)
+        try:
+            # Hotspot lines are reported relative to bpy_code, not to the preamble-prefixed script
+            result = BlenderOps.execute_bpy(script, profile=self.profile, warm=warm, line_offset=preamble.count("\n"))
+        except RunCancelled:
+            # A killed run may leave a truncated STL behind
+            if os.path.exists(output_stl):
+                os.remove(output_stl)
+            raise
+        origin = state.get("code_origin") or {}
         
         if not result["success"]:
+            if origin:
+                TierStats.record_validation(origin["agent"], origin["model"], False)
             logger.error(f"Execution Error: {result['error']}")
-            current_retries = state.get("retry_count", 0)
             return {
                 "errors": [result["error"]],
                 "mesh_issues": [],
-                "messages": state.get("messages", []) + [f"Validator found error: {result['error']}"],
-                "retry_count": current_retries + 1
+                "mesh_metrics": {},
+                "profile_report": result.get("hotspots", ""),
+                "messages": state.get("messages", []) + [f"Validator found error: {result['error']}"]
             }
             
         # Check if STL exists
@@ -44,19 +68,36 @@ class ValidatorAgent:
         validation = BlenderOps.validate_stl(output_stl)
         mesh_issues = result.get("mesh_issues", [])
         
+        if origin:
+            TierStats.record_validation(origin["agent"], origin["model"], validation["valid"])
+
         if not validation["valid"]:
              logger.warning(f"Mesh Issues Found: {validation['issues']}")
-             current_retries = state.get("retry_count", 0)
              return {
                  "errors": validation["issues"],
                  "mesh_issues": mesh_issues,
-                 "messages": state.get("messages", []) + [f"Validator found mesh issues: {validation['issues']}"],
-                 "retry_count": current_retries + 1
+                 "mesh_metrics": result.get("mesh_metrics", {}),
+                 "profile_report": result.get("hotspots", ""),
+                 "messages": state.get("messages", []) + [f"Validator found mesh issues: {validation['issues']}"]
              }
              
         logger.info(f"STL validation successful. Technical issues found: {len(mesh_issues)}")
         return {
             "stl_path": output_stl,
             "errors": [],
-            "mesh_issues": mesh_issues
+            "mesh_issues": mesh_issues,
+            "mesh_metrics": result.get("mesh_metrics", {}),
+            "profile_report": result.get("hotspots", "")
+        }
+
+    def validate_part(self, part: dict, code: str) -> dict:
+        """Executes one sub-assembly on its own; the part must produce a non-empty mesh."""
+        logger.info(f"Validating {part['name']} ({', '.join(str(l) for l in part['labels'])})...")
+        result = BlenderOps.execute_bpy(part_script(part, code))
+        if not result["success"]:
+            logger.warning(f"{part['name']} failed validation.")
+        return {
+            "success": result["success"],
+            "error": result["error"],
+            "mesh_issues": result.get("mesh_issues", [])
         }
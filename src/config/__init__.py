@@ -1,22 +1,36 @@
 """
 Configuration module for 3D Designer Agent.
 Handles LiteLLM integration and model configuration.
+Nothing is loaded at import time: `.env` is read on the first `load_env()` /
+`get_config()` call (the app entry point calls it before anything else).
 """
 import os
-from typing import Optional
-from dotenv import load_dotenv
+import threading
+from typing import List, Optional
 from src.config.logger import get_logger
 
 logger = get_logger("Config")
 
-# Load environment variables from .env file if it exists
-env_path = os.path.join(os.getcwd(), '.env')
-if os.path.exists(env_path):
-    logger.info(f"Found .env file at {env_path}")
-    load_dotenv(env_path)
-else:
-    logger.warning(f"No .env file found at {env_path}, using system environment variables.")
-    load_dotenv()
+_env_loaded = False
+_config = None
+_lock = threading.Lock()
+
+def load_env():
+    """Loads environment variables from the .env file if it exists (once per process)."""
+    global _env_loaded
+    with _lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+
+        env_path = os.path.join(os.getcwd(), '.env')
+        if os.path.exists(env_path):
+            logger.info(f"Found .env file at {env_path}")
+            load_dotenv(env_path)
+        else:
+            logger.warning(f"No .env file found at {env_path}, using system environment variables.")
+            load_dotenv()
+        _env_loaded = True
 
 class LiteLLMConfig:
     """Configuration for LiteLLM proxy integration."""
@@ -29,12 +43,28 @@ class LiteLLMConfig:
         
         # Model names (these should match your LiteLLM proxy configuration)
         self.default_model = os.getenv("LITELLM_MODEL", "gpt-4o")
+
+        # Optional stronger model appended as the last tier of every cascade
+        self.escalation_model = os.getenv("LITELLM_ESCALATION_MODEL", "")
+
+    def get_model_tiers(self, agent: str) -> List[str]:
+        """
+        Returns the ordered model cascade for an agent, cheapest first.
+        Configured with LITELLM_MODEL_<AGENT>, e.g. LITELLM_MODEL_SUPERVISOR=gpt-4o-mini
+        or LITELLM_MODEL_ARCHITECT=gpt-4o-mini,gpt-4o. Falls back to the default model.
+        """
+        raw = os.getenv(f"LITELLM_MODEL_{agent.upper()}", "")
+        tiers = [m.strip() for m in raw.split(",") if m.strip()] or [self.default_model]
+        if self.escalation_model and self.escalation_model not in tiers:
+            tiers.append(self.escalation_model)
+        return tiers
         
-    def get_openai_config(self) -> dict:
+    def get_openai_config(self, model: Optional[str] = None) -> dict:
         """
         Returns configuration dict for LangChain's ChatOpenAI to use LiteLLM proxy.
         """
-        logger.info(f"Loading LiteLLM Config: Model={self.default_model}, BaseURL={self.base_url}")
+        model = model or self.default_model
+        logger.info(f"Loading LiteLLM Config: Model={model}, BaseURL={self.base_url}")
         if self.api_key:
             masked_key = self.api_key[:3] + "..." + self.api_key[-4:] if len(self.api_key) > 7 else "***"
             logger.info(f"API Key loaded: {masked_key}")
@@ -42,7 +72,7 @@ class LiteLLMConfig:
             logger.warning("API Key is missing!")
 
         config = {
-            "model": self.default_model,
+            "model": model,
             "openai_api_key": self.api_key,
             "temperature": 0
         }
@@ -54,5 +84,18 @@ class LiteLLMConfig:
             
         return config
 
-# Global config instance
-config = LiteLLMConfig()
+def get_config() -> LiteLLMConfig:
+    """Returns the global config instance, loading the environment on first use."""
+    global _config
+    if _config is None:
+        load_env()
+        with _lock:
+            if _config is None:
+                _config = LiteLLMConfig()
+    return _config
+
+def __getattr__(name):
+    # Keeps `from src.config import config` working without building it at import time
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -50,38 +50,55 @@ class DetailedColorFormatter(logging.Formatter):
 
         return f"{timestamp} [{level_name}] {logger_name}: {message}"
 
-# Create logs directory if it doesn't exist
-logs_dir = "logs"
-if not os.path.exists(logs_dir):
-    os.makedirs(logs_dir)
+class SessionFileHandler(logging.FileHandler):
+    """File handler that creates the logs directory and file on the first record only."""
 
-# Create a unique log file for each session
-log_filename = f"logs/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    def __init__(self, filename, encoding='utf-8'):
+        super().__init__(filename, encoding=encoding, delay=True)
 
-# Setup root logger
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
 
-# Clear existing handlers
-if root_logger.hasHandlers():
-    root_logger.handlers.clear()
+_configured = False
 
-# File Handler (No colors in file)
-file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-file_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
-file_handler.setFormatter(file_formatter)
-root_logger.addHandler(file_handler)
+def setup_logging(logs_dir="logs"):
+    """
+    Configures the root logger (colored console + per-session log file).
+    Called once by the entry point; importing this module has no side effects.
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    # Create a unique log file for each session (opened lazily on the first record)
+    log_filename = os.path.join(logs_dir, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+
+    # Setup root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
 
-# Console Handler (With colors)
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(DetailedColorFormatter())
-root_logger.addHandler(console_handler)
+    # Clear existing handlers
+    if root_logger.hasHandlers():
+        root_logger.handlers.clear()
+
+    # File Handler (No colors in file)
+    file_handler = SessionFileHandler(log_filename)
+    file_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    file_handler.setFormatter(file_formatter)
+    root_logger.addHandler(file_handler)
+
+    # Console Handler (With colors)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(DetailedColorFormatter())
+    root_logger.addHandler(console_handler)
+
+    # Initial log entry
+    system_logger = get_logger("System")
+    system_logger.info("=== 3D Designer Agent Session Started ===")
+    system_logger.info(f"Logging to {log_filename}")
 
 def get_logger(name):
     """Returns a logger instance with the specified name."""
     return logging.getLogger(name)
-
-# Initial log entry
-system_logger = get_logger("System")
-system_logger.info("=== 3D Designer Agent Session Started ===")
-system_logger.info(f"Logging to {log_filename}")
@@ -1,60 +1,152 @@
+import threading
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 from src.state import GraphState
 from src.agents.analyst import AnalystAgent
 from src.agents.architect import ArchitectAgent
 from src.agents.validator import ValidatorAgent
 from src.agents.supervisor import SupervisorAgent
 from src.agents.coder import CoderAgent
+from src.agents.tester import TesterAgent
 from langgraph.checkpoint.memory import MemorySaver
+from src.utils.design_index import get_design_index
+from src.utils.retry_policy import RetryController
+from src.utils.assembly import assemble_script
+from src.utils.cancellation import check_cancelled
 from src.config.logger import get_logger
 
 logger = get_logger("Graph")
 
-# Initialize Agents
-analyst = AnalystAgent()
-architect = ArchitectAgent()
-validator = ValidatorAgent()
-supervisor = SupervisorAgent()
-coder = CoderAgent()
+# Agents (and their LLM clients) are built on first use, not at import time
+_AGENT_FACTORIES = {
+    "analyst": AnalystAgent,
+    "architect": ArchitectAgent,
+    "validator": ValidatorAgent,
+    "supervisor": SupervisorAgent,
+    "coder": CoderAgent,
+    "tester": TesterAgent,
+    "retry_controller": RetryController,
+}
+_agents = {}
+_agents_lock = threading.Lock()
+
+def get_agent(name: str):
+    """Returns the shared instance of an agent, constructing it on the first call."""
+    agent = _agents.get(name)
+    if agent is None:
+        with _agents_lock:
+            agent = _agents.get(name)
+            if agent is None:
+                logger.info(f"Initializing {name}...")
+                agent = _agents[name] = _AGENT_FACTORIES[name]()
+    return agent
 
 memory = MemorySaver()
 
 # --- Node Functions ---
 
-from src.agents.tester import TesterAgent
-tester = TesterAgent()
-
 def analyst_node(state: GraphState):
+    check_cancelled("analyst")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: ANALYST")
     logger.info("="*50)
-    return analyst.run(state)
+    result = get_agent("analyst").run(state)
+    # A new plan invalidates the model built from the previous one (and its parameter fast path)
+    result.setdefault("stl_path", "")
+    return result
 
 def architect_node(state: GraphState):
+    check_cancelled("architect")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: ARCHITECT")
     logger.info("="*50)
-    return architect.run(state)
+    return get_agent("architect").run(state)
 
 def coder_node(state: GraphState):
+    check_cancelled("coder")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: CODER")
     logger.info("="*50)
-    return coder.run(state)
+    return get_agent("coder").run(state)
+
+def part_builder_node(payload: dict):
+    """Generates and validates one sub-assembly; runs in parallel with its siblings."""
+    part, previous = payload["part"], payload.get("previous")
+    check_cancelled(part["name"])
+    logger.info(f">>> NODE: PART BUILDER ({part['name']})")
+    code, model = get_agent("architect").build_part(part, previous, payload.get("feedback", ""))
+    check = get_agent("validator").validate_part(part, code)
+    attempts = (previous or {}).get("attempts", 0) + (0 if check["success"] else 1)
+    return {"part_results": {part["key"]: {
+        "name": part["name"],
+        "code": code,
+        "model": model,
+        "success": check["success"],
+        "error": check["error"],
+        "mesh_issues": check["mesh_issues"],
+        "attempts": attempts,
+    }}}
+
+def assembler_node(state: GraphState):
+    check_cancelled("assembler")
+    logger.info("\n" + "="*50)
+    logger.info(">>> NODE: ASSEMBLER")
+    logger.info("="*50)
+    plan = state["assembly_plan"]
+    results = state.get("part_results") or {}
+    failed = [results[p["key"]] for p in plan["parts"] if not results[p["key"]]["success"]]
+    if failed:
+        errors = [f"Sub-assembly {r['name']} failed: {r['error']}" for r in failed]
+        logger.warning(f"{len(failed)}/{len(plan['parts'])} sub-assemblies failed; only these will be regenerated.")
+        result = {
+            "errors": errors,
+            "messages": state.get("messages", []) + [f"Assembler found failing parts: {[r['name'] for r in failed]}"]
+        }
+        # The retry policy judges progress on the failing parts' code, not on the last full script
+        failing_code = "\n".join(r["code"] for r in failed)
+        result.update(get_agent("retry_controller").assess({**state, "bpy_code": failing_code}, errors, "assembler"))
+        return result
+
+    code = assemble_script(plan, results)
+    models = sorted({results[p["key"]]["model"] for p in plan["parts"]})
+    logger.info(f"Assembled {len(plan['parts'])} sub-assemblies and {len(plan.get('operations', []))} top-level booleans.")
+    return {"bpy_code": code, "code_origin": {"agent": "architect", "model": "+".join(models)}, "errors": []}
 
 def validator_node(state: GraphState):
+    check_cancelled("validator")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: VALIDATOR")
     logger.info("="*50)
-    return validator.run(state)
+    result = get_agent("validator").run(state)
+    if result.get("errors"):
+        result.update(get_agent("retry_controller").assess(state, result["errors"], "validator"))
+    else:
+        # Code and assembly failures are fixed; only the Tester's failures still count towards its budget
+        history = [h for h in state.get("retry_history") or [] if h["stage"] == "tester"]
+        result.update({"retry_history": history, "retry_strategy": "retry"})
+    return result
 
 def tester_node(state: GraphState):
+    check_cancelled("tester")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: TESTER (QA)")
     logger.info("="*50)
-    return tester.run(state)
+    result = get_agent("tester").run(state)
+    if result.get("errors"):
+        result.update(get_agent("retry_controller").assess(state, result["errors"], "tester"))
+    else:
+        result.update({"retry_history": [], "retry_strategy": "retry"})
+    request = state.get("design_request")
+    if not result.get("errors") and state.get("stl_path") and request:
+        # Remember successful designs, under the text that describes them, so near-duplicate requests can reuse them
+        try:
+            get_design_index().add(request, state.get("json_blueprint") or {}, state.get("bpy_code", ""), state.get("mesh_metrics"))
+        except Exception as e:
+            logger.warning(f"Failed to index design: {e}")
+    return result
 
 def supervisor_node(state: GraphState):
+    check_cancelled("supervisor")
     logger.info("\n" + "="*50)
     logger.info(">>> NODE: SUPERVISOR")
     logger.info("="*50)
@@ -62,32 +154,54 @@ def supervisor_node(state: GraphState):
 
 def route_supervisor(state: GraphState):
     logger.info(">>> SUPERVISOR (Routing)")
-    decision = supervisor.run(state)
+    check_cancelled("supervisor routing")
+    decision = get_agent("supervisor").run(state)
     return decision["next_agent"]
 
+def route_architect(state: GraphState):
+    plan = state.get("assembly_plan")
+    if not plan:
+        return "validator"
+    results = state.get("part_results") or {}
+    feedback = state.get("feedback") or ""
+    sends = [
+        Send("part_builder", {"part": part, "previous": results.get(part["key"]), "feedback": feedback})
+        for part in plan["parts"] if not (results.get(part["key"]) or {}).get("success")
+    ]
+    if sends:
+        logger.info(f"Fanning out {len(sends)} sub-assemblies.")
+    return sends or "assembler"
+
+def route_assembler(state: GraphState):
+    if state.get("errors"):
+        if state.get("retry_strategy") != "stop":
+            logger.info(f"Sub-assemblies failed (Attempt {state.get('retry_count', 0)}, strategy: {state.get('retry_strategy')}). Retrying failed parts...")
+            return "supervisor"
+        logger.warning("Retry policy stopped the correction loop in Assembler.")
+        return "end"
+    return "validator"
+
 def route_validator(state: GraphState):
     errors = state.get("errors", [])
-    retry_count = state.get("retry_count", 0)
     
     if errors:
-        if retry_count < 3:
-            logger.info(f"Validator found code errors (Attempt {retry_count + 1}/3). Retrying...")
+        if state.get("retry_strategy") != "stop":
+            logger.info(f"Validator found code errors (Attempt {state.get('retry_count', 0)}, strategy: {state.get('retry_strategy')}). Retrying...")
             return "supervisor"
         else:
-            logger.warning("Max retries reached in Validator.")
+            logger.warning("Retry policy stopped the correction loop in Validator.")
             return "end"
     return "tester"
 
 def route_tester(state: GraphState):
     errors = state.get("errors", [])
-    retry_count = state.get("retry_count", 0)
     
     if errors:
-        if retry_count < 3:
-            logger.info(f"Tester found quality issues (Attempt {retry_count + 1}/3). Routing back for enhancement...")
+        if state.get("retry_strategy") != "stop":
+            logger.info(f"Tester found quality issues (Attempt {state.get('retry_count', 0)}, strategy: {state.get('retry_strategy')}). Routing back for enhancement...")
             return "supervisor"
         else:
-            logger.warning("Max retries reached in Tester. Completing with best effort.")
+            logger.warning("Retry policy stopped the correction loop in Tester. Completing with best effort.")
             return "end"
     return "end"
 
@@ -98,6 +212,8 @@ workflow = StateGraph(GraphState)
 workflow.add_node("analyst", analyst_node)
 workflow.add_node("architect", architect_node)
 workflow.add_node("coder", coder_node)
+workflow.add_node("part_builder", part_builder_node)
+workflow.add_node("assembler", assembler_node)
 workflow.add_node("validator", validator_node)
 workflow.add_node("tester", tester_node)
 workflow.add_node("supervisor", supervisor_node)
@@ -119,16 +235,31 @@ workflow.add_conditional_edges(
 
 # Standard Flows
 workflow.add_edge("analyst", "supervisor") 
-workflow.add_edge("architect", "validator")
 workflow.add_edge("coder", "validator")
 
+# Architect: one script straight to the Validator, or a fan-out of sub-assemblies
+workflow.add_conditional_edges("architect", route_architect, ["part_builder", "assembler", "validator"])
+workflow.add_edge("part_builder", "assembler")
+
+# Assembler Routing
+workflow.add_conditional_edges(
+    "assembler",
+    route_assembler,
+    {
+        "supervisor": "supervisor",
+        "validator": "validator",
+        "end": END
+    }
+)
+
 # Validator Routing
 workflow.add_conditional_edges(
     "validator",
     route_validator,
     {
         "supervisor": "supervisor", 
-        "tester": "tester"
+        "tester": "tester",
+        "end": END
     }
 )
 
@@ -1,15 +1,35 @@
-from typing import List, Dict, Any, Optional, TypedDict
+from typing import List, Dict, Any, Optional, TypedDict, Annotated
 from langchain_core.messages import BaseMessage
 
+def merge_part_results(existing: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reducer for part_results: parallel part builders each contribute their own key.
+    A None update clears the results (the Architect sends it when it starts a new plan).
+    """
+    if update is None:
+        return {}
+    merged = dict(existing or {})
+    merged.update(update or {})
+    return merged
+
 class GraphState(TypedDict):
     input_data: str  # User description or image path
+    input_description: str  # Text accompanying an image input
+    design_request: str  # Request plus every change asked for since; empty when no text describes the design
     json_blueprint: Dict[str, Any]  # The structured 3D plan
     reasoning: str # Chain-of-Thought reasoning from Analyst
     bpy_code: str  # The generated Blender Python code
+    code_origin: Dict[str, str] # Agent and model tier that produced bpy_code
+    assembly_plan: Dict[str, Any] # Sub-assemblies of a split blueprint (empty for monolithic generation)
+    part_results: Annotated[Dict[str, Dict[str, Any]], merge_part_results] # Generated/validated parts by part key
     stl_path: str  # Path to the exported STL
     feedback: str  # User feedback string
     errors: List[str]  # Validation errors
     mesh_issues: List[str] # Procedural mesh analysis results
+    mesh_metrics: Dict[str, Any] # Aggregate mesh metrics (triangles, manifoldness, bounds)
+    profile_report: str # Hotspot table of the last profiled execution (BPY_PROFILE=1)
     test_report: str # Detailed testing report for iteration
     messages: List[BaseMessage]  # Chat history
-    retry_count: int # Track number of self-correction attempts
+    retry_count: int # Failed attempts of the current turn (incremented by the retry controller only)
+    retry_history: List[Dict[str, Any]] # Classified + fingerprinted failures of the current turn
+    retry_strategy: str # Retry controller decision: "retry" | "escalate" | "stop"
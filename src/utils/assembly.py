@@ -0,0 +1,107 @@
+"""
+Script assembly for sub-assembly (parallel) code generation.
+
+Each part of a split blueprint (see blueprint.split_assemblies) is generated as
+a script body that leaves its finished object in the variable `part`. The body
+is wrapped into a `build_<part>(part_blueprint)` function, so the exact same
+code is validated on its own in Blender and later called by the assembled
+script, which joins the parts and applies the top-level booleans locally,
+without another LLM call. The numeric parameters of a part body are hoisted to
+top-level `<part>_<name>` assignments, so the assembled script stays editable
+(see parametric.extract_parameters).
+"""
+import ast
+import json
+import textwrap
+from src.utils.parametric import hoist_parameters
+
+# Calls that belong to the assembled script only; a part must not reset the scene or export.
+_SCENE_CALLS = (
+    "bpy.ops.wm.read_factory_settings",
+    "bpy.ops.export_mesh.stl",
+    "bpy.ops.wm.stl_export",
+    "fg.export_stl",
+)
+
+
+def _dotted_name(node):
+    """`a.b.c` for a chain of attribute accesses on a name, None for anything else."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    return ".".join([node.id] + parts[::-1])
+
+
+def _is_scene_call(node) -> bool:
+    return isinstance(node, ast.Call) and _dotted_name(node.func) in _SCENE_CALLS
+
+
+class _StripSceneCalls(ast.NodeTransformer):
+    def visit_Expr(self, node):
+        if _is_scene_call(node.value):
+            return ast.Pass()
+        return node
+
+
+def strip_scene_calls(code: str) -> str:
+    """Removes scene resets and STL exports from a part script (left unchanged if it does not parse)."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return code
+    if not any(_is_scene_call(n) for n in ast.walk(tree)):
+        return code
+    return ast.unparse(ast.fix_missing_locations(_StripSceneCalls().visit(tree)))
+
+
+def part_blueprint(part: dict) -> dict:
+    """The blueprint of one part; its nodes are normalized, so rotations are in radians."""
+    return {"primitives": part["nodes"], "rotation_unit": "radians"}
+
+
+def _blueprint_literal(part: dict) -> str:
+    return f"json.loads({json.dumps(json.dumps(part_blueprint(part)))})"
+
+
+def part_function(part: dict, code: str) -> str:
+    """Wraps a part body into `def build_<name>(part_blueprint): ... return part`, preceded by its parameters."""
+    parameters, body = hoist_parameters(strip_scene_calls(code).strip(), part["name"])
+    body = body.strip() or "part = None"
+    return (
+        f"{parameters}"
+        f"def build_{part['name']}(part_blueprint):\n"
+        f"    # {', '.join(str(l) for l in part['labels'])}\n"
+        f"{textwrap.indent(body, '    ')}\n"
+        f"    return part\n"
+    )
+
+
+def part_script(part: dict, code: str) -> str:
+    """Standalone validation script for one part: builds it and checks the result."""
+    return (
+        f"{part_function(part, code)}\n"
+        f"part = build_{part['name']}({_blueprint_literal(part)})\n"
+        f"assert part is not None and part.type == 'MESH' and len(part.data.polygons) > 0, "
+        f"\"{part['name']} must assign a non-empty mesh object to `part`\"\n"
+    )
+
+
+def assemble_script(plan: dict, results: dict) -> str:
+    """Final script: builds every part, joins them and applies the top-level booleans."""
+    lines = ["import bpy", "import math", ""]
+    for part in plan["parts"]:
+        lines.append(part_function(part, results[part["key"]]["code"]))
+    lines.append("parts = [")
+    for part in plan["parts"]:
+        lines.append(f"    build_{part['name']}({_blueprint_literal(part)}),")
+    lines += ["]", "model = fg.join(parts, name='Model')"]
+    if plan.get("operations"):
+        lines += [
+            f"operations = json.loads({json.dumps(json.dumps(plan['operations']))})",
+            "model = fg.boolean(model, [(fg.build_node(node), node['boolean_op']) for node in operations])",
+        ]
+    lines.append("fg.export_stl(output_path)")
+    return "\n".join(lines) + "\n"
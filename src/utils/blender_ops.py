@@ -1,67 +1,254 @@
+import atexit
 import contextlib
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
 import traceback
+import os
+from src.utils.scheduler import get_scheduler
+from src.utils.cancellation import RunCancelled, check_cancelled, on_cancel, timeout_for
 from src.config.logger import get_logger
 
 logger = get_logger("BlenderOps")
 
+# Directory holding the helper modules that run inside Blender (fast_geometry, ...)
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Settings are read on use rather than at import, so a .env loaded by the entry point applies
+
+def mesh_cache_dir() -> str:
+    """Per-subtree mesh cache used by fg.build_blueprint."""
+    return os.getenv("MESH_CACHE_DIR", os.path.join(os.getcwd(), "cache", "meshes"))
+
+
+def mesh_cache_max_entries() -> int:
+    return int(os.getenv("MESH_CACHE_MAX_ENTRIES", "2000"))
+
+
+def warm_workers() -> int:
+    """Warm workers for parametric re-runs (0 disables; warm runs then use a fresh subprocess)."""
+    return int(os.getenv("BLENDER_WARM_WORKERS", "1"))
+
+
+def warm_max_jobs() -> int:
+    """Workers are recycled after this many scripts so leaked Blender state stays bounded."""
+    return int(os.getenv("BLENDER_WARM_MAX_JOBS", "50"))
+
+WORKER_RESULT_MARKER = "---WORKER_RESULT---"
+
+
+class WorkerUnavailable(RuntimeError):
+    """The warm worker died for reasons unrelated to the script (startup failure, crash)."""
+
+
+class WarmBlenderWorker:
+    """One persistent Blender process (blender_worker.py) executing scripts sent over stdin."""
+
+    def __init__(self):
+        self.jobs = 0
+        self.proc = subprocess.Popen(
+            [sys.executable, "-u", os.path.join(HELPERS_DIR, "blender_worker.py")],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        for line in self.proc.stdout:
+            self._lines.put(line)
+        self._lines.put(None)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, script_path: str, timeout: float):
+        """Returns `(stdout, error)`; raises TimeoutExpired or WorkerUnavailable."""
+        self.jobs += 1
+        try:
+            self.proc.stdin.write(json.dumps({"script": script_path}) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerUnavailable(f"Warm worker is not accepting scripts: {e}")
+        deadline = time.monotonic() + timeout
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self.close()
+                raise subprocess.TimeoutExpired(script_path, timeout, output="".join(output))
+            if line is None:
+                raise WorkerUnavailable(f"Warm worker exited ({self.proc.wait()})")
+            if line.startswith(WORKER_RESULT_MARKER):
+                return "".join(output), json.loads(line[len(WORKER_RESULT_MARKER):])["error"]
+            output.append(line)
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+
+
+class WarmBlenderPool:
+    """Up to `size` warm workers, started on demand and shared by all sessions."""
+
+    def __init__(self, size: int = None, max_jobs: int = None):
+        self.size = warm_workers() if size is None else size
+        self.max_jobs = warm_max_jobs() if max_jobs is None else max_jobs
+        self._idle = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _checkout(self) -> WarmBlenderWorker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._started < self.size:
+                        self._started += 1
+                        return WarmBlenderWorker()
+                try:
+                    # Re-checked periodically: a busy worker may be discarded instead of returned
+                    worker = self._idle.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            if worker.alive():
+                return worker
+            self._discard(worker)
+
+    def _discard(self, worker: WarmBlenderWorker):
+        worker.close()
+        with self._lock:
+            self._started -= 1
+
+    def _checkin(self, worker: WarmBlenderWorker):
+        if worker.alive() and worker.jobs < self.max_jobs:
+            self._idle.put(worker)
+        else:
+            self._discard(worker)
+
+    def prewarm(self):
+        """Starts one worker in the background so the first warm run does not pay for `import bpy`."""
+        if self.size <= 0:
+            return
+        with self._lock:
+            if self._started >= self.size or not self._idle.empty():
+                return
+            self._started += 1
+        try:
+            self._idle.put(WarmBlenderWorker())
+        except Exception as e:
+            with self._lock:
+                self._started -= 1
+            logger.warning(f"Could not start warm Blender worker: {e}")
+
+    def run(self, script_path: str, timeout: float):
+        if self.size <= 0:
+            raise WorkerUnavailable("Warm workers are disabled")
+        worker = self._checkout()
+        try:
+            # Killing the worker is the only way to stop a script mid-run
+            with on_cancel(worker.close):
+                return worker.run(script_path, timeout)
+        finally:
+            self._checkin(worker)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_warm_pool = None
+_warm_pool_lock = threading.Lock()
+
+def get_warm_pool() -> WarmBlenderPool:
+    global _warm_pool
+    if _warm_pool is None:
+        with _warm_pool_lock:
+            if _warm_pool is None:
+                _warm_pool = WarmBlenderPool()
+    return _warm_pool
+
 class BlenderOps:
     @staticmethod
-    def execute_bpy(script_content: str) -> dict:
+    def execute_bpy(script_content: str, profile: bool = False, warm: bool = False, line_offset: int = 0) -> dict:
         """
         Executes the provided BPY script content in a separate subprocess.
+        The fast geometry helpers are preloaded as `fg`.
         Includes automated mesh quality analysis.
+        With `profile=True` the script runs under bpy_profiler and the result
+        carries the raw `profile` plus a markdown `hotspots` table; `line_offset`
+        is the number of lines the caller prepended to its code, so hotspot line
+        numbers refer to the caller's code.
+        With `warm=True` the script runs in a persistent worker that already
+        imported bpy (meant for re-running scripts that are known to work);
+        if no worker is available it falls back to a fresh subprocess.
+        Cancelling the current run (see cancellation.py) kills the Blender process
+        and raises RunCancelled; the timeout is capped by the run's deadline.
         """
-        import subprocess
         import tempfile
-        import os
-        import sys
-        import json
 
-        logger.info("Executing BPY script (Isolated Mode)...")
+        check_cancelled("Blender run")
+        logger.info(f"Executing BPY script ({'Warm Worker' if warm else 'Isolated Mode'})...")
         
         # We inject a helper at the end to check all meshes
         analysis_helper = """
-import json
-import bmesh
-results = []
-for obj in bpy.data.objects:
-    if obj.type == 'MESH':
-        bm = bmesh.new()
-        bm.from_mesh(obj.data)
-        issues = []
-        if any(not e.is_manifold for e in bm.edges):
-            issues.append("Non-manifold geometry detected")
-        if any(f.calc_area() <= 0 for f in bm.faces):
-            issues.append("Degenerate faces found")
-        bm.free()
-        results.append({"name": obj.name, "issues": issues})
-print("---MESH_ANALYSIS_START---")
-print(json.dumps(results))
-print("---MESH_ANALYSIS_END---")
+import mesh_analysis
+mesh_analysis.report()
+print("---MESH_CACHE_START---")
+print(json.dumps(fg.CACHE_STATS))
+print("---MESH_CACHE_END---")
 """
 
+        profiled_path = None
+        if profile:
+            # The script gets its own file so the profiler can map trace events to its lines
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as pf:
+                pf.write(script_content)
+                profiled_path = pf.name
+
         with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as tf:
-            full_script = "import bpy\nimport math\n"
+            full_script = "import bpy\nimport math\nimport sys\nimport json\n"
+            full_script += f"sys.path.insert(0, r'{HELPERS_DIR}')\nimport fast_geometry as fg\n"
+            full_script += f"fg.CACHE_DIR = r'{mesh_cache_dir()}'\n"
             full_script += "try:\n    bpy.ops.wm.read_factory_settings(use_empty=True)\nexcept: pass\n\n"
-            full_script += script_content
+            if profiled_path:
+                full_script += f"import bpy_profiler\nbpy_profiler.run(r'{profiled_path}', globals())\n"
+            else:
+                full_script += script_content
             full_script += analysis_helper
             tf.write(full_script)
             temp_path = tf.name
 
         try:
-            result = subprocess.run(
-                [sys.executable, temp_path],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                timeout=30
-            )
-            
-            stdout = result.stdout
-            stderr = result.stderr
+            with get_scheduler().slot("blender"):
+                returncode = None
+                if warm:
+                    try:
+                        stdout, stderr = get_warm_pool().run(temp_path, timeout=timeout_for(30))
+                        returncode = 1 if stderr else 0
+                    except WorkerUnavailable as e:
+                        check_cancelled("Blender run")
+                        logger.warning(f"{e}; running in a fresh subprocess.")
+                if returncode is None:
+                    stdout, stderr, returncode = BlenderOps.run_script(temp_path, timeout_for(30))
             
             # Parse mesh analysis
             mesh_issues = []
+            mesh_metrics = {}
             if "---MESH_ANALYSIS_START---" in stdout:
                 try:
                     analysis_block = stdout.split("---MESH_ANALYSIS_START---")[1].split("---MESH_ANALYSIS_END---")[0].strip()
@@ -69,19 +256,132 @@ print("---MESH_ANALYSIS_END---")
                     for info in mesh_info:
                         if info["issues"]:
                             mesh_issues.extend([f"[{info['name']}] {i}" for i in info["issues"]])
+                    mesh_metrics = BlenderOps.aggregate_metrics(mesh_info)
+                except:
+                    pass
+
+            cache_stats = {}
+            if "---MESH_CACHE_START---" in stdout:
+                try:
+                    cache_stats = json.loads(stdout.split("---MESH_CACHE_START---")[1].split("---MESH_CACHE_END---")[0].strip())
+                    if cache_stats.get("hits") or cache_stats.get("stored"):
+                        logger.info(f"Mesh cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['stored']} stored.")
+                except:
+                    pass
+
+            profile_data = {}
+            if "---PROFILE_START---" in stdout:
+                try:
+                    profile_data = json.loads(stdout.split("---PROFILE_START---")[1].split("---PROFILE_END---")[0].strip())
+                    logger.info(f"Profiled script: {profile_data['total_time']:.2f}s total, "
+                                f"{profile_data['final_evaluation_time']:.2f}s final depsgraph evaluation.")
                 except:
                     pass
+            hotspots = BlenderOps.format_hotspots(profile_data, line_offset=line_offset) if profile_data else ""
 
-            if result.returncode != 0:
-                err_msg = f"BPY Subprocess failed ({result.returncode}).\nStderr: {stderr}"
-                return {"success": False, "error": err_msg, "stdout": stdout, "mesh_issues": mesh_issues}
+            if returncode != 0:
+                err_msg = f"BPY Subprocess failed ({returncode}).\nStderr: {stderr}"
+                return {"success": False, "error": err_msg, "stdout": stdout, "mesh_issues": mesh_issues, "mesh_metrics": mesh_metrics, "cache_stats": cache_stats, "profile": profile_data, "hotspots": hotspots}
                 
-            return {"success": True, "error": None, "stdout": stdout, "mesh_issues": mesh_issues}
+            return {"success": True, "error": None, "stdout": stdout, "mesh_issues": mesh_issues, "mesh_metrics": mesh_metrics, "cache_stats": cache_stats, "profile": profile_data, "hotspots": hotspots}
+        except RunCancelled:
+            raise
         except Exception as e:
-            return {"success": False, "error": str(e), "stdout": "", "mesh_issues": []}
+            return {"success": False, "error": str(e), "stdout": "", "mesh_issues": [], "mesh_metrics": {}, "cache_stats": {}, "profile": {}, "hotspots": ""}
         finally:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            for path in (temp_path, profiled_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            BlenderOps.prune_mesh_cache()
+
+    @staticmethod
+    def run_script(script_path: str, timeout: float):
+        """
+        Runs a script in a fresh interpreter; returns `(stdout, stderr, returncode)`.
+        The child is killed when the current run is cancelled (RunCancelled) or times out.
+        """
+        proc = subprocess.Popen(
+            [sys.executable, script_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8'
+        )
+        try:
+            with on_cancel(proc.kill):
+                stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            # Like subprocess.run: the output produced before the timeout stays available
+            stdout, stderr = proc.communicate()
+            raise subprocess.TimeoutExpired(proc.args, timeout, output=stdout, stderr=stderr)
+        check_cancelled("Blender run")
+        return stdout, stderr, proc.returncode
+
+    @staticmethod
+    def aggregate_metrics(mesh_info: list) -> dict:
+        """Combines the per-object analysis into scene-level metrics for the quality gate."""
+        metrics = [info["metrics"] for info in mesh_info if info.get("metrics")]
+        if not metrics:
+            return {}
+        lows = [m["bounds"][0] for m in metrics]
+        highs = [m["bounds"][1] for m in metrics]
+        bounds_min = [min(b[i] for b in lows) for i in range(3)]
+        bounds_max = [max(b[i] for b in highs) for i in range(3)]
+        return {
+            "objects": len(metrics),
+            "triangles": sum(m["triangles"] for m in metrics),
+            "non_manifold_edges": sum(m["non_manifold_edges"] for m in metrics),
+            "degenerate_faces": sum(m["degenerate_faces"] for m in metrics),
+            "self_intersections": sum(m.get("self_intersections") or 0 for m in metrics),
+            "empty_objects": sum(1 for m in metrics if not m["faces"]),
+            "bounds": [bounds_min, bounds_max],
+            "extent": [hi - lo for lo, hi in zip(bounds_min, bounds_max)],
+        }
+
+    @staticmethod
+    def format_hotspots(profile: dict, top: int = 10, line_offset: int = 0) -> str:
+        """
+        Renders a profile block as a markdown hotspot table (slowest first).
+        Line numbers are shifted back by `line_offset`; lines of the prepended preamble are left out.
+        """
+        total = profile.get("total_time") or 0.0
+        rows = [("line", f"L{l['line'] - line_offset}: `{l['source'][:70]}`", l["time"], l["hits"])
+                for l in profile.get("lines", []) if l["line"] > line_offset]
+        rows += [("bpy.ops", f"`{o['op']}`", o["time"], o["calls"]) for o in profile.get("ops", [])]
+        if profile.get("depsgraph_updates"):
+            rows.append(("depsgraph", "update handlers", profile["depsgraph_time"], profile["depsgraph_updates"]))
+        rows.append(("depsgraph", "final evaluation", profile.get("final_evaluation_time") or 0.0, 1))
+        rows.sort(key=lambda r: r[2], reverse=True)
+
+        table = ["| Kind | Location | Time (s) | Share | Hits |", "|---|---|---|---|---|"]
+        for kind, where, seconds, hits in rows[:top]:
+            share = f"{100 * seconds / total:.0f}%" if total else "-"
+            table.append(f"| {kind} | {where} | {seconds:.3f} | {share} | {hits} |")
+        memory = []
+        if profile.get("peak_rss_mb") is not None:
+            memory.append(f"peak RSS {profile['peak_rss_mb']:.0f} MB")
+        if profile.get("peak_python_mb") is not None:
+            memory.append(f"peak Python heap {profile['peak_python_mb']:.1f} MB")
+        summary = f"Script time {total:.2f}s" + (f", {', '.join(memory)}" if memory else "")
+        return summary + "\n\n" + "\n".join(table)
+
+    @staticmethod
+    def prune_mesh_cache(max_entries: int = None):
+        """Keeps the subtree mesh cache bounded by dropping the least recently used entries."""
+        max_entries = mesh_cache_max_entries() if max_entries is None else max_entries
+        cache_dir = mesh_cache_dir()
+        if not os.path.isdir(cache_dir):
+            return
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith(".npz")]
+        if len(entries) <= max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
 
     @staticmethod
     def validate_stl(file_path: str) -> dict:
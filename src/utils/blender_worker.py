@@ -0,0 +1,56 @@
+"""
+Warm Blender worker executed as a long-lived subprocess (see BlenderOps.execute_bpy(warm=True)).
+
+Importing `bpy` and the helper modules dominates the run time of small
+scripts, so this process pays for it once and then executes one script per
+request. Requests are JSON lines on stdin (`{"script": "/path/to/script.py"}`);
+the script's own output goes to stdout as usual and is followed by one
+`---WORKER_RESULT---{json}` line, so lines printed by Blender's C code cannot
+be confused with the result. Must only depend on `bpy` and the standard library.
+"""
+import json
+import sys
+import traceback
+
+import bpy  # noqa: F401  (the expensive import this worker exists to keep warm)
+
+RESULT_MARKER = "---WORKER_RESULT---"
+
+
+def _reset_helpers():
+    """Helper modules stay imported between jobs; per-run counters must not."""
+    fg = sys.modules.get("fast_geometry")
+    if fg is not None and isinstance(getattr(fg, "CACHE_STATS", None), dict):
+        for key in fg.CACHE_STATS:
+            fg.CACHE_STATS[key] = 0
+
+
+def run_script(path: str):
+    """Executes one script like `python script.py` would; returns the error text or None."""
+    saved_path = list(sys.path)
+    _reset_helpers()
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        exec(compile(source, path, "exec"), {"__name__": "__main__", "__file__": path})
+        return None
+    except SystemExit as e:
+        return None if e.code in (None, 0) else f"SystemExit: {e.code}"
+    except BaseException:
+        return traceback.format_exc()
+    finally:
+        sys.path[:] = saved_path
+
+
+def main():
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        error = run_script(request["script"])
+        sys.stdout.flush()
+        print(RESULT_MARKER + json.dumps({"error": error}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""
+Blueprint helpers shared by the agents and by the code running inside Blender.
+
+Standard library only: this module is imported both as `src.utils.blueprint`
+and, inside the Blender subprocess, as plain `blueprint` (see fast_geometry).
+
+Normalized primitive schema:
+    {"primitive_type": "cube" | "cylinder" | "cone" | "sphere" | "torus",
+     "size": [x, y, z],              # full extents in local space
+     "radius1", "radius2", "depth",  # cones/cylinders
+     "radius", "major_radius", "minor_radius",
+     "location": [x, y, z], "rotation": [rx, ry, rz],  # radians, XYZ Euler
+     "boolean_op": "UNION" | "DIFFERENCE" | "INTERSECT",
+     "name": "...",                  # optional label, ignored by the hashes
+     "children": [...]}              # optional nested sub-assembly
+
+Rotations of an input blueprint are read in the unit named by its top-level
+`"rotation_unit"` ("degrees" or "radians", degrees when absent); a node may
+override it with its own `rotation_unit`. Normalized blueprints declare
+"radians".
+"""
+import hashlib
+import json
+import math
+
+PRIMITIVE_ALIASES = {
+    "cube": "cube", "box": "cube", "cuboid": "cube", "rectangular_prism": "cube",
+    "cylinder": "cylinder", "tube": "cylinder", "disc": "cylinder", "disk": "cylinder",
+    "cone": "cone", "frustum": "cone",
+    "sphere": "sphere", "uv_sphere": "sphere", "uvsphere": "sphere", "ico_sphere": "sphere", "ball": "sphere",
+    "torus": "torus", "ring": "torus", "donut": "torus",
+}
+
+BOOLEAN_OPS = ("UNION", "DIFFERENCE", "INTERSECT")
+
+DEFAULT_ROTATION_UNIT = "degrees"
+
+_FLAT_DIMENSIONS = ("size", "radius", "diameter", "radius1", "radius2", "depth", "height",
+                    "major_radius", "minor_radius")
+
+
+def _vec3(value, default=(0.0, 0.0, 0.0)):
+    """Coerces lists, scalars and {'x','y','z'} dicts to a 3-float list."""
+    if value is None:
+        return list(default)
+    if isinstance(value, (int, float)):
+        return [float(value)] * 3
+    if isinstance(value, dict):
+        return [float(value.get(axis, d)) for axis, d in zip("xyz", default)]
+    values = [float(v) for v in list(value)[:3]]
+    return values + list(default[len(values):])
+
+
+def _number(mapping, *keys, default=None):
+    for key in keys:
+        if isinstance(mapping, dict) and mapping.get(key) is not None:
+            return float(mapping[key])
+    return default
+
+
+def primitive_nodes(blueprint):
+    """Returns the top-level list of primitive nodes, whatever key the Analyst used."""
+    if isinstance(blueprint, list):
+        return blueprint
+    if not isinstance(blueprint, dict):
+        return []
+    for key in ("primitives", "components", "parts", "objects"):
+        if isinstance(blueprint.get(key), list):
+            return blueprint[key]
+    return []
+
+
+def _rotation_unit(value, default=DEFAULT_ROTATION_UNIT):
+    unit = str(value or "").lower()
+    return "radians" if unit.startswith("rad") else "degrees" if unit.startswith("deg") else default
+
+
+def rotation_unit(blueprint) -> str:
+    """Unit of the blueprint's rotations: its `rotation_unit` field, degrees when absent."""
+    return _rotation_unit(blueprint.get("rotation_unit") if isinstance(blueprint, dict) else None)
+
+
+def normalized_nodes(blueprint):
+    """The blueprint's top-level nodes in the normalized schema."""
+    unit = rotation_unit(blueprint)
+    return [normalize_primitive(n, unit) for n in primitive_nodes(blueprint)]
+
+
+def normalize_primitive(node, unit: str = DEFAULT_ROTATION_UNIT):
+    """Maps one loosely-structured LLM blueprint node, with rotations in `unit`, onto the normalized schema."""
+    node = node if isinstance(node, dict) else {}
+    raw_type = str(node.get("primitive_type") or node.get("type") or "cube").lower().replace(" ", "_")
+    ptype = PRIMITIVE_ALIASES.get(raw_type, PRIMITIVE_ALIASES.get(raw_type.split("_")[-1], "cube"))
+
+    dims = node.get("dimensions", node.get("scale"))
+    if dims is None:
+        # Flat (already normalized) nodes carry their dimensions at the top level
+        dims = {k: node[k] for k in _FLAT_DIMENSIONS if node.get(k) is not None}
+    transform = node.get("transform", {}) if isinstance(node.get("transform"), dict) else {}
+    location = transform.get("location", transform.get("position", node.get("location")))
+    rotation = transform.get("rotation", transform.get("rotation_euler", node.get("rotation")))
+    unit = _rotation_unit(transform.get("rotation_unit", node.get("rotation_unit")), unit)
+
+    if isinstance(dims, dict) and dims.get("size") is not None:
+        size = _vec3(dims["size"], default=(1.0, 1.0, 1.0))
+    elif isinstance(dims, dict) and not any(axis in dims for axis in "xyz"):
+        size = None
+    else:
+        size = _vec3(dims, default=(1.0, 1.0, 1.0))
+
+    radius = _number(dims, "radius", default=None)
+    if radius is None:
+        diameter = _number(dims, "diameter", default=None)
+        radius = diameter / 2 if diameter is not None else None
+    depth = _number(dims, "depth", "height", "length", default=None)
+
+    if size is None:
+        r = radius if radius is not None else 0.5
+        d = depth if depth is not None else 2 * r
+        size = [2 * r, 2 * r, d]
+
+    normalized = {"primitive_type": ptype, "size": size}
+    if ptype in ("cylinder", "cone"):
+        r1 = _number(dims, "radius1", "bottom_radius", default=radius if radius is not None else size[0] / 2)
+        r2 = _number(dims, "radius2", "top_radius", default=r1 if ptype == "cylinder" else 0.0)
+        normalized.update({"radius1": r1, "radius2": r2, "depth": depth if depth is not None else size[2]})
+    elif ptype == "sphere":
+        normalized["radius"] = radius if radius is not None else max(size) / 2
+    elif ptype == "torus":
+        major = _number(dims, "major_radius", default=None)
+        minor = _number(dims, "minor_radius", default=None)
+        if major is None:
+            major = (radius if radius is not None else size[0] / 2) - (minor or 0.0)
+        if minor is None:
+            minor = max(major * 0.25, 1e-4)
+        normalized.update({"major_radius": major, "minor_radius": minor})
+
+    normalized["location"] = _vec3(location)
+    rot = _vec3(rotation)
+    normalized["rotation"] = [math.radians(a) for a in rot] if unit == "degrees" else rot
+
+    op = str(node.get("boolean_op") or node.get("operation") or "UNION").upper()
+    normalized["boolean_op"] = op if op in BOOLEAN_OPS else "UNION"
+    if node.get("name"):
+        normalized["name"] = str(node["name"])
+    if isinstance(node.get("children"), list) and node["children"]:
+        normalized["children"] = [normalize_primitive(c, unit) for c in node["children"]]
+    return normalized
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:24]
+
+
+def node_key(node):
+    """Hash of a single normalized node (type, dimensions, transform, boolean op), without children or name."""
+    leaf = {k: v for k, v in node.items() if k not in ("children", "name")}
+    leaf = {k: [round(x, 6) for x in v] if isinstance(v, list) else (round(v, 6) if isinstance(v, float) else v)
+            for k, v in leaf.items()}
+    return _digest(leaf)
+
+
+def subtree_key(node):
+    """Hash of a node including, recursively, its children."""
+    children = node.get("children") or []
+    if not children:
+        return node_key(node)
+    return _digest([node_key(node)] + [subtree_key(c) for c in children])
+
+
+def combine_keys(op, keys):
+    """Key for the result of applying `op` across a list of operand keys."""
+    return _digest([op] + list(keys))
+
+
+def blueprint_key(blueprint):
+    """Hash of a whole blueprint as written (used to recognise identical designs)."""
+    return _digest(blueprint if blueprint is not None else {})
+
+
+# --- Sub-assembly splitting ---
+
+def node_bounds(node):
+    """Conservative world-space AABB `(min, max)` of a normalized node and its children."""
+    ptype = node["primitive_type"]
+    if ptype in ("cylinder", "cone"):
+        r = max(node["radius1"], node["radius2"])
+        half = [r, r, node["depth"] / 2]
+    elif ptype == "sphere":
+        half = [node["radius"]] * 3
+    elif ptype == "torus":
+        outer = node["major_radius"] + node["minor_radius"]
+        half = [outer, outer, node["minor_radius"]]
+    else:
+        half = [abs(s) / 2 for s in node["size"]]
+    if any(abs(a) > 1e-9 for a in node["rotation"]):
+        # Any rotation fits inside the sphere around the local half-diagonal.
+        half = [math.sqrt(sum(h * h for h in half))] * 3
+    low = [c - h for c, h in zip(node["location"], half)]
+    high = [c + h for c, h in zip(node["location"], half)]
+    for child in node.get("children") or []:
+        c_low, c_high = node_bounds(child)
+        low = [min(a, b) for a, b in zip(low, c_low)]
+        high = [max(a, b) for a, b in zip(high, c_high)]
+    return low, high
+
+
+def bounds_overlap(a, b, margin=1e-4):
+    """True when two AABBs intersect or touch (within `margin`)."""
+    return all(a[0][i] <= b[1][i] + margin and b[0][i] <= a[1][i] + margin for i in range(3))
+
+
+def split_assemblies(blueprint, max_parts=6):
+    """
+    Splits the top level of a blueprint into independent sub-assemblies.
+
+    UNION nodes whose bounds touch are grouped into one part (so every part can be
+    built and validated on its own and the parts only need joining); DIFFERENCE /
+    INTERSECT nodes are returned as `operations`, applied to the joined parts in
+    their original order. Returns None when the blueprint cannot be split without
+    changing its meaning (a UNION after an overlapping cutter or after any
+    INTERSECT) or when it forms a single connected part.
+    """
+    nodes = normalized_nodes(blueprint)
+    unions, operations = [], []
+    for node in nodes:
+        if node["boolean_op"] == "UNION":
+            unions.append((node, node_bounds(node), node.get("name") or node["primitive_type"]))
+        elif unions:
+            # Leading cutters have nothing to cut yet, exactly as in fg.build_blueprint.
+            operations.append((node, node_bounds(node), len(unions)))
+
+    for op_node, op_bounds, position in operations:
+        for node, bounds, _ in unions[position:]:
+            if op_node["boolean_op"] == "INTERSECT" or bounds_overlap(bounds, op_bounds):
+                return None
+
+    # Connected components of touching UNION nodes (union-find)
+    parent = list(range(len(unions)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(unions)):
+        for j in range(i + 1, len(unions)):
+            if bounds_overlap(unions[i][1], unions[j][1]):
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(unions)):
+        groups.setdefault(find(i), []).append(i)
+    components = sorted(groups.values(), key=lambda g: g[0])
+    if len(components) < 2:
+        return None
+
+    # Disjoint parts can be joined freely, so the smallest ones are merged down to `max_parts`.
+    while len(components) > max(2, max_parts):
+        components.sort(key=len)
+        merged = sorted(components[0] + components[1])
+        components = sorted([merged] + components[2:], key=lambda g: g[0])
+
+    parts = []
+    for number, indices in enumerate(components, start=1):
+        part_nodes = [unions[i][0] for i in indices]
+        labels = [unions[i][2] for i in indices]
+        parts.append({
+            "name": f"part_{number}",
+            "labels": labels,
+            "key": combine_keys("PART", [subtree_key(n) for n in part_nodes]),
+            "nodes": part_nodes,
+        })
+    return {"parts": parts, "operations": [node for node, _, _ in operations]}
+
+
+# --- Optimizer ---
+
+_EPS = 1e-6
+_QUARTER = math.pi / 2
+# Canonical rotation per principal axis for rotationally symmetric primitives, and the
+# direction that rotation points the local +Z axis to (sign), see _canonicalize.
+_AXIS_ROTATIONS = {2: ([0.0, 0.0, 0.0], 1), 0: ([0.0, _QUARTER, 0.0], 1), 1: ([_QUARTER, 0.0, 0.0], -1)}
+
+
+def rotation_matrix(rotation):
+    """XYZ Euler angles to a 3x3 rotation matrix (R = Rz @ Ry @ Rx, as in Blender)."""
+    (cx, cy, cz), (sx, sy, sz) = [math.cos(a) for a in rotation], [math.sin(a) for a in rotation]
+    return [
+        [cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz],
+        [cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz],
+        [-sy, sx * cy, cx * cy],
+    ]
+
+
+def _axis(node):
+    """Principal axis (0, 1, 2) of an axis-aligned symmetric primitive, else None."""
+    for axis, (rotation, _) in _AXIS_ROTATIONS.items():
+        if all(abs(a - b) < _EPS for a, b in zip(node["rotation"], rotation)):
+            return axis
+    return None
+
+
+def _canonicalize(node):
+    """
+    Wraps angles to [-pi, pi] and removes rotations that do not change the shape:
+    any rotation of a sphere, quarter turns of a cube (folded into its size) and
+    quarter turns of cylinders/cones/tori (mapped onto one rotation per axis).
+    Returns `(node, changed)`.
+    """
+    node = dict(node)
+    rotation = [math.remainder(a, 2 * math.pi) for a in node["rotation"]]
+    rotation = [0.0 if abs(a) < _EPS else a for a in rotation]
+    ptype = node["primitive_type"]
+    if ptype == "sphere":
+        rotation = [0.0, 0.0, 0.0]
+    elif any(rotation) and all(abs(a / _QUARTER - round(a / _QUARTER)) < _EPS for a in rotation):
+        matrix = [[round(v) for v in row] for row in rotation_matrix(rotation)]
+        if ptype == "cube":
+            node["size"] = [sum(abs(matrix[i][j]) * node["size"][j] for j in range(3)) for i in range(3)]
+            rotation = [0.0, 0.0, 0.0]
+        else:
+            z_axis = [matrix[i][2] for i in range(3)]
+            axis = next(i for i in range(3) if z_axis[i])
+            rotation, sign = list(_AXIS_ROTATIONS[axis][0]), _AXIS_ROTATIONS[axis][1]
+            if ptype in ("cylinder", "cone") and z_axis[axis] != sign:
+                node["radius1"], node["radius2"] = node["radius2"], node["radius1"]
+    changed = any(abs(a - b) > _EPS for a, b in zip(rotation, node["rotation"]))
+    node["rotation"] = rotation
+    return node, changed
+
+
+def _is_degenerate(node):
+    ptype = node["primitive_type"]
+    if ptype in ("cylinder", "cone"):
+        return node["depth"] <= _EPS or max(node["radius1"], node["radius2"]) <= _EPS
+    if ptype == "sphere":
+        return node["radius"] <= _EPS
+    if ptype == "torus":
+        return node["minor_radius"] <= _EPS or node["major_radius"] <= _EPS
+    return min(node["size"]) <= _EPS
+
+
+def _contains(outer, inner):
+    """True when `inner` lies entirely inside `outer` (exact for axis-aligned boxes and duplicates)."""
+    if outer.get("children"):
+        return False
+    if not inner.get("children") and node_key(dict(outer, boolean_op="UNION")) == node_key(dict(inner, boolean_op="UNION")):
+        return True
+    if outer["primitive_type"] != "cube" or any(outer["rotation"]):
+        return False
+    (o_low, o_high), (i_low, i_high) = node_bounds(outer), node_bounds(inner)
+    return all(o_low[i] - _EPS <= i_low[i] and i_high[i] <= o_high[i] + _EPS for i in range(3))
+
+
+def _merge(a, b):
+    """Single primitive equal to the union of `a` and `b` (stacked cubes or coaxial cylinders), or None."""
+    if a.get("children") or b.get("children") or a["primitive_type"] != b["primitive_type"]:
+        return None
+    if a["primitive_type"] == "cube" and not any(a["rotation"]) and not any(b["rotation"]):
+        for k in range(3):
+            others = [i for i in range(3) if i != k]
+            if any(abs(a["location"][i] - b["location"][i]) > _EPS or abs(a["size"][i] - b["size"][i]) > _EPS for i in others):
+                continue
+            lows = [n["location"][k] - n["size"][k] / 2 for n in (a, b)]
+            highs = [n["location"][k] + n["size"][k] / 2 for n in (a, b)]
+            if lows[0] > highs[1] + _EPS or lows[1] > highs[0] + _EPS:
+                return None
+            merged = dict(a, size=list(a["size"]), location=list(a["location"]))
+            merged["size"][k] = max(highs) - min(lows)
+            merged["location"][k] = (max(highs) + min(lows)) / 2
+            return merged
+        return None
+    if a["primitive_type"] == "cylinder":
+        radii = {a["radius1"], a["radius2"], b["radius1"], b["radius2"]}
+        k = _axis(a)
+        if k is None or _axis(b) != k or max(radii) - min(radii) > _EPS:
+            return None
+        others = [i for i in range(3) if i != k]
+        if any(abs(a["location"][i] - b["location"][i]) > _EPS for i in others):
+            return None
+        lows = [n["location"][k] - n["depth"] / 2 for n in (a, b)]
+        highs = [n["location"][k] + n["depth"] / 2 for n in (a, b)]
+        if lows[0] > highs[1] + _EPS or lows[1] > highs[0] + _EPS:
+            return None
+        depth = max(highs) - min(lows)
+        merged = dict(a, depth=depth, location=list(a["location"]))
+        merged["location"][k] = (max(highs) + min(lows)) / 2
+        merged["size"] = [2 * a["radius1"], 2 * a["radius1"], depth]
+        return merged
+    return None
+
+
+def _count_primitives(nodes):
+    return sum(1 + _count_primitives(n.get("children") or []) for n in nodes)
+
+
+def _count_steps(nodes):
+    """Sequential boolean steps on the accumulated mesh (one per change of op, see fg._build_group)."""
+    ops = [n["boolean_op"] for n in nodes]
+    return sum(1 for prev, cur in zip(ops, ops[1:]) if prev != cur)
+
+
+def _optimize_nodes(nodes, stats, keep_first=False):
+    """One optimizer pass over a node list; with `keep_first`, nodes[0] is never touched."""
+    canonical = []
+    for i, node in enumerate(nodes):
+        if not (keep_first and i == 0):
+            node, changed = _canonicalize(node)
+            stats["normalized_transforms"] += changed
+        if node.get("children"):
+            own = dict(node, children=[], boolean_op="UNION")
+            children = _optimize_nodes([own] + node["children"], stats, keep_first=True)[1:]
+            node = dict(node, children=children) if children else {k: v for k, v in node.items() if k != "children"}
+        canonical.append(node)
+
+    # 1. No-ops: degenerate primitives, cutters with nothing to cut
+    kept = []
+    for i, node in enumerate(canonical):
+        if keep_first and i == 0:
+            kept.append(node)
+            continue
+        unions = [n for n in kept if n["boolean_op"] == "UNION"]
+        if _is_degenerate(node) and not node.get("children") and node["boolean_op"] != "INTERSECT":
+            stats["removed_noops"] += 1
+        elif node["boolean_op"] != "UNION" and not unions:
+            stats["removed_noops"] += 1
+        elif node["boolean_op"] == "DIFFERENCE" and not any(
+                bounds_overlap(node_bounds(u), node_bounds(node), margin=-_EPS) for u in unions):
+            stats["removed_noops"] += 1
+        else:
+            kept.append(node)
+
+    # 2. UNION primitives hidden inside another one. A container that comes earlier
+    #    only covers them when no cutter sits in between (it would be re-filled).
+    removed = set()
+    # Walking backwards keeps the first of two identical primitives
+    for i in reversed(range(len(kept))):
+        inner = kept[i]
+        if inner["boolean_op"] != "UNION" or (keep_first and i == 0):
+            continue
+        for j, outer in enumerate(kept):
+            if j == i or j in removed or outer["boolean_op"] != "UNION" or not _contains(outer, inner):
+                continue
+            if j < i and any(n["boolean_op"] != "UNION" for n in kept[j + 1:i]):
+                continue
+            removed.add(i)
+            stats["removed_contained"] += 1
+            break
+    kept = [n for i, n in enumerate(kept) if i not in removed]
+
+    # 3. Reorder: a UNION that does not touch the preceding cutters moves in front of them,
+    #    so positive geometry is combined first and cutters are batched into one step.
+    ordered = []
+    for node in kept:
+        position = len(ordered)
+        if node["boolean_op"] == "UNION":
+            bounds = node_bounds(node)
+            while (position > (1 if keep_first else 0) and ordered[position - 1]["boolean_op"] == "DIFFERENCE"
+                   and not bounds_overlap(bounds, node_bounds(ordered[position - 1]), margin=-_EPS)):
+                position -= 1
+            stats["reordered"] += position != len(ordered)
+        ordered.insert(position, node)
+
+    # 4. Merge stacked cubes / coaxial cylinders within each UNION run
+    result = []
+    for i, node in enumerate(ordered):
+        if node["boolean_op"] == "UNION" and not (keep_first and i == 0):
+            run_start = len(result)
+            while run_start > 0 and result[run_start - 1]["boolean_op"] == "UNION":
+                run_start -= 1
+            first = 1 if keep_first and run_start == 0 else run_start
+            merged = True
+            while merged:
+                merged = False
+                for j in range(first, len(result)):
+                    combined = _merge(result[j], node)
+                    if combined is not None:
+                        names = [n["name"] for n in (result[j], node) if n.get("name")]
+                        if names:
+                            combined["name"] = " + ".join(names)
+                        node = combined
+                        del result[j]
+                        stats["merged"] += 1
+                        merged = True
+                        break
+        result.append(node)
+    return result
+
+
+def optimize_blueprint(blueprint):
+    """
+    Local optimization pass between the Analyst and code generation. Returns
+    `(optimized_blueprint, report)`; the blueprint comes back in the normalized
+    schema (other top-level keys are kept) and builds the same solid with fewer
+    boolean operations:
+      * transforms normalized (angle wrapping, symmetric rotations folded away)
+      * no-op primitives removed (zero-size, cutters that miss everything)
+      * UNION primitives contained in another primitive removed
+      * UNIONs moved ahead of cutters they do not touch, so cutters are batched
+      * stacked cubes and coaxial cylinders merged into one primitive
+    """
+    nodes = normalized_nodes(blueprint)
+    stats = {"normalized_transforms": 0, "removed_noops": 0, "removed_contained": 0, "reordered": 0, "merged": 0}
+    optimized = nodes
+    # Each removal can expose another (e.g. a cutter left leading), so iterate to a fixed point.
+    for _ in range(5):
+        previous, optimized = optimized, _optimize_nodes(optimized, stats) if optimized else []
+        if optimized == previous:
+            break
+
+    before, after = _count_primitives(nodes), _count_primitives(optimized)
+    report = dict(stats,
+                  primitives_before=before, primitives_after=after,
+                  removed_operations=before - after,
+                  boolean_steps_before=_count_steps(nodes), boolean_steps_after=_count_steps(optimized))
+
+    key = next((k for k in ("primitives", "components", "parts", "objects")
+                if isinstance(blueprint, dict) and isinstance(blueprint.get(k), list)), "primitives")
+    result = dict(blueprint) if isinstance(blueprint, dict) else {}
+    result[key] = optimized
+    result["rotation_unit"] = "radians"
+    return result, report
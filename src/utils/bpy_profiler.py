@@ -0,0 +1,167 @@
+"""
+Line-level profiler for generated BPY scripts, executed INSIDE Blender.
+
+`run(script_path, namespace)` executes the script under a trace function that
+only instruments frames of that file, so library code runs untraced and its
+cost is attributed to the calling line. It additionally records:
+  * wall time and call count per `bpy.ops` operator
+  * time spent in depsgraph updates (via app handlers) and the final evaluation
+  * peak process RSS and peak Python heap (tracemalloc)
+The result is printed as a JSON block parsed by BlenderOps.
+"""
+import json
+import sys
+import time
+import tracemalloc
+import bpy
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+class _OpsTimer:
+    """Wraps the bpy.ops operator call to time each operator by idname."""
+
+    def __init__(self):
+        self.stats = {}
+        # Internal class behind every `bpy.ops.<module>.<op>` callable (Blender 2.9+)
+        self._cls = getattr(bpy.ops, "_BPyOpsSubModOp", None)
+        self._original = None
+
+    def __enter__(self):
+        if self._cls is None:
+            return self
+        original = self._cls.__call__
+        stats = self.stats
+
+        def timed_call(op, *args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return original(op, *args, **kwargs)
+            finally:
+                try:
+                    name = op.idname_py()
+                except Exception:
+                    name = repr(op)
+                entry = stats.setdefault(name, [0.0, 0])
+                entry[0] += time.perf_counter() - t0
+                entry[1] += 1
+
+        self._original = original
+        self._cls.__call__ = timed_call
+        return self
+
+    def __exit__(self, *exc):
+        if self._original is not None:
+            self._cls.__call__ = self._original
+        return False
+
+
+class _DepsgraphTimer:
+    def __init__(self):
+        self.total = 0.0
+        self.updates = 0
+        self._start = None
+
+    def _pre(self, *args):
+        self._start = time.perf_counter()
+
+    def _post(self, *args):
+        if self._start is not None:
+            self.total += time.perf_counter() - self._start
+            self.updates += 1
+            self._start = None
+
+    def __enter__(self):
+        handlers = bpy.app.handlers
+        if hasattr(handlers, "depsgraph_update_pre"):
+            handlers.depsgraph_update_pre.append(self._pre)
+            handlers.depsgraph_update_post.append(self._post)
+        return self
+
+    def __exit__(self, *exc):
+        handlers = bpy.app.handlers
+        for handler_list, fn in ((getattr(handlers, "depsgraph_update_pre", []), self._pre),
+                                 (getattr(handlers, "depsgraph_update_post", []), self._post)):
+            if fn in handler_list:
+                handler_list.remove(fn)
+        return False
+
+
+def run(script_path, namespace, top=15):
+    """Executes `script_path` in `namespace` and prints the profile block."""
+    with open(script_path, encoding="utf-8") as f:
+        source = f.read()
+    lines = source.splitlines()
+    code = compile(source, script_path, "exec")
+
+    line_stats = {}
+    frame_state = {}
+
+    def local_trace(frame, event, arg):
+        now = time.perf_counter()
+        key = id(frame)
+        previous = frame_state.get(key)
+        if previous is not None:
+            entry = line_stats.setdefault(previous[0], [0.0, 0])
+            entry[0] += now - previous[1]
+            entry[1] += 1
+        if event == "return":
+            frame_state.pop(key, None)
+        else:
+            frame_state[key] = (frame.f_lineno, time.perf_counter())
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        if frame.f_code.co_filename == script_path:
+            return local_trace
+        return None
+
+    error = None
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with _OpsTimer() as ops, _DepsgraphTimer() as deps:
+        sys.settrace(global_trace)
+        try:
+            exec(code, namespace)
+        except BaseException as e:
+            error = e
+        finally:
+            sys.settrace(None)
+        total = time.perf_counter() - t0
+        t_eval = time.perf_counter()
+        try:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            depsgraph.update()
+        except Exception:
+            pass
+        final_eval = time.perf_counter() - t_eval
+    _, peak_python = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    hotspots = sorted(line_stats.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+    profile = {
+        "total_time": total,
+        "lines": [{"line": n, "source": lines[n - 1].strip() if 0 < n <= len(lines) else "",
+                   "time": t, "hits": hits} for n, (t, hits) in hotspots],
+        "ops": sorted(({"op": name, "time": t, "calls": calls} for name, (t, calls) in ops.stats.items()),
+                      key=lambda o: o["time"], reverse=True)[:top],
+        "depsgraph_time": deps.total,
+        "depsgraph_updates": deps.updates,
+        "final_evaluation_time": final_eval,
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_python_mb": peak_python / (1024 * 1024),
+    }
+    print("---PROFILE_START---")
+    print(json.dumps(profile))
+    print("---PROFILE_END---")
+
+    if error is not None:
+        raise error
@@ -0,0 +1,214 @@
+"""
+Cooperative cancellation and end-to-end deadlines for runs.
+
+Every run of a session (`thread_id`) gets a CancelToken. The app binds it to
+the current context, so it follows the work the same way the scheduler session
+does: into graph nodes, parallel sub-assembly tasks, LLM calls and Blender
+executions. Long operations register what must happen when the run is
+cancelled (`on_cancel`): the Blender child process is killed and pending LLM
+requests are aborted. Nodes call `check_cancelled()` before starting expensive
+work. A new run for the same thread cancels the previous one. An optional
+deadline cancels the token automatically once it passes.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from src.config.logger import get_logger
+
+logger = get_logger("Cancellation")
+
+# How long a new run waits for the run it superseded to wind down
+CANCEL_GRACE_SECONDS = 10.0
+
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+class RunCancelled(Exception):
+    """Raised inside a run whose token was cancelled or whose deadline passed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self, thread_id: str, deadline_seconds: float = None):
+        self.thread_id = thread_id
+        self.event = threading.Event()
+        self.finished = threading.Event()
+        self.reason = None
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self._callbacks = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._timer = None
+        if deadline_seconds:
+            self._timer = threading.Timer(deadline_seconds, self.cancel, args=(f"deadline of {deadline_seconds:g}s exceeded",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancels the run and runs every registered callback once."""
+        with self._lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        logger.warning(f"[{self.thread_id[:8]}] Run cancelled: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancel callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Registers `callback` (called immediately if already cancelled); returns an unregister function."""
+        with self._lock:
+            if not self.event.is_set():
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = callback
+                return lambda: self._callbacks.pop(key, None)
+        callback()
+        return lambda: None
+
+    def remaining(self):
+        """Seconds left until the deadline, or None without one."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def check(self, what: str = ""):
+        if self.event.is_set():
+            raise RunCancelled(self.reason + (f" ({what})" if what else ""))
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+        self.finished.set()
+
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def start_run(thread_id: str, deadline_seconds: float = None) -> CancelToken:
+    """
+    Creates the token of a new run for `thread_id`. A run still in flight for the
+    same thread is cancelled first, and given a moment to release its resources.
+    """
+    if deadline_seconds is None:
+        # Optional end-to-end budget per user turn (0 = no deadline), read per run so .env is loaded by then
+        deadline_seconds = float(os.getenv("RUN_DEADLINE_SECONDS", "0"))
+    token = CancelToken(thread_id, deadline_seconds)
+    with _runs_lock:
+        previous = _runs.get(thread_id)
+        _runs[thread_id] = token
+    if previous is not None and not previous.finished.is_set():
+        previous.cancel("superseded by a new request")
+        if not previous.finished.wait(CANCEL_GRACE_SECONDS):
+            logger.warning(f"[{thread_id[:8]}] Previous run did not stop within {CANCEL_GRACE_SECONDS:.0f}s.")
+    return token
+
+
+def finish_run(token: CancelToken):
+    token.close()
+    with _runs_lock:
+        if _runs.get(token.thread_id) is token:
+            del _runs[token.thread_id]
+
+
+def cancel_run(thread_id: str, reason: str = "cancelled") -> bool:
+    """Cancels the in-flight run of `thread_id`; returns False when there is none."""
+    with _runs_lock:
+        token = _runs.get(thread_id)
+    if token is None or token.finished.is_set():
+        return False
+    token.cancel(reason)
+    return True
+
+
+@contextmanager
+def run_scope(thread_id: str, deadline_seconds: float = None):
+    """Starts a run for `thread_id` and binds its token to the current context for the duration of the block."""
+    token = start_run(thread_id, deadline_seconds)
+    context_token = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(context_token)
+        finish_run(token)
+
+
+def current_token():
+    return _current_token.get()
+
+
+def check_cancelled(what: str = ""):
+    """Raises RunCancelled if the current run was cancelled; a no-op outside of runs."""
+    token = _current_token.get()
+    if token is not None:
+        token.check(what)
+
+
+def timeout_for(default: float) -> float:
+    """`default` capped by the time left until the current run's deadline."""
+    token = _current_token.get()
+    remaining = token.remaining() if token is not None else None
+    return default if remaining is None else min(default, remaining)
+
+
+@contextmanager
+def on_cancel(callback):
+    """Calls `callback` if the current run is cancelled while the block is running."""
+    token = _current_token.get()
+    unregister = token.on_cancel(callback) if token is not None else (lambda: None)
+    try:
+        yield
+    finally:
+        unregister()
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _event_loop():
+    """The shared event loop of all async requests, running in a daemon thread."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-requests", daemon=True).start()
+        return _loop
+
+
+def run_coroutine(factory):
+    """
+    Runs the coroutine made by `factory()` on the shared event loop and waits for
+    it. The loop lives as long as the process, so async clients (and their
+    connection pools) can be reused across calls. If the current run is cancelled
+    meanwhile, the task is cancelled (which aborts pending HTTP requests) and
+    RunCancelled is raised.
+    """
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+    future = asyncio.run_coroutine_threadsafe(factory(), _event_loop())
+    if token is None:
+        return future.result()
+    unregister = token.on_cancel(future.cancel)
+    try:
+        return future.result()
+    except (asyncio.CancelledError, concurrent.futures.CancelledError):
+        raise RunCancelled(token.reason or "cancelled")
+    finally:
+        unregister()
@@ -0,0 +1,161 @@
+"""
+Local retrieval index of successful designs.
+
+Every run that passes QA is stored with its request text, blueprint, BPY
+script and mesh descriptors. Requests are embedded with hashed word / bigram /
+character-trigram features (no network embedding service) into a compact
+float32 matrix and searched with cosine similarity.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+import numpy as np
+from src.utils.blueprint import blueprint_key
+from src.config.logger import get_logger
+
+logger = get_logger("DesignIndex")
+
+EMBEDDING_DIM = 1024
+INDEX_DIR = os.getenv("DESIGN_INDEX_DIR", os.path.join(os.getcwd(), "cache", "design_index"))
+# Similarity above which a stored blueprint is reused as-is (skipping the Analyst LLM)
+REUSE_THRESHOLD = float(os.getenv("DESIGN_INDEX_REUSE", "0.92"))
+# Similarity above which a stored design is offered to the Analyst as a reference
+ADAPT_THRESHOLD = float(os.getenv("DESIGN_INDEX_ADAPT", "0.6"))
+
+STOP_WORDS = {"a", "an", "the", "of", "with", "and", "to", "for", "in", "on", "me", "please", "make", "create", "design"}
+
+
+def _features(text: str):
+    words = [w for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in STOP_WORDS]
+    feats = [(f"w:{w}", 1.0) for w in words]
+    feats += [(f"b:{a}_{b}", 0.7) for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        feats += [(f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2)]
+    return feats
+
+
+def embed(text: str) -> np.ndarray:
+    """Signed feature hashing into an L2-normalized vector."""
+    vec = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feat, weight in _features(text):
+        h = zlib.crc32(feat.encode("utf-8"))
+        vec[h % EMBEDDING_DIM] += weight if (h >> 31) & 1 else -weight
+    vec = np.sign(vec) * np.log1p(np.abs(vec))
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def geometric_descriptor(mesh_metrics: dict) -> dict:
+    """Scale-free shape summary of a finished mesh."""
+    extent = sorted(mesh_metrics.get("extent") or [0.0, 0.0, 0.0], reverse=True)
+    longest = extent[0] or 1.0
+    return {
+        "extent": extent,
+        "aspect": [round(e / longest, 4) for e in extent],
+        "triangles": mesh_metrics.get("triangles", 0),
+        "objects": mesh_metrics.get("objects", 0),
+    }
+
+
+class DesignIndex:
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._records = None
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.index_dir, "vectors.npy")
+
+    @property
+    def _records_path(self):
+        return os.path.join(self.index_dir, "records.jsonl")
+
+    def _load(self):
+        if self._records is not None:
+            return
+        self._records, self._vectors = [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        if os.path.exists(self._records_path) and os.path.exists(self._vectors_path):
+            try:
+                with open(self._records_path, encoding="utf-8") as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+                vectors = np.load(self._vectors_path)
+                if len(records) == len(vectors):
+                    self._records, self._vectors = records, vectors
+                    logger.info(f"Loaded design index with {len(records)} entries.")
+                else:
+                    logger.warning("Design index files are out of sync; starting empty.")
+            except Exception as e:
+                logger.warning(f"Failed to load design index: {e}")
+
+    def _save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_records = self._records_path + ".tmp"
+        with open(tmp_records, "w", encoding="utf-8") as f:
+            for record in self._records:
+                f.write(json.dumps(record) + "\n")
+        tmp_vectors = self._vectors_path + ".tmp.npy"
+        np.save(tmp_vectors, self._vectors)
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_records, self._records_path)
+
+    def add(self, input_data: str, blueprint: dict, bpy_code: str, mesh_metrics: dict = None):
+        """Stores a successful run; a design with the same blueprint replaces the older entry."""
+        record = {
+            "input": input_data,
+            "blueprint": blueprint,
+            "bpy_code": bpy_code,
+            "blueprint_key": blueprint_key(blueprint),
+            "geometry": geometric_descriptor(mesh_metrics or {}),
+            "created": time.time(),
+        }
+        vector = embed(input_data)
+        with self._lock:
+            self._load()
+            existing = [i for i, r in enumerate(self._records) if r["blueprint_key"] == record["blueprint_key"]]
+            if existing:
+                self._records[existing[0]] = record
+                self._vectors[existing[0]] = vector
+            else:
+                self._records.append(record)
+                self._vectors = np.vstack([self._vectors, vector[None, :]])
+            self._save()
+        logger.info(f"Indexed design '{input_data[:50]}' ({len(self._records)} designs stored).")
+
+    def search(self, text: str, k: int = 3):
+        """Returns up to `k` `(similarity, record)` pairs, most similar first."""
+        with self._lock:
+            self._load()
+            if not len(self._records):
+                return []
+            scores = self._vectors @ embed(text)
+            top = np.argsort(-scores)[:k]
+            return [(float(scores[i]), self._records[i]) for i in top]
+
+    def find_by_blueprint(self, blueprint: dict):
+        """Returns the stored record built from exactly this blueprint, if any."""
+        key = blueprint_key(blueprint)
+        with self._lock:
+            self._load()
+            for record in self._records:
+                if record["blueprint_key"] == key:
+                    return record
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_design_index() -> DesignIndex:
+    """Process-wide index instance."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DesignIndex()
+        return _index
@@ -0,0 +1,385 @@
+"""
+Fast geometry helpers preloaded into every Blender run as `fg`.
+
+This module is executed INSIDE Blender (see BlenderOps.execute_bpy), so it must
+only depend on `bpy`, `bmesh` and the standard library.
+
+Primitives are built directly with bmesh into new mesh datablocks, which avoids
+the operator overhead (context checks, undo pushes, scene updates) of calling
+`bpy.ops.mesh.primitive_*_add` once per part. Booleans are batched: every
+operand is attached as a modifier on the target and the whole stack is evaluated
+in a single depsgraph pass.
+
+`build_blueprint` assembles a whole blueprint tree and caches every boolean
+result on disk, keyed by the hash of the subtree that produced it (see
+src/utils/blueprint.py). When only one primitive changes, every unchanged
+subtree is loaded from the cache and only the path from the edited leaf to
+the root is recomputed.
+"""
+import math
+import os
+import bpy
+import bmesh
+from mathutils import Euler, Matrix
+import blueprint as bp
+
+# Set by BlenderOps before the generated script runs; None disables the mesh cache.
+CACHE_DIR = None
+CACHE_STATS = {"hits": 0, "misses": 0, "stored": 0}
+
+# Above this many operands (or faces) the EXACT solver becomes the bottleneck.
+FAST_SOLVER_OPERANDS = 8
+FAST_SOLVER_FACES = 200000
+
+
+def _link(bm, name, location=(0, 0, 0), rotation=(0, 0, 0)):
+    """Writes a bmesh into a new object linked to the active scene."""
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    obj.location = location
+    obj.rotation_euler = rotation
+    return obj
+
+
+def _bm_cube(size):
+    if isinstance(size, (int, float)):
+        size = (size, size, size)
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=1.0)
+    bmesh.ops.scale(bm, vec=size, verts=bm.verts)
+    return bm
+
+
+def _bm_cone(radius1, radius2, depth, segments):
+    bm = bmesh.new()
+    bmesh.ops.create_cone(
+        bm, cap_ends=True, cap_tris=False, segments=segments,
+        radius1=radius1, radius2=radius2, depth=depth
+    )
+    return bm
+
+
+def _bm_sphere(radius, segments, rings):
+    bm = bmesh.new()
+    bmesh.ops.create_uvsphere(bm, u_segments=segments, v_segments=rings, radius=radius)
+    return bm
+
+
+def _bm_torus(major_radius, minor_radius, major_segments, minor_segments):
+    bm = bmesh.new()
+    rings = []
+    for i in range(major_segments):
+        u = 2 * math.pi * i / major_segments
+        ring = []
+        for j in range(minor_segments):
+            v = 2 * math.pi * j / minor_segments
+            r = major_radius + minor_radius * math.cos(v)
+            ring.append(bm.verts.new((r * math.cos(u), r * math.sin(u), minor_radius * math.sin(v))))
+        rings.append(ring)
+    for i in range(major_segments):
+        a, b = rings[i], rings[(i + 1) % major_segments]
+        for j in range(minor_segments):
+            k = (j + 1) % minor_segments
+            bm.faces.new((a[j], b[j], b[k], a[k]))
+    return bm
+
+
+def cube(name="Cube", size=(1, 1, 1), location=(0, 0, 0), rotation=(0, 0, 0)):
+    """Box with full edge lengths `size` (x, y, z), centered on its origin."""
+    return _link(_bm_cube(size), name, location, rotation)
+
+
+def cylinder(name="Cylinder", radius=0.5, depth=1.0, segments=32, location=(0, 0, 0), rotation=(0, 0, 0)):
+    """Capped cylinder along local Z."""
+    return cone(name, radius, radius, depth, segments, location, rotation)
+
+
+def cone(name="Cone", radius1=0.5, radius2=0.0, depth=1.0, segments=32, location=(0, 0, 0), rotation=(0, 0, 0)):
+    """Capped cone (or frustum) along local Z; `radius1` is the bottom radius."""
+    return _link(_bm_cone(radius1, radius2, depth, segments), name, location, rotation)
+
+
+def sphere(name="Sphere", radius=0.5, segments=32, rings=16, location=(0, 0, 0), rotation=(0, 0, 0)):
+    """UV sphere."""
+    return _link(_bm_sphere(radius, segments, rings), name, location, rotation)
+
+
+def torus(name="Torus", major_radius=1.0, minor_radius=0.25, major_segments=48, minor_segments=12,
+          location=(0, 0, 0), rotation=(0, 0, 0)):
+    """Torus in the local XY plane (bmesh has no torus operator, so the grid is built by hand)."""
+    return _link(_bm_torus(major_radius, minor_radius, major_segments, minor_segments), name, location, rotation)
+
+
+def _face_count(objs):
+    return sum(len(o.data.polygons) for o in objs if o.type == 'MESH')
+
+
+def pick_solver(target, operands):
+    """EXACT for small, robust jobs; FAST once the operand stack gets heavy."""
+    if len(operands) > FAST_SOLVER_OPERANDS or _face_count([target] + list(operands)) > FAST_SOLVER_FACES:
+        return 'FAST'
+    return 'EXACT'
+
+
+def boolean(target, operations, solver=None, keep_operands=False):
+    """
+    Applies a list of `(operand, 'UNION' | 'DIFFERENCE' | 'INTERSECT')` pairs to
+    `target` in ONE depsgraph evaluation and bakes the result into its mesh.
+    """
+    operations = [(o, op.upper()) for o, op in operations if o is not None and o is not target]
+    if not operations:
+        return target
+    solver = solver or pick_solver(target, [o for o, _ in operations])
+
+    for i, (operand, op) in enumerate(operations):
+        mod = target.modifiers.new(name=f"fg_bool_{i}", type='BOOLEAN')
+        mod.operation = op
+        mod.solver = solver
+        mod.object = operand
+        operand.hide_set(True)
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    evaluated = target.evaluated_get(depsgraph)
+    baked = bpy.data.meshes.new_from_object(evaluated, preserve_all_data_layers=False, depsgraph=depsgraph)
+
+    old_mesh = target.data
+    target.modifiers.clear()
+    target.data = baked
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+
+    if not keep_operands:
+        for operand, _ in operations:
+            mesh = operand.data
+            bpy.data.objects.remove(operand, do_unlink=True)
+            if mesh is not None and mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+    return target
+
+
+def union(target, *operands, solver=None):
+    """Batched union of all `operands` into `target`."""
+    return boolean(target, [(o, 'UNION') for o in _flatten(operands)], solver=solver)
+
+
+def difference(target, *cutters, solver=None):
+    """Batched subtraction of all `cutters` from `target`."""
+    return boolean(target, [(o, 'DIFFERENCE') for o in _flatten(cutters)], solver=solver)
+
+
+def _flatten(items):
+    flat = []
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            flat.extend(item)
+        else:
+            flat.append(item)
+    return flat
+
+
+def join(objects, name="Joined"):
+    """
+    Merges mesh objects (modifiers and transforms applied) into one new object
+    without any boolean: meant for parts that do not overlap.
+    """
+    objects = [o for o in _flatten(objects) if o is not None and o.type == 'MESH']
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    bm = bmesh.new()
+    for obj in objects:
+        mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), depsgraph=depsgraph)
+        mesh.transform(obj.matrix_world)
+        bm.from_mesh(mesh)
+        bpy.data.meshes.remove(mesh)
+    for obj in objects:
+        mesh = obj.data
+        bpy.data.objects.remove(obj, do_unlink=True)
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    return _link(bm, name)
+
+
+def export_stl(filepath):
+    """Selects every mesh and exports it with whichever STL operator this Blender version has."""
+    for obj in bpy.context.scene.objects:
+        obj.hide_set(False)
+        obj.select_set(obj.type == 'MESH')
+    try:
+        bpy.ops.wm.stl_export(filepath=filepath)
+    except AttributeError:
+        bpy.ops.export_mesh.stl(filepath=filepath)
+    return filepath
+
+
+# --- Blueprint assembly with per-subtree mesh cache ---
+
+def build_primitive(node, name=None):
+    """
+    Builds one normalized blueprint node (see blueprint.normalize_primitive) with its
+    transform baked into the vertices, so the object sits at the identity transform.
+    """
+    ptype = node["primitive_type"]
+    if ptype in ("cylinder", "cone"):
+        bm = _bm_cone(node["radius1"], node["radius2"], node["depth"], 32)
+    elif ptype == "sphere":
+        bm = _bm_sphere(node["radius"], 32, 16)
+    elif ptype == "torus":
+        bm = _bm_torus(node["major_radius"], node["minor_radius"], 48, 12)
+    else:
+        bm = _bm_cube(node["size"])
+    matrix = Matrix.Translation(node["location"]) @ Euler(node["rotation"], 'XYZ').to_matrix().to_4x4()
+    bmesh.ops.transform(bm, matrix=matrix, verts=bm.verts)
+    return _link(bm, name or ptype.capitalize())
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.npz") if CACHE_DIR else None
+
+
+def _cache_load(key, name):
+    path = _cache_path(key)
+    if not path or not os.path.exists(path):
+        if path:
+            CACHE_STATS["misses"] += 1
+        return None
+    import numpy as np
+    try:
+        data = np.load(path)
+        verts = data["verts"].reshape(-1, 3)
+        loops = data["loops"]
+        totals = data["totals"]
+    except Exception:
+        CACHE_STATS["misses"] += 1
+        return None
+    os.utime(path)  # Keeps BlenderOps.prune_mesh_cache least-recently-used.
+    faces = np.split(loops, np.cumsum(totals)[:-1]) if len(totals) else []
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(verts.tolist(), [], [f.tolist() for f in faces])
+    mesh.update()
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    CACHE_STATS["hits"] += 1
+    return obj
+
+
+def _cache_store(key, obj):
+    path = _cache_path(key)
+    if not path:
+        return
+    import numpy as np
+    mesh = obj.data
+    verts = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.vertices.foreach_get("co", verts)
+    mesh.loops.foreach_get("vertex_index", loops)
+    mesh.polygons.foreach_get("loop_total", totals)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write-then-rename so concurrent runs never read a half-written entry.
+    tmp_path = f"{path[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, verts=verts, loops=loops, totals=totals)
+    os.replace(tmp_path, path)
+    CACHE_STATS["stored"] += 1
+
+
+def _runs(nodes):
+    """Splits a node list into runs of consecutive nodes sharing a boolean op."""
+    runs = []
+    for node in nodes:
+        if runs and runs[-1][0] == node["boolean_op"]:
+            runs[-1][1].append(node)
+        else:
+            runs.append((node["boolean_op"], [node]))
+    return runs
+
+
+def _tree_key(nodes, op):
+    if len(nodes) == 1:
+        return bp.subtree_key(nodes[0])
+    return bp.combine_keys(op, [bp.subtree_key(n) for n in nodes])
+
+
+def _build_operand(node):
+    """Geometry of one node: its own primitive followed by its children, if any."""
+    children = node.get("children") or []
+    if not children:
+        return build_primitive(node)
+    key = bp.subtree_key(node)
+    obj = _cache_load(key, "Subtree")
+    if obj is None:
+        own = dict(node, children=[], boolean_op="UNION")
+        obj = _build_group([own] + children)
+        _cache_store(key, obj)
+    return obj
+
+
+def _build_tree(nodes, op):
+    """Balanced binary combination of a commutative run, cached at every internal node."""
+    if len(nodes) == 1:
+        return _build_operand(nodes[0])
+    key = _tree_key(nodes, op)
+    obj = _cache_load(key, "Subtree")
+    if obj is not None:
+        return obj
+    mid = len(nodes) // 2
+    obj = boolean(_build_tree(nodes[:mid], op), [(_build_tree(nodes[mid:], op), op)])
+    _cache_store(key, obj)
+    return obj
+
+
+def _build_group(nodes):
+    """
+    Folds a node list left to right. Consecutive runs of the same op are combined
+    first (A - B - C == A - (B u C)), so each step of the chain has its own key and
+    the longest cached prefix of the chain is loaded instead of recomputed.
+    """
+    steps = []
+    acc_key = None
+    for op, run in _runs(nodes):
+        tree_op = 'INTERSECT' if op == 'INTERSECT' else 'UNION'
+        if acc_key is None:
+            if op != 'UNION':
+                continue  # Nothing to cut from or intersect with yet.
+            acc_key = _tree_key(run, tree_op)
+        else:
+            acc_key = bp.combine_keys(op, [acc_key, _tree_key(run, tree_op)])
+        steps.append((op, tree_op, run, acc_key))
+    if not steps:
+        return None
+
+    acc, start = None, 0
+    for i in range(len(steps) - 1, 0, -1):
+        acc = _cache_load(steps[i][3], "Model")
+        if acc is not None:
+            start = i + 1
+            break
+    if acc is None:
+        acc = _build_tree(steps[0][2], steps[0][1])
+        start = 1
+
+    for op, tree_op, run, key in steps[start:]:
+        acc = boolean(acc, [(_build_tree(run, tree_op), op)])
+        _cache_store(key, acc)
+    return acc
+
+
+def build_node(node, name=None):
+    """Builds one normalized node including its children (cached like build_blueprint)."""
+    obj = _build_operand(node)
+    if obj is not None and name:
+        obj.name = name
+    return obj
+
+
+def build_blueprint(blueprint, name="Model"):
+    """
+    Builds the whole blueprint primitive tree into a single object, reusing cached
+    meshes for every subtree that did not change since a previous run.
+    """
+    nodes = bp.normalized_nodes(blueprint)
+    obj = _build_group(nodes)
+    if obj is not None:
+        obj.name = name
+    return obj
@@ -0,0 +1,118 @@
+"""
+Image preprocessing for multimodal analysis.
+
+Decodes the user's image, applies the EXIF orientation, downscales it to the
+resolution the vision model actually uses, strips all metadata by re-encoding
+and caches the resulting base64 payload by content hash, so iterating on the
+same photo never re-processes or re-uploads a multi-megabyte original.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from src.config.logger import get_logger
+
+logger = get_logger("ImagePrep")
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+# OpenAI-style high-detail vision fits images in 2048x2048 and then scales the
+# short side to 768px; anything larger is discarded server-side anyway.
+MAX_LONG_SIDE = int(os.getenv("VISION_MAX_LONG_SIDE", "2048"))
+MAX_SHORT_SIDE = int(os.getenv("VISION_MAX_SHORT_SIDE", "768"))
+JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+CACHE_DIR = os.getenv("VISION_CACHE_DIR", os.path.join(os.getcwd(), "cache", "images"))
+
+
+def is_image_path(value) -> bool:
+    """True when `value` is a path to an existing image file."""
+    return (isinstance(value, str) and os.path.splitext(value)[1].lower() in IMAGE_EXTENSIONS
+            and os.path.isfile(value))
+
+
+class ImagePreprocessor:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_long_side: int = MAX_LONG_SIDE,
+                 max_short_side: int = MAX_SHORT_SIDE, quality: int = JPEG_QUALITY, memory_entries: int = 32):
+        self.cache_dir = cache_dir
+        self.max_long_side = max_long_side
+        self.max_short_side = max_short_side
+        self.quality = quality
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _target_size(self, width, height):
+        long_side, short_side = max(width, height), min(width, height)
+        scale = min(1.0, self.max_long_side / long_side, self.max_short_side / short_side)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def _encode(self, raw: bytes) -> str:
+        from PIL import Image, ImageOps
+
+        image = Image.open(io.BytesIO(raw))
+        # JPEG can decode directly at a reduced scale, which is much faster than a full decode.
+        image.draft("RGB", self._target_size(*image.size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[-1])
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        target = self._target_size(*image.size)
+        if target != image.size:
+            image = image.resize(target, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        # A fresh save without exif/icc arguments drops all metadata.
+        image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        logger.info(f"Preprocessed image to {image.size[0]}x{image.size[1]} ({len(raw) // 1024} KB -> {buffer.tell() // 1024} KB).")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def to_data_url(self, path: str) -> str:
+        """Returns a `data:image/jpeg;base64,...` URL for the preprocessed image."""
+        with open(path, "rb") as f:
+            raw = f.read()
+        settings = f"{self.max_long_side}:{self.max_short_side}:{self.quality}".encode("ascii")
+        key = hashlib.sha256(raw + settings).hexdigest()
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        disk_path = os.path.join(self.cache_dir, f"{key}.b64")
+        if os.path.exists(disk_path):
+            with open(disk_path, encoding="ascii") as f:
+                payload = f.read()
+            logger.info("Image payload loaded from cache.")
+        else:
+            payload = self._encode(raw)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="ascii") as f:
+                f.write(payload)
+            os.replace(tmp_path, disk_path)
+
+        url = f"data:image/jpeg;base64,{payload}"
+        with self._lock:
+            self._memory[key] = url
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return url
+
+
+_preprocessor = None
+_preprocessor_lock = threading.Lock()
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """Process-wide preprocessor so the in-memory cache is shared across sessions."""
+    global _preprocessor
+    with _preprocessor_lock:
+        if _preprocessor is None:
+            _preprocessor = ImagePreprocessor()
+        return _preprocessor
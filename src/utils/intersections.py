@@ -0,0 +1,209 @@
+"""
+Vectorized self-intersection detection for triangle meshes.
+
+NumPy only, so it runs both in this process and inside Blender (imported by
+mesh_analysis). Triangles are bucketed into a uniform hash grid; only pairs
+sharing a cell, not sharing a vertex and with overlapping bounding boxes are
+tested, with batched segment/triangle (Moller-Trumbore) tests: two
+non-coplanar triangles intersect iff an edge of one crosses the other.
+Coplanar overlaps are not reported.
+"""
+import numpy as np
+
+EPS = 1e-9
+# Barycentric / segment-parameter margin so touching contacts are not reported
+CONTACT_TOLERANCE = 1e-6
+# Grid resolution target: average number of cells each triangle is bucketed into
+MAX_CELLS_PER_TRIANGLE = 8
+CHUNK_SIZE = 200000
+
+
+def _cross(a, b):
+    return np.stack([
+        a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+        a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+        a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0],
+    ], axis=1)
+
+
+def _dot(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+def _bucket(lo, hi):
+    """
+    Returns `(cell_keys, triangle_ids, key_of)` with one entry per (triangle,
+    overlapped cell); `key_of(points)` maps points to the key of their cell.
+    """
+    n = len(lo)
+    extent = hi - lo
+    origin = lo.min(axis=0)
+    cell = float(np.median(extent.max(axis=1)))
+    if cell <= EPS:
+        cell = float((hi.max(axis=0) - origin).max()) / max(n ** (1.0 / 3.0), 1.0) or 1.0
+
+    # Large triangles span many cells; coarsen the grid until the expansion stays bounded.
+    while True:
+        c_lo = np.floor((lo - origin) / cell).astype(np.int64)
+        c_hi = np.floor((hi - origin) / cell).astype(np.int64)
+        span = c_hi - c_lo + 1
+        counts = span.prod(axis=1)
+        if counts.sum() <= MAX_CELLS_PER_TRIANGLE * n:
+            break
+        cell *= 2.0
+
+    tri_ids = np.repeat(np.arange(n), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    local = np.arange(len(tri_ids)) - starts
+    sx, sy = span[tri_ids, 0], span[tri_ids, 1]
+    ix = c_lo[tri_ids, 0] + local % sx
+    iy = c_lo[tri_ids, 1] + (local // sx) % sy
+    iz = c_lo[tri_ids, 2] + local // (sx * sy)
+
+    dims = c_hi.max(axis=0) + 1
+    keys = (ix * dims[1] + iy) * dims[2] + iz
+
+    def key_of(points):
+        c = np.floor((points - origin) / cell).astype(np.int64)
+        return (c[:, 0] * dims[1] + c[:, 1]) * dims[2] + c[:, 2]
+
+    return keys, tri_ids, key_of
+
+
+def _candidate_pairs(keys, tri_ids, lo, hi, triangles, key_of):
+    """
+    Pairs of triangles sharing a grid cell with overlapping bounding boxes. A pair
+    overlapping several cells is only emitted by the cell holding the lower corner
+    of the two boxes' overlap, so no global de-duplication pass is needed.
+    """
+    order = np.argsort(keys, kind="stable")
+    keys, tri_ids = keys[order], tri_ids[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    # Entries left after each one in its cell; only those can pair at offset d.
+    remaining = np.repeat(starts + sizes, sizes) - np.arange(len(keys)) - 1
+
+    pairs = []
+    active = np.flatnonzero(remaining > 0)
+    d = 1
+    while len(active):
+        a, b = tri_ids[active], tri_ids[active + d]
+        overlap = np.all((lo[a] <= hi[b]) & (lo[b] <= hi[a]), axis=1)
+        a, b, cell_keys = a[overlap], b[overlap], keys[active[overlap]]
+        owner = key_of(np.maximum(lo[a], lo[b])) == cell_keys
+        # Neighbours sharing a vertex always "touch"; they are not self-intersections.
+        a, b = a[owner], b[owner]
+        shared = (triangles[a][:, :, None] == triangles[b][:, None, :]).any(axis=(1, 2))
+        pairs.append(np.stack([a[~shared], b[~shared]], axis=1))
+        d += 1
+        active = active[remaining[active] >= d]
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(pairs)
+
+
+def _segments_hit_triangles(p0, p1, v0, v1, v2):
+    """Batched Moller-Trumbore: does segment p0->p1 cross triangle (v0, v1, v2)?"""
+    direction = p1 - p0
+    e1 = v1 - v0
+    e2 = v2 - v0
+    h = _cross(direction, e2)
+    a = _dot(e1, h)
+    valid = np.abs(a) > EPS
+    f = np.where(valid, 1.0 / np.where(valid, a, 1.0), 0.0)
+    s = p0 - v0
+    u = f * _dot(s, h)
+    q = _cross(s, e1)
+    v = f * _dot(direction, q)
+    t = f * _dot(e2, q)
+    tol = CONTACT_TOLERANCE
+    return valid & (u > tol) & (v > tol) & (u + v < 1 - tol) & (t > tol) & (t < 1 - tol)
+
+
+def _pairs_intersect(tris, pairs):
+    a = tris[pairs[:, 0]]
+    b = tris[pairs[:, 1]]
+    hit = np.zeros(len(pairs), dtype=bool)
+    for first, second in ((a, b), (b, a)):
+        for i in range(3):
+            j = (i + 1) % 3
+            hit |= _segments_hit_triangles(first[:, i], first[:, j], second[:, 0], second[:, 1], second[:, 2])
+    return hit
+
+
+def _regions(tris, triangles, pairs, max_regions):
+    """
+    Connected components of intersecting triangles, largest first. Triangles are
+    linked when they intersect each other or share a vertex.
+    """
+    ids, inverse = np.unique(pairs.ravel(), return_inverse=True)
+    edges = [inverse.reshape(-1, 2)]
+    corners = triangles[ids].ravel()
+    owners = np.repeat(np.arange(len(ids)), 3)
+    order = np.argsort(corners, kind="stable")
+    corners, owners = corners[order], owners[order]
+    same_vertex = corners[1:] == corners[:-1]
+    edges.append(np.stack([owners[:-1][same_vertex], owners[1:][same_vertex]], axis=1))
+    edges = np.concatenate(edges)
+
+    labels = np.arange(len(ids))
+    while True:
+        low = np.minimum(labels[edges[:, 0]], labels[edges[:, 1]])
+        updated = labels.copy()
+        np.minimum.at(updated, edges[:, 0], low)
+        np.minimum.at(updated, edges[:, 1], low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+
+    regions = []
+    for label in np.unique(labels):
+        members = ids[labels == label]
+        points = tris[members].reshape(-1, 3)
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        regions.append({
+            "triangles": int(len(members)),
+            "center": ((lo + hi) / 2).round(6).tolist(),
+            "bounds": [lo.round(6).tolist(), hi.round(6).tolist()],
+        })
+    regions.sort(key=lambda r: r["triangles"], reverse=True)
+    return regions[:max_regions]
+
+
+def find_self_intersections(vertices, triangles, max_regions=10) -> dict:
+    """
+    Detects intersecting triangle pairs in a mesh.
+
+    Args:
+        vertices: (V, 3) array of vertex positions.
+        triangles: (T, 3) array of vertex indices.
+    Returns:
+        {"pairs": (K, 2) triangle index pairs, "count": K, "regions": [...]}
+        where each region has "triangles", "center" and "bounds".
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    empty = {"pairs": np.empty((0, 2), dtype=np.int64), "count": 0, "regions": []}
+    if len(triangles) < 2:
+        return empty
+
+    tris = vertices[triangles]
+    area2 = np.linalg.norm(_cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1)
+    keep = np.flatnonzero(area2 > EPS)
+    if len(keep) < 2:
+        return empty
+
+    lo = tris[keep].min(axis=1)
+    hi = tris[keep].max(axis=1)
+    keys, local_ids, key_of = _bucket(lo, hi)
+    pairs = keep[_candidate_pairs(keys, local_ids, lo, hi, triangles[keep], key_of)]
+    if not len(pairs):
+        return empty
+
+    hits = [pairs[i:i + CHUNK_SIZE][_pairs_intersect(tris, pairs[i:i + CHUNK_SIZE])]
+            for i in range(0, len(pairs), CHUNK_SIZE)]
+    hits = np.concatenate(hits) if hits else np.empty((0, 2), dtype=np.int64)
+    if not len(hits):
+        return empty
+    return {"pairs": hits, "count": int(len(hits)), "regions": _regions(tris, triangles, hits, max_regions)}
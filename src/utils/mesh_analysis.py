@@ -0,0 +1,101 @@
+"""
+Procedural mesh analysis executed INSIDE Blender after the generated script.
+
+Imported by the analysis helper that BlenderOps.execute_bpy appends to every
+script, so it must only depend on `bpy`, `numpy` (bundled with Blender) and
+the standard library. All per-element work is done with `foreach_get` and
+NumPy instead of Python loops over bmesh elements.
+"""
+import json
+import bpy
+import numpy as np
+from intersections import find_self_intersections
+
+DEGENERATE_AREA = 1e-12
+# Self-intersection detection is skipped above this size to bound analysis time
+SELF_INTERSECTION_MAX_TRIANGLES = 2000000
+
+
+def analyze_object(obj, depsgraph):
+    """Returns `(issues, metrics)` for the evaluated mesh of one object."""
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    try:
+        n_verts, n_edges, n_faces = len(mesh.vertices), len(mesh.edges), len(mesh.polygons)
+
+        edge_index = np.empty(len(mesh.loops), dtype=np.int64)
+        mesh.loops.foreach_get("edge_index", edge_index)
+        faces_per_edge = np.bincount(edge_index, minlength=n_edges)
+        non_manifold = int(np.count_nonzero(faces_per_edge != 2))
+
+        areas = np.empty(n_faces, dtype=np.float64)
+        mesh.polygons.foreach_get("area", areas)
+        degenerate = int(np.count_nonzero(areas <= DEGENERATE_AREA))
+
+        mesh.calc_loop_triangles()
+        triangles = len(mesh.loop_triangles)
+        tri_verts = np.empty(triangles * 3, dtype=np.int64)
+        mesh.loop_triangles.foreach_get("vertices", tri_verts)
+
+        co = np.empty(n_verts * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", co)
+        co = co.reshape(-1, 3)
+        if n_verts:
+            matrix = np.array(obj.matrix_world)
+            world = co @ matrix[:3, :3].T + matrix[:3, 3]
+            bounds = [world.min(axis=0).tolist(), world.max(axis=0).tolist()]
+        else:
+            world = co
+            bounds = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0]]
+
+        if triangles <= SELF_INTERSECTION_MAX_TRIANGLES:
+            intersections = find_self_intersections(world, tri_verts.reshape(-1, 3))
+        else:
+            intersections = None
+    finally:
+        evaluated.to_mesh_clear()
+
+    issues = []
+    if non_manifold:
+        issues.append(f"Non-manifold geometry detected ({non_manifold} edges)")
+    if degenerate:
+        issues.append(f"Degenerate faces found ({degenerate})")
+    if not n_faces:
+        issues.append("Mesh has no faces")
+    if intersections and intersections["count"]:
+        regions = intersections["regions"]
+        near = ", ".join("(" + ", ".join(f"{c:.3f}" for c in r["center"]) + ")" for r in regions[:3])
+        issues.append(f"Self-intersections detected ({intersections['count']} triangle pairs in "
+                      f"{len(regions)} regions, near {near})")
+
+    metrics = {
+        "vertices": n_verts,
+        "faces": n_faces,
+        "triangles": triangles,
+        "non_manifold_edges": non_manifold,
+        "degenerate_faces": degenerate,
+        "self_intersections": intersections["count"] if intersections else None,
+        "intersection_regions": intersections["regions"] if intersections else [],
+        "bounds": bounds,
+    }
+    return issues, metrics
+
+
+def analyze_scene():
+    """Returns `[{"name", "issues", "metrics"}]` for every mesh object in the scene."""
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    results = []
+    for obj in bpy.data.objects:
+        if obj.type == 'MESH':
+            issues, metrics = analyze_object(obj, depsgraph)
+            results.append({"name": obj.name, "issues": issues, "metrics": metrics})
+    return results
+
+
+def report():
+    """Analyzes every mesh object and prints the JSON block parsed by BlenderOps."""
+    results = analyze_scene()
+    print("---MESH_ANALYSIS_START---")
+    print(json.dumps(results))
+    print("---MESH_ANALYSIS_END---")
+    return results
@@ -0,0 +1,188 @@
+"""
+Per-agent model tiering with an escalation cascade.
+
+Each agent gets an ordered list of models (see LiteLLMConfig.get_model_tiers).
+A call starts on the cheapest tier and escalates to the next one when the
+request fails or the response cannot be parsed. Callers can also start higher
+up the cascade, e.g. after a validation failure.
+"""
+import threading
+import time
+from collections import deque
+from statistics import median
+from src.config import get_config
+from src.utils.scheduler import get_scheduler
+from src.utils.cancellation import RunCancelled, current_token, run_coroutine
+from src.config.logger import get_logger
+
+logger = get_logger("ModelCascade")
+
+
+class CascadeParseError(Exception):
+    """Raised when even the last tier produced an unparseable response."""
+
+    def __init__(self, message, content, model):
+        super().__init__(message)
+        self.content = content
+        self.model = model
+
+
+def extract_code(content: str, check: bool = True) -> str:
+    """Extracts the python block from an LLM answer; with `check`, raises SyntaxError if it does not compile."""
+    if "```python" in content:
+        code = content.split("```python")[1].split("```")[0].strip()
+    elif "```" in content:
+        code = content.split("```")[1].split("```")[0].strip()
+    else:
+        code = content.strip()
+    if check:
+        compile(code, "<bpy_script>", "exec")
+    return code
+
+
+class TierStats:
+    """Thread-safe latency / success counters per (agent, model)."""
+
+    _lock = threading.Lock()
+    _stats = {}
+
+    @classmethod
+    def _entry(cls, agent, model):
+        return cls._stats.setdefault((agent, model), {
+            "calls": 0, "successes": 0, "parse_failures": 0, "errors": 0,
+            "validation_passes": 0, "validation_failures": 0,
+            "latencies": deque(maxlen=200)
+        })
+
+    @classmethod
+    def record_call(cls, agent, model, latency, outcome):
+        with cls._lock:
+            entry = cls._entry(agent, model)
+            entry["calls"] += 1
+            entry["latencies"].append(latency)
+            if outcome == "success":
+                entry["successes"] += 1
+            elif outcome == "parse_failure":
+                entry["parse_failures"] += 1
+            else:
+                entry["errors"] += 1
+
+    @classmethod
+    def record_validation(cls, agent, model, passed):
+        with cls._lock:
+            entry = cls._entry(agent, model)
+            entry["validation_passes" if passed else "validation_failures"] += 1
+
+    @classmethod
+    def summary(cls) -> dict:
+        """Returns `{"agent/model": {...}}` with success rates and latency percentiles."""
+        with cls._lock:
+            result = {}
+            for (agent, model), entry in cls._stats.items():
+                latencies = sorted(entry["latencies"])
+                validations = entry["validation_passes"] + entry["validation_failures"]
+                result[f"{agent}/{model}"] = {
+                    "calls": entry["calls"],
+                    "success_rate": entry["successes"] / entry["calls"] if entry["calls"] else None,
+                    "parse_failures": entry["parse_failures"],
+                    "errors": entry["errors"],
+                    "validation_pass_rate": entry["validation_passes"] / validations if validations else None,
+                    "median_latency": median(latencies) if latencies else None,
+                    "p95_latency": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+                }
+            return result
+
+
+class ModelCascade:
+    def __init__(self, agent: str, model_name=None):
+        self.agent = agent
+        self.tiers = [model_name] if model_name else get_config().get_model_tiers(agent)
+        self._clients = {}
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    def _config(self, model: str) -> dict:
+        with self._lock:
+            if model not in self._configs:
+                self._configs[model] = get_config().get_openai_config(model)
+            return self._configs[model]
+
+    def client(self, tier: int):
+        """Returns the (cached) chat client for a tier; langchain_openai is imported on first use."""
+        model = self.tiers[tier]
+        config = self._config(model)
+        with self._lock:
+            if model not in self._clients:
+                from langchain_openai import ChatOpenAI
+                self._clients[model] = ChatOpenAI(**config)
+            return self._clients[model]
+
+    def _request(self, tier: int, messages):
+        """
+        Sends one request. Inside a cancellable run the tier's client is awaited on
+        the shared event loop, so cancelling the run aborts the pending HTTP request
+        instead of waiting for the answer; the request timeout is capped by the
+        time left until the run's deadline.
+        """
+        client = self.client(tier)
+        token = current_token()
+        if token is None:
+            return client.invoke(messages)
+        token.check(f"{self.agent} request")
+        remaining = token.remaining()
+        if remaining == 0:
+            raise RunCancelled("deadline exceeded")
+        kwargs = {} if remaining is None else {"timeout": remaining}
+        return run_coroutine(lambda: client.ainvoke(messages, **kwargs))
+
+    def generate_code(self, messages, start_tier: int = 0, what: str = "Generated code"):
+        """
+        Invokes the cascade with `extract_code`; returns `(code, model)`. Code that
+        still does not compile on the last tier is returned as is, so the
+        Validator reports the actual error.
+        """
+        try:
+            return self.invoke(messages, parser=extract_code, start_tier=start_tier)
+        except CascadeParseError as e:
+            logger.warning(f"{what} does not compile ({e}). Passing it on to the Validator.")
+            return extract_code(e.content, check=False), e.model
+
+    def invoke(self, messages, parser=None, start_tier: int = 0):
+        """
+        Calls the cascade and returns `(result, model)`.
+        `result` is `parser(response.content)` when a parser is given, else the raw response.
+        Any exception from the request or the parser escalates to the next tier.
+        """
+        start_tier = max(0, min(start_tier, len(self.tiers) - 1))
+        for tier in range(start_tier, len(self.tiers)):
+            model = self.tiers[tier]
+            is_last = tier == len(self.tiers) - 1
+            t0 = time.perf_counter()
+            try:
+                with get_scheduler().slot("llm"):
+                    response = self._request(tier, messages)
+            except RunCancelled:
+                raise
+            except Exception as e:
+                TierStats.record_call(self.agent, model, time.perf_counter() - t0, "error")
+                if is_last:
+                    raise
+                logger.warning(f"[{self.agent}] {model} request failed ({e}). Escalating to {self.tiers[tier + 1]}.")
+                continue
+
+            latency = time.perf_counter() - t0
+            if parser is None:
+                TierStats.record_call(self.agent, model, latency, "success")
+                return response, model
+            try:
+                result = parser(response.content)
+            except Exception as e:
+                TierStats.record_call(self.agent, model, latency, "parse_failure")
+                if is_last:
+                    raise CascadeParseError(str(e), response.content, model) from e
+                logger.warning(f"[{self.agent}] {model} response unparseable ({e}). Escalating to {self.tiers[tier + 1]}.")
+                continue
+
+            TierStats.record_call(self.agent, model, latency, "success")
+            logger.info(f"[{self.agent}] {model} answered in {latency:.2f}s (tier {tier + 1}/{len(self.tiers)}).")
+            return result, model
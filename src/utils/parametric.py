@@ -0,0 +1,348 @@
+"""
+Parametric re-execution of generated scripts.
+
+Top-level numeric assignments of a BPY script (`seat_height = 0.45`,
+`leg_size = (0.05, 0.05, 0.4)`) are its parameters. They are extracted with
+the AST, shown as editable values in the UI and written back by replacing only
+the literal's source span, so comments and formatting are kept. Simple numeric
+feedback ("make it 20% taller", "set seat height to 0.5") is recognized with a
+few regular expressions and turned into new values directly, so the script is
+re-executed without another LLM call.
+"""
+import ast
+import re
+
+# Only parameters named like a dimension or distance are scaled with the geometry
+_DIMENSION = re.compile(
+    r"size|dim|extent|width|height|depth|length|radius|diam|thick|wall|gap|offset|spacing|distance|clearance"
+    r"|margin|inset|bevel|fillet|chamfer|location|position|(?:^|_)(?:loc|pos)(?:$|_)"
+)
+# ... and never counts or angles, even when their name mentions a dimension
+_UNSCALED = re.compile(
+    r"(?:^|_)(?:angle|rot\w*|deg\w*|segments?|rings?|count|num\w*|n|steps?|res|resolution|seed|subdiv\w*|levels?|index|idx)(?:$|_)"
+)
+# Axis words -> parameter names they refer to, and the vector component for size-like tuples
+_AXES = {
+    "height": (re.compile(r"height|tall"), 2),
+    "width": (re.compile(r"width|wide"), 0),
+    "length": (re.compile(r"length|long"), 1),
+    "depth": (re.compile(r"depth|deep"), 2),
+    "thickness": (re.compile(r"thick|wall"), None),
+    "radius": (re.compile(r"radius|diameter"), None),
+}
+# Dimension-named parameters that are coordinates rather than sizes, so may be zero or negative
+_POSITIONAL = re.compile(r"location|position|offset|(?:^|_)(?:loc|pos)(?:$|_)")
+_SIZE_VECTOR = re.compile(r"size|dim|extent")
+_WORDS = {
+    "taller": ("height", 1), "higher": ("height", 1), "shorter": ("height", -1), "lower": ("height", -1),
+    "wider": ("width", 1), "narrower": ("width", -1),
+    "longer": ("length", 1),
+    "deeper": ("depth", 1), "shallower": ("depth", -1),
+    "thicker": ("thickness", 1), "thinner": ("thickness", -1),
+    "bigger": (None, 1), "larger": (None, 1), "smaller": (None, -1),
+    "tall": ("height", 1), "high": ("height", 1), "wide": ("width", 1), "long": ("length", 1),
+    "deep": ("depth", 1), "thick": ("thickness", 1), "big": (None, 1), "large": (None, 1),
+}
+_MULTIPLIERS = {"twice": 2.0, "double": 2.0, "triple": 3.0, "half": 0.5, "halve": 0.5}
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_WORD = "|".join(sorted(_WORDS, key=len, reverse=True))
+_NAME = r"([a-z][a-z0-9_ ]*?)"
+
+_PATTERNS = [
+    # "20% taller", "make it 15 percent smaller"
+    ("percent", re.compile(rf"{_NUMBER}\s*(?:%|percent)\s+({_WORD})\b")),
+    # "twice as tall", "half as wide", "double the height"
+    ("multiple", re.compile(rf"\b(twice|half)\s+as\s+({_WORD})\b")),
+    ("multiple", re.compile(rf"\b(double|triple|halve)\s+(?:the\s+)?({_WORD}|height|width|length|depth|thickness|radius|size)\b")),
+    # "scale it by 1.5", "scale down by 2", "scale by 120%", "1.5x bigger"
+    ("scale", re.compile(rf"\b(?:scale|resize)\s+(?:it\s+|everything\s+)?(?:(up|down)\s+)?(?:by\s+)?(?:a\s+factor\s+of\s+)?{_NUMBER}\s*(x|%)?")),
+    ("times", re.compile(rf"{_NUMBER}\s*(?:x|times)\s+(?:as\s+)?({_WORD})\b")),
+    # "increase the seat height by 0.1", "reduce radius by 10%"
+    ("delta", re.compile(rf"\b(increase|raise|grow|extend|decrease|reduce|lower|shrink)\s+(?:the\s+)?{_NAME}\s+by\s+{_NUMBER}\s*(%|percent)?")),
+    # "set seat height to 0.5", "seat_height = 0.5", "radius: 2"
+    ("set", re.compile(rf"\b(?:set\s+|change\s+|make\s+)?(?:the\s+)?{_NAME}\s*(?:=|:|\bto\b|\bof\b)\s*(\(?\s*{_NUMBER}(?:\s*,\s*{_NUMBER})*\s*\)?)")),
+]
+# Words that may surround recognized phrases without changing their meaning
+_FILLER = {"make", "it", "the", "a", "an", "and", "please", "bit", "by", "about", "model", "object",
+           "whole", "thing", "all", "slightly", "also", "just", "then", "now", "can", "you", "be"}
+
+
+def _literal(node):
+    """Numeric value of a constant, negated constant or flat tuple/list of those; None otherwise."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _literal(node.operand)
+        if isinstance(value, (int, float)):
+            return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, (ast.Tuple, ast.List)) and node.elts:
+        values = [_literal(e) for e in node.elts]
+        if all(isinstance(v, (int, float)) for v in values):
+            return tuple(values)
+    return None
+
+
+def _module_assignments(tree) -> dict:
+    """How often each name is bound in module scope (function, class and comprehension scopes are skipped)."""
+    counts, stack = {}, list(tree.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+                             ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            counts[node.id] = counts.get(node.id, 0) + 1
+        stack.extend(ast.iter_child_nodes(node))
+    return counts
+
+
+def extract_parameters(code: str) -> list:
+    """
+    Returns the script's top-level numeric assignments in source order as
+    `[{"name", "value", "line"}]`. Names assigned more than once anywhere at
+    module level (including loop variables) are skipped, since editing one of
+    the assignments would not be meaningful.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    assigned = _module_assignments(tree)
+    found = {}
+    for stmt in tree.body:
+        names = [t.id for t in stmt.targets if isinstance(t, ast.Name)] if isinstance(stmt, ast.Assign) else []
+        if len(names) == 1 == len(stmt.targets):
+            value = _literal(stmt.value)
+            if value is not None:
+                found[names[0]] = {"name": names[0], "value": value, "line": stmt.lineno}
+    return [p for name, p in found.items() if assigned[name] == 1]
+
+
+def format_value(value) -> str:
+    if isinstance(value, tuple):
+        return "(" + ", ".join(format_value(v) for v in value) + ")"
+    return repr(round(value, 6)) if isinstance(value, float) else repr(value)
+
+
+def parse_value(text):
+    """Parses a UI cell back into a number or tuple of numbers; raises ValueError otherwise."""
+    try:
+        value = ast.literal_eval(str(text).strip())
+    except (ValueError, SyntaxError):
+        raise ValueError(f"'{text}' is not a number")
+    if isinstance(value, list):
+        value = tuple(value)
+    if isinstance(value, bool) or not (isinstance(value, (int, float)) or (
+            isinstance(value, tuple) and value and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value))):
+        raise ValueError(f"'{text}' is not a number or tuple of numbers")
+    return value
+
+
+def _replace_values(code: str, texts: dict):
+    """
+    Replaces the right-hand side of the top-level assignments `name = <literal>`
+    with `texts[name]`; returns the new code and the replaced source texts.
+    """
+    tree = ast.parse(code)
+    offsets = [0]
+    for line in code.split("\n"):
+        offsets.append(offsets[-1] + len(line.encode("utf-8")) + 1)
+
+    # AST offsets are in UTF-8 bytes
+    source = code.encode("utf-8")
+    spans, replaced = [], {}
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name) \
+                and stmt.targets[0].id in texts:
+            node = stmt.value
+            start = offsets[node.lineno - 1] + node.col_offset
+            end = offsets[node.end_lineno - 1] + node.end_col_offset
+            spans.append((start, end, texts[stmt.targets[0].id]))
+            replaced[stmt.targets[0].id] = source[start:end].decode("utf-8")
+
+    for start, end, text in sorted(spans, reverse=True):
+        source = source[:start] + text.encode("utf-8") + source[end:]
+    return source.decode("utf-8"), replaced
+
+
+def apply_parameters(code: str, values: dict) -> str:
+    """
+    Returns the script with the given top-level parameters set to new values.
+    Only the literal on the right-hand side is replaced; unknown names raise KeyError.
+    """
+    known = {p["name"] for p in extract_parameters(code)}
+    unknown = set(values) - known
+    if unknown:
+        raise KeyError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    return _replace_values(code, {name: format_value(value) for name, value in values.items()})[0]
+
+
+def hoist_parameters(code: str, prefix: str):
+    """
+    For code that ends up inside a function: returns `(assignments, code)`, where
+    `assignments` declares every parameter as a top-level `<prefix>_<name> = <literal>`
+    and `code` reads those names instead of its own literals.
+    """
+    names = {p["name"]: f"{prefix}_{p['name']}" for p in extract_parameters(code)}
+    if not names:
+        return "", code
+    code, literals = _replace_values(code, names)
+    return "".join(f"{names[name]} = {literals[name]}\n" for name in names), code
+
+
+# --- Numeric feedback fast path ---
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[\s_]+", " ", text.lower()).strip()
+
+
+def _scalable(name: str) -> bool:
+    lowered = name.lower()
+    return len(lowered) > 1 and bool(_DIMENSION.search(lowered)) and not _UNSCALED.search(lowered)
+
+
+def _valid_dimension(name: str, value) -> bool:
+    """False for a zero or negative size; positions and offsets may be anything."""
+    if not _scalable(name) or _POSITIONAL.search(name.lower()):
+        return True
+    values = value if isinstance(value, tuple) else (value,)
+    return all(v > 0 for v in values)
+
+
+def _scale(value, factor, component=None):
+    # Rounded so repeated tweaks do not accumulate float noise in the script
+    if isinstance(value, tuple):
+        return tuple(round(v * factor, 6) if component is None or i == component else v for i, v in enumerate(value))
+    return round(value * factor, 6)
+
+
+def _axis_targets(params: dict, axis):
+    """Parameters (and tuple component) an axis word refers to; every dimension parameter for None."""
+    if axis is None:
+        return [(name, None) for name in params if _scalable(name)]
+    pattern, component = _AXES[axis]
+    targets = []
+    for name, value in params.items():
+        lowered = name.lower()
+        if not _scalable(name):
+            continue
+        if isinstance(value, tuple):
+            if component is not None and len(value) == 3 and _SIZE_VECTOR.search(lowered):
+                targets.append((name, component))
+        elif pattern.search(lowered):
+            targets.append((name, None))
+    return targets
+
+
+def _resolve_name(params: dict, phrase: str):
+    """Matches a phrase to parameter names: exact name, then a unique name ending with or containing it."""
+    phrase = _normalize(phrase)
+    phrase = re.sub(r"^(?:the|it|its)\s+", "", phrase)
+    names = {_normalize(name): name for name in params}
+    if phrase in names:
+        return [(names[phrase], None)]
+    for match in (lambda n: n.endswith(" " + phrase), lambda n: phrase in n):
+        candidates = [names[n] for n in names if match(n)]
+        if len(candidates) == 1:
+            return [(candidates[0], None)]
+        if candidates:
+            return None  # ambiguous: let the LLM decide
+    if phrase in _AXES:
+        return _axis_targets(params, phrase) or None
+    if phrase in ("size", "scale", "everything", "model"):
+        return _axis_targets(params, None) or None
+    return None
+
+
+def _multiply(new, params, targets, factor):
+    for name, component in targets:
+        new[name] = _scale(new.get(name, params[name]), factor, component)
+
+
+def parse_numeric_feedback(feedback: str, parameters: list):
+    """
+    Turns purely numeric feedback into new parameter values, e.g.
+    "make it 20% taller", "twice as wide", "scale by 1.5", "set seat height to 0.5",
+    "increase the radius by 10%". Returns `{name: value}`, or None when the feedback
+    says anything else (or refers to parameters ambiguously) and needs an agent.
+    """
+    params = {p["name"]: p["value"] for p in parameters}
+    if not params or not feedback:
+        return None
+    text = feedback.lower().strip()
+    new, consumed = {}, []
+
+    for kind, pattern in _PATTERNS:
+        for match in pattern.finditer(text):
+            if any(s < match.end() and match.start() < e for s, e in consumed):
+                continue
+            groups = match.groups()
+            if kind == "percent":
+                axis, sign = _WORDS[groups[1]]
+                targets, factor = _axis_targets(params, axis), 1 + sign * float(groups[0]) / 100
+            elif kind == "multiple":
+                word = groups[1]
+                axis = _WORDS[word][0] if word in _WORDS else (None if word == "size" else word)
+                targets, factor = _axis_targets(params, axis), _MULTIPLIERS[groups[0]]
+            elif kind == "times":
+                axis, sign = _WORDS[groups[1]]
+                factor = float(groups[0]) if sign > 0 else 1 / max(float(groups[0]), 1e-9)
+                targets = _axis_targets(params, axis)
+            elif kind == "scale":
+                direction, number, unit = groups
+                if unit == "%":
+                    # A percentage is the resulting size either way ("scale down to 80%")
+                    factor = float(number) / 100
+                else:
+                    factor = float(number)
+                    if direction == "down" and factor > 0:
+                        factor = 1 / factor
+                targets = _axis_targets(params, None)
+            elif kind == "delta":
+                targets = _resolve_name(params, groups[1])
+                if not targets:
+                    return None
+                amount = float(groups[2])
+                sign = 1 if groups[0] in ("increase", "raise", "grow", "extend") else -1
+                if groups[3]:
+                    _multiply(new, params, targets, 1 + sign * amount / 100)
+                else:
+                    for name, component in targets:
+                        value = new.get(name, params[name])
+                        if isinstance(value, tuple):
+                            return None
+                        new[name] = round(value + sign * amount, 6)
+                if not all(_valid_dimension(name, new[name]) for name, _ in targets):
+                    return None
+                consumed.append(match.span())
+                continue
+            else:
+                targets = _resolve_name(params, groups[0])
+                if not targets or len(targets) != 1:
+                    return None
+                name = targets[0][0]
+                try:
+                    value = parse_value(groups[1])
+                except ValueError:
+                    return None
+                if isinstance(value, tuple) != isinstance(params[name], tuple) or not _valid_dimension(name, value):
+                    return None
+                new[name] = value
+                consumed.append(match.span())
+                continue
+            if not targets or factor <= 0:
+                return None
+            _multiply(new, params, targets, factor)
+            consumed.append(match.span())
+
+    if not consumed:
+        return None
+    # Anything left besides filler words means the request is more than a numeric tweak
+    rest = text
+    for start, end in sorted(consumed, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    if set(re.findall(r"[a-z0-9]+", rest)) - _FILLER:
+        return None
+    # Integers stay integers where the result is whole (e.g. counts set explicitly)
+    return {name: (int(v) if isinstance(params[name], int) and isinstance(v, float) and v.is_integer() else v)
+            for name, v in new.items() if v != params[name]} or None
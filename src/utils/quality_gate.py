@@ -0,0 +1,102 @@
+"""
+Deterministic quality gate for generated meshes.
+
+Scores the procedural metrics collected by mesh_analysis (inside Blender) so
+clean builds get a verdict and a report without an LLM round-trip.
+"""
+import os
+from src.config.logger import get_logger
+
+logger = get_logger("QualityGate")
+
+# Weight of each check in the 0-100 score
+CHECK_WEIGHTS = {
+    "watertight": 35,
+    "degenerate_faces": 15,
+    "self_intersections": 15,
+    "triangle_budget": 15,
+    "bounds": 20,
+}
+
+
+class QualityGate:
+    def __init__(self, triangle_budget=None, min_extent=None, max_extent=None):
+        self.triangle_budget = triangle_budget or int(os.getenv("QUALITY_TRIANGLE_BUDGET", "200000"))
+        self.min_extent = min_extent if min_extent is not None else float(os.getenv("QUALITY_MIN_EXTENT", "0.001"))
+        self.max_extent = max_extent if max_extent is not None else float(os.getenv("QUALITY_MAX_EXTENT", "1000"))
+
+    def evaluate(self, metrics: dict, mesh_issues: list = None) -> dict:
+        """
+        Returns `{"pass", "score", "checks"}` where each check is
+        `{"name", "passed", "detail"}`. Missing metrics never pass.
+        """
+        if not metrics:
+            return {"pass": False, "score": 0, "checks": [
+                {"name": "metrics", "passed": False, "detail": "No mesh metrics were collected."}
+            ]}
+
+        checks = []
+        non_manifold = metrics.get("non_manifold_edges", 0)
+        empty = metrics.get("empty_objects", 0)
+        checks.append({
+            "name": "watertight",
+            "passed": non_manifold == 0 and empty == 0,
+            "detail": "All edges are shared by exactly two faces." if non_manifold == 0 and empty == 0
+                      else f"{non_manifold} non-manifold edges, {empty} empty objects."
+        })
+
+        degenerate = metrics.get("degenerate_faces", 0)
+        checks.append({
+            "name": "degenerate_faces",
+            "passed": degenerate == 0,
+            "detail": "No zero-area faces." if degenerate == 0 else f"{degenerate} zero-area faces."
+        })
+
+        intersections = metrics.get("self_intersections", 0)
+        checks.append({
+            "name": "self_intersections",
+            "passed": intersections == 0,
+            "detail": "No intersecting triangles." if intersections == 0
+                      else f"{intersections} intersecting triangle pairs."
+        })
+
+        triangles = metrics.get("triangles", 0)
+        checks.append({
+            "name": "triangle_budget",
+            "passed": 0 < triangles <= self.triangle_budget,
+            "detail": f"{triangles:,} triangles (budget {self.triangle_budget:,})."
+        })
+
+        extent = metrics.get("extent", [0.0, 0.0, 0.0])
+        bounds_ok = all(self.min_extent <= e <= self.max_extent for e in extent)
+        checks.append({
+            "name": "bounds",
+            "passed": bounds_ok,
+            "detail": "Extent " + " x ".join(f"{e:.3f}" for e in extent)
+                      + f" (allowed {self.min_extent:g} to {self.max_extent:g} per axis)."
+        })
+
+        if mesh_issues:
+            checks.append({
+                "name": "procedural_issues",
+                "passed": False,
+                "detail": "; ".join(mesh_issues)
+            })
+
+        score = sum(CHECK_WEIGHTS.get(c["name"], 0) for c in checks if c["passed"])
+        passed = all(c["passed"] for c in checks)
+        logger.info(f"Quality gate score: {score}/100 ({'PASS' if passed else 'FAIL'}).")
+        return {"pass": passed, "score": score, "checks": checks}
+
+    @staticmethod
+    def render_report(result: dict) -> str:
+        """Templated report in the same layout the Tester LLM produces."""
+        lines = [f"- {'✅' if c['passed'] else '❌'} **{c['name'].replace('_', ' ').title()}**: {c['detail']}"
+                 for c in result["checks"]]
+        if result["pass"]:
+            verdict, refinement = "Pass", "None required. Ask for enhancements to get design suggestions."
+        else:
+            verdict, refinement = "Fail", "Fix the failing checks listed above."
+        return (f"Quality Report:\n{verdict} - deterministic quality gate score {result['score']}/100.\n"
+                + "\n".join(lines)
+                + f"\n\nRefinement:\n{refinement}")
@@ -0,0 +1,138 @@
+"""
+Convergence-aware retry policy for the self-correction loop.
+
+Every failed validation/test is classified (syntax, API, export missing, mesh
+quality, timeout), fingerprinted (normalized error text + AST of the script)
+and appended to `retry_history`. The controller then decides whether another
+attempt can make progress:
+  * "retry"    - new error or changed outcome, budget left
+  * "escalate" - same error again after a code change: retry once with a
+                 stronger model tier and an explicit change-of-approach hint
+  * "stop"     - budget for this error class exhausted, identical code
+                 reproduced the same error, or escalation did not help
+The code generators take their retry prompt and model tier from `escalation()`,
+so every stage's failures raise the tier the same way.
+"""
+import ast
+import hashlib
+import os
+import re
+from src.config.logger import get_logger
+
+logger = get_logger("RetryPolicy")
+
+ERROR_CLASSES = ("syntax", "timeout", "export_missing", "mesh_quality", "api", "unknown")
+
+DEFAULT_BUDGETS = {
+    "syntax": 3,
+    "timeout": 1,
+    "export_missing": 2,
+    "mesh_quality": 2,
+    "api": 3,
+    "unknown": 2,
+}
+
+ESCALATION_HINT = ("The last fix attempt reproduced the SAME error. Do not patch the previous approach again: "
+                   "rewrite the failing part with a different, simpler technique.")
+
+_PATTERNS = {
+    "syntax": ("SyntaxError", "IndentationError", "TabError", "invalid syntax", "unexpected EOF"),
+    "timeout": ("timed out", "TimeoutExpired", "Timeout"),
+    "export_missing": ("STL file was not created", "likely empty", "STL file is too small"),
+    "mesh_quality": ("Non-manifold", "Degenerate faces", "Self-intersections", "Mesh has no faces"),
+    "api": ("AttributeError", "TypeError", "KeyError", "NameError", "ValueError", "RuntimeError",
+            "has no attribute", "context is incorrect", "unexpected keyword", "bpy."),
+}
+
+
+def classify_errors(errors) -> str:
+    """Returns the most specific error class found in a list of error messages."""
+    text = "\n".join(str(e) for e in errors or [])
+    for error_class in ERROR_CLASSES[:-1]:
+        if any(p in text for p in _PATTERNS[error_class]):
+            return error_class
+    return "unknown"
+
+
+def fingerprint_errors(errors) -> str:
+    """Stable hash of the errors with paths, addresses and numbers normalized away."""
+    normalized = []
+    for error in errors or []:
+        lines = [l.strip() for l in str(error).splitlines() if l.strip()]
+        # The tail of a traceback carries the exception; the head is mostly noise.
+        tail = " | ".join(lines[-3:])
+        tail = re.sub(r"(?:[A-Za-z]:)?[\\/][^\s'\"]+", "<path>", tail)
+        tail = re.sub(r"0x[0-9a-fA-F]+", "<addr>", tail)
+        tail = re.sub(r"\d+(?:\.\d+)?", "<n>", tail)
+        normalized.append(tail)
+    return hashlib.sha1("\n".join(sorted(normalized)).encode("utf-8")).hexdigest()[:12]
+
+
+def fingerprint_code(code: str) -> str:
+    """Hash of the script structure; comments and formatting do not count as changes."""
+    try:
+        canonical = ast.dump(ast.parse(code or ""))
+    except SyntaxError:
+        canonical = " ".join((code or "").split())
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+class RetryController:
+    def __init__(self, budgets: dict = None, max_total: int = None):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        for error_class in ERROR_CLASSES:
+            env = os.getenv(f"RETRY_BUDGET_{error_class.upper()}")
+            if env:
+                self.budgets[error_class] = int(env)
+        self.budgets.update(budgets or {})
+        self.max_total = max_total or int(os.getenv("RETRY_MAX_TOTAL", "5"))
+
+    def assess(self, state: dict, errors: list, stage: str) -> dict:
+        """Records a failure and returns the state update with the retry decision."""
+        history = list(state.get("retry_history") or [])
+        entry = {
+            "stage": stage,
+            "error_class": classify_errors(errors),
+            "error_fp": fingerprint_errors(errors),
+            "code_fp": fingerprint_code(state.get("bpy_code", "")),
+            "strategy": state.get("retry_strategy") or "retry",
+        }
+        history.append(entry)
+        decision, reason = self.decide(history)
+        logger.info(f"{stage} failure classified as '{entry['error_class']}' -> {decision.upper()} ({reason}).")
+        return {"retry_history": history, "retry_strategy": decision, "retry_count": state.get("retry_count", 0) + 1}
+
+    @staticmethod
+    def escalation(state: dict, tier_count: int):
+        """
+        Returns `(hint, start_tier)` for regenerating code after a failure: each
+        recorded failure of the latest error class starts one model tier higher,
+        and an "escalate" decision jumps to the strongest tier with a
+        change-of-approach hint. `(None, 0)` when there is nothing to fix.
+        """
+        history = state.get("retry_history") or []
+        if not state.get("errors") or not history:
+            return None, 0
+        if state.get("retry_strategy") == "escalate":
+            return ESCALATION_HINT, tier_count - 1
+        latest = history[-1]["error_class"]
+        return None, min(sum(1 for h in history if h["error_class"] == latest), tier_count - 1)
+
+    def decide(self, history: list):
+        """Returns `(decision, reason)` for the latest entry of `history`."""
+        latest = history[-1]
+        same_class = [h for h in history if h["error_class"] == latest["error_class"]]
+        budget = self.budgets.get(latest["error_class"], DEFAULT_BUDGETS["unknown"])
+
+        if len(history) > self.max_total:
+            return "stop", f"{len(history)} failed attempts exceed the total budget of {self.max_total}"
+        if len(same_class) > budget:
+            return "stop", f"budget of {budget} '{latest['error_class']}' retries exhausted"
+
+        if len(history) >= 2:
+            previous = history[-2]
+            if previous["error_fp"] == latest["error_fp"]:
+                if previous["code_fp"] == latest["code_fp"] or latest["strategy"] == "escalate":
+                    return "stop", "no progress: the same error repeated after the fix attempt"
+                return "escalate", "same error after a code change"
+        return "retry", f"attempt {len(same_class)}/{budget} for '{latest['error_class']}'"
@@ -0,0 +1,175 @@
+"""
+Global resource scheduler shared by all Gradio sessions.
+
+LLM calls and Blender executions draw from separate capacity pools. When a
+pool is saturated, waiters are queued per session (`thread_id`) and served
+round-robin across sessions, interactive work before batch work, so one
+session's retry storm cannot starve everyone else.
+
+The current session is carried in a context variable: the app wraps each turn
+in `scheduler.session(thread_id)`, and agents / BlenderOps simply call
+`scheduler.slot("llm")` or `scheduler.slot("blender")`.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from src.utils.cancellation import current_token
+from src.config.logger import get_logger
+
+logger = get_logger("Scheduler")
+
+INTERACTIVE = 0
+BATCH = 1
+
+_current_session = contextvars.ContextVar("scheduler_session", default=("default", INTERACTIVE))
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "enqueued")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued = time.perf_counter()
+
+
+class ResourcePool:
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.in_use = 0
+        self._lock = threading.Lock()
+        # priority -> OrderedDict(session -> deque of waiters); the dict order is the round-robin order
+        self._queues = {INTERACTIVE: OrderedDict(), BATCH: OrderedDict()}
+        self._waits = deque(maxlen=500)
+        self._granted_total = 0
+        self._max_depth = 0
+
+    def _depth(self):
+        return sum(len(q) for queues in self._queues.values() for q in queues.values())
+
+    def _grant(self, waiter):
+        waiter.granted = True
+        self.in_use += 1
+        self._granted_total += 1
+        self._waits.append(time.perf_counter() - waiter.enqueued)
+        waiter.event.set()
+
+    def _dispatch(self):
+        """Hands free capacity to the next waiter: highest priority, then round-robin by session."""
+        while self.in_use < self.capacity:
+            for priority in sorted(self._queues):
+                sessions = self._queues[priority]
+                if sessions:
+                    session, queue = next(iter(sessions.items()))
+                    waiter = queue.popleft()
+                    del sessions[session]
+                    if queue:
+                        sessions[session] = queue  # Back of the line for this session
+                    self._grant(waiter)
+                    break
+            else:
+                return
+
+    def acquire(self, session: str, priority: int = INTERACTIVE, timeout: float = None, cancel_event=None) -> bool:
+        waiter = _Waiter()
+        with self._lock:
+            if self.in_use < self.capacity and not self._depth():
+                self._grant(waiter)
+                return True
+            self._queues.setdefault(priority, OrderedDict()).setdefault(session, deque()).append(waiter)
+            self._max_depth = max(self._max_depth, self._depth())
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not waiter.event.wait(0.25):
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if cancelled or (deadline is not None and time.monotonic() >= deadline):
+                with self._lock:
+                    if waiter.granted:
+                        break
+                    queue = self._queues[priority].get(session)
+                    if queue and waiter in queue:
+                        queue.remove(waiter)
+                        if not queue:
+                            del self._queues[priority][session]
+                return False
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            self._dispatch()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "queue_depth": self._depth(),
+                "max_queue_depth": self._max_depth,
+                "waiting_sessions": sum(len(s) for s in self._queues.values()),
+                "granted": self._granted_total,
+                "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            }
+
+
+class ResourceScheduler:
+    def __init__(self, capacities: dict):
+        self.pools = {name: ResourcePool(name, cap) for name, cap in capacities.items()}
+
+    @contextmanager
+    def session(self, thread_id: str, priority: int = INTERACTIVE):
+        """Binds all slots acquired in this context to `thread_id`."""
+        token = _current_session.set((thread_id, priority))
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+    @contextmanager
+    def slot(self, pool: str, timeout: float = None, cancel_event=None):
+        """
+        Holds one unit of `pool` capacity for the duration of the block.
+        Waiting stops with RunCancelled when the current run is cancelled.
+        """
+        session, priority = _current_session.get()
+        resource = self.pools[pool]
+        token = current_token()
+        if cancel_event is None and token is not None:
+            cancel_event = token.event
+        t0 = time.perf_counter()
+        if not resource.acquire(session, priority, timeout=timeout, cancel_event=cancel_event):
+            if token is not None:
+                token.check(f"{pool} slot")
+            raise TimeoutError(f"No {pool} capacity available for session {session}")
+        waited = time.perf_counter() - t0
+        if waited > 1.0:
+            logger.info(f"[{session[:8]}] waited {waited:.1f}s for a {pool} slot.")
+        try:
+            yield
+        finally:
+            resource.release()
+
+    def metrics(self) -> dict:
+        return {name: pool.metrics() for name, pool in self.pools.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ResourceScheduler:
+    """Process-wide scheduler; pool sizes come from SCHEDULER_LLM_SLOTS / SCHEDULER_BLENDER_SLOTS."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ResourceScheduler({
+                "llm": int(os.getenv("SCHEDULER_LLM_SLOTS", "8")),
+                "blender": int(os.getenv("SCHEDULER_BLENDER_SLOTS", str(max(1, (os.cpu_count() or 2) // 2)))),
+            })
+        return _scheduler
@@ -0,0 +1,273 @@
+"""
+Batched design-space sweeps.
+
+A validated script and a grid of parameter values (see parametric.py) expand
+into every combination. The variants are rewritten locally and executed in
+batches, many per Blender process (sweep_runner.py), across a small pool of
+processes. There is no LLM call and no Blender start per variant. Blender slots
+are taken at BATCH priority, so interactive sessions are served first. Every
+variant's STL, mesh metrics and quality gate verdict end up in one results
+table that can be written as CSV.
+
+    python -m src.utils.sweep script.py --grid "seat_height=0.4,0.45,0.5" --grid "leg_count=3,4"
+"""
+import ast
+import contextvars
+import csv
+import itertools
+import json
+import math
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.blender_ops import BlenderOps, HELPERS_DIR, mesh_cache_dir
+from src.utils.parametric import apply_parameters, extract_parameters, format_value, parse_value
+from src.utils.quality_gate import QualityGate
+from src.utils.scheduler import get_scheduler, BATCH
+from src.utils.cancellation import check_cancelled, timeout_for
+from src.config.logger import get_logger
+
+logger = get_logger("Sweep")
+
+DEFAULT_WORKERS = 2  # Blender processes running batches concurrently
+DEFAULT_BATCH_SIZE = 25  # variants per Blender process
+DEFAULT_VARIANT_TIMEOUT = 30.0
+DEFAULT_MAX_VARIANTS = 2000
+RESULT_MARKER = "---SWEEP_RESULT---"
+# Time allowed for Blender to start and load the helpers, on top of the per-variant budget
+STARTUP_TIMEOUT = 30
+
+
+def _setting(name: str, default):
+    """SWEEP_* setting of the given type, read on use so a .env loaded by main() applies."""
+    return type(default)(os.getenv(name, str(default)))
+
+
+def parse_grid_spec(spec: str) -> tuple:
+    """
+    Parses one grid axis: `name=v1,v2,...` (numbers or tuples) or
+    `name=start:stop:step` (inclusive stop). Returns `(name, values)`.
+    """
+    name, sep, values = spec.partition("=")
+    name, values = name.strip(), values.strip()
+    if not sep or not name or not values:
+        raise ValueError(f"Grid axis '{spec}' must look like name=v1,v2 or name=start:stop:step")
+    if ":" in values and "(" not in values:
+        parts = [float(v) for v in values.split(":")]
+        if len(parts) != 3 or parts[2] <= 0:
+            raise ValueError(f"Range '{values}' must be start:stop:step with a positive step")
+        start, stop, step = parts
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        result = [round(start + i * step, 9) for i in range(max(count, 0))]
+        if all(float(v).is_integer() for v in (start, step)):
+            result = [int(v) for v in result]
+        return name, result
+    try:
+        parsed = ast.literal_eval(f"[{values}]")
+    except (ValueError, SyntaxError):
+        raise ValueError(f"Grid values '{values}' are not numbers or tuples")
+    return name, [parse_value(repr(v)) for v in parsed]
+
+
+def parse_grid(text: str) -> dict:
+    """Parses one axis per line (or `;`-separated) into `{name: [values]}`."""
+    grid = {}
+    for spec in text.replace(";", "\n").splitlines():
+        if spec.strip():
+            name, values = parse_grid_spec(spec)
+            grid[name] = values
+    return grid
+
+
+def expand_grid(grid: dict) -> list:
+    """Every combination of the grid as `[{name: value}]`, last axis varying fastest."""
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+
+def _run_batch(variants: list, blueprint: dict, session: str) -> dict:
+    """Runs variants in one Blender process; returns `{index: result}` for the variants it reached."""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as jf:
+        json.dump({"cache_dir": mesh_cache_dir(), "blueprint": blueprint, "variants": variants}, jf)
+        jobs_path = jf.name
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as tf:
+        tf.write(f"import sys\nsys.path.insert(0, r'{HELPERS_DIR}')\nimport sweep_runner\nsweep_runner.run(r'{jobs_path}')\n")
+        script_path = tf.name
+
+    results, failure = {}, None
+    try:
+        with get_scheduler().session(session, BATCH), get_scheduler().slot("blender"):
+            stdout, stderr, returncode = BlenderOps.run_script(
+                script_path, timeout_for(STARTUP_TIMEOUT + _setting("SWEEP_VARIANT_TIMEOUT", DEFAULT_VARIANT_TIMEOUT) * len(variants)))
+        if returncode != 0:
+            failure = f"Blender process failed ({returncode}).\nStderr: {stderr[-2000:]}"
+    except subprocess.TimeoutExpired as e:
+        stdout = e.stdout.decode("utf-8", "replace") if isinstance(e.stdout, bytes) else (e.stdout or "")
+        failure = f"Blender process timed out after {e.timeout:.0f}s"
+    finally:
+        for path in (jobs_path, script_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    for line in stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            results[result["index"]] = result
+    if failure:
+        # The first variant without a result is the one that crashed (or hung) the process
+        missing = [v["index"] for v in variants if v["index"] not in results]
+        if missing:
+            results[missing[0]] = {"index": missing[0], "error": failure, "mesh": [], "seconds": None}
+    return results
+
+
+def _run_variants(variants: list, blueprint: dict, session: str) -> dict:
+    """Runs a batch; variants left behind by a crashing one are retried in a fresh process."""
+    results, pending = {}, variants
+    while pending:
+        check_cancelled("sweep batch")
+        batch = _run_batch(pending, blueprint, session)
+        if not batch:
+            return {**results, **{v["index"]: {"index": v["index"], "error": "Blender process produced no result", "mesh": [], "seconds": None}
+                                  for v in pending}}
+        results.update(batch)
+        pending = [v for v in pending if v["index"] not in results]
+    return results
+
+
+def _summary(error) -> str:
+    """One line per error for the table: the exception of a traceback, else the first line."""
+    if not error:
+        return ""
+    lines = error.strip().splitlines()
+    return lines[-1] if lines[0].startswith("Traceback") else lines[0]
+
+
+def _row(index: int, values: dict, output_path: str, result: dict, gate: QualityGate) -> dict:
+    row = {"variant": index, **{name: format_value(value) for name, value in values.items()}}
+    mesh_info = result.get("mesh") or []
+    metrics = BlenderOps.aggregate_metrics(mesh_info)
+    issues = [f"[{info['name']}] {i}" for info in mesh_info for i in info["issues"]]
+    error = result.get("error")
+    if not error:
+        validation = BlenderOps.validate_stl(output_path)
+        if not validation["valid"]:
+            error = "; ".join(validation["issues"])
+    verdict = gate.evaluate(metrics, issues) if metrics else {"pass": False, "score": 0}
+    extent = metrics.get("extent") or [None, None, None]
+    row.update({
+        "success": not error,
+        "gate_pass": bool(verdict["pass"]) and not error,
+        "gate_score": verdict["score"],
+        "triangles": metrics.get("triangles"),
+        "non_manifold_edges": metrics.get("non_manifold_edges"),
+        "degenerate_faces": metrics.get("degenerate_faces"),
+        "self_intersections": metrics.get("self_intersections"),
+        "extent_x": extent[0],
+        "extent_y": extent[1],
+        "extent_z": extent[2],
+        "seconds": round(result["seconds"], 3) if result.get("seconds") is not None else None,
+        "stl_path": output_path if not error else "",
+        "error": _summary(error),
+    })
+    return row
+
+
+def run_sweep(code: str, grid: dict, out_dir: str = None, blueprint: dict = None,
+              workers: int = None, batch_size: int = None, session: str = "sweep") -> list:
+    """
+    Executes every combination of `grid` over the script's parameters and returns
+    one row per variant (parameter values, success, quality gate, mesh metrics,
+    STL path), in grid order. Unknown parameter names raise KeyError.
+    """
+    workers = workers or _setting("SWEEP_WORKERS", DEFAULT_WORKERS)
+    batch_size = batch_size or _setting("SWEEP_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    max_variants = _setting("SWEEP_MAX_VARIANTS", DEFAULT_MAX_VARIANTS)
+    known = {p["name"] for p in extract_parameters(code)}
+    unknown = set(grid) - known
+    if unknown:
+        raise KeyError(f"Unknown parameters: {', '.join(sorted(unknown))} (script parameters: {', '.join(sorted(known)) or 'none'})")
+    combos = expand_grid(grid)
+    if len(combos) > max_variants:
+        raise ValueError(f"The grid has {len(combos)} combinations; the limit is {max_variants} (SWEEP_MAX_VARIANTS)")
+
+    out_dir = out_dir or os.path.join(os.getcwd(), "outputs", f"sweep_{time.strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(out_dir, exist_ok=True)
+    variants = [{
+        "index": i,
+        "script": apply_parameters(code, values),
+        "output_path": os.path.join(out_dir, f"variant_{i:04d}.stl"),
+    } for i, values in enumerate(combos)]
+
+    # Batches no larger than needed to keep every worker busy, so small sweeps still run in parallel
+    size = max(1, min(batch_size, math.ceil(len(variants) / workers)))
+    batches = [variants[i:i + size] for i in range(0, len(variants), size)]
+    logger.info(f"Sweeping {len(variants)} variants in {len(batches)} batches on {min(workers, len(batches))} Blender processes...")
+
+    t0 = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Each batch runs in a copy of this context, so cancelling the caller's run stops every batch
+        futures = [pool.submit(contextvars.copy_context().run, _run_variants, batch, blueprint or {}, session)
+                   for batch in batches]
+        for future in futures:
+            results.update(future.result())
+    BlenderOps.prune_mesh_cache()
+
+    gate = QualityGate()
+    rows = [_row(v["index"], combos[v["index"]], v["output_path"], results[v["index"]], gate) for v in variants]
+    elapsed = time.perf_counter() - t0
+    ok = sum(1 for r in rows if r["success"])
+    logger.info(f"Sweep finished: {ok}/{len(rows)} variants built in {elapsed:.1f}s "
+                f"({60 * len(rows) / max(elapsed, 1e-9):.0f} variants/min).")
+    return rows
+
+
+def write_csv(rows: list, path: str) -> str:
+    """Writes sweep rows as CSV (columns in first-seen order)."""
+    columns = []
+    for row in rows:
+        columns += [c for c in row if c not in columns]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    import argparse
+    from src.config import load_env
+    from src.config.logger import setup_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", help="validated BPY script whose top-level parameters are swept")
+    parser.add_argument("--grid", action="append", required=True,
+                        help="one axis: name=v1,v2,... or name=start:stop:step (repeatable)")
+    parser.add_argument("--blueprint", help="blueprint JSON injected as `blueprint` (for fg.build_blueprint scripts)")
+    parser.add_argument("--out", help="directory for the variant STLs (default outputs/sweep_<timestamp>)")
+    parser.add_argument("--csv", help="results table path (default <out>/results.csv)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    load_env()
+    setup_logging()
+    with open(args.script, encoding="utf-8") as f:
+        code = f.read()
+    blueprint = None
+    if args.blueprint:
+        with open(args.blueprint, encoding="utf-8") as f:
+            blueprint = json.load(f)
+    grid = dict(parse_grid_spec(spec) for spec in args.grid)
+    out_dir = args.out or os.path.join(os.getcwd(), "outputs", f"sweep_{time.strftime('%Y%m%d_%H%M%S')}")
+    rows = run_sweep(code, grid, out_dir, blueprint, args.workers, args.batch_size)
+    path = write_csv(rows, args.csv or os.path.join(out_dir, "results.csv"))
+    print(f"{sum(1 for r in rows if r['success'])}/{len(rows)} variants built; results in {path}")
+
+
+if __name__ == "__main__":
+    main()
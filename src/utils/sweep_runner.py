@@ -0,0 +1,64 @@
+"""
+Design-space sweep runner executed INSIDE Blender (see sweep.run_sweep).
+
+One process executes a whole batch of parameter variants of the same script:
+`bpy`, the helper modules and the fast_geometry subtree cache are loaded once
+and shared by every variant, instead of paying a Blender start per variant.
+The batch is described by a JSON file; each variant is reported on its own
+`---SWEEP_RESULT---{json}` line as soon as it finishes, so a crash loses only
+the variant that caused it. Must only depend on `bpy`, `numpy` (bundled with
+Blender) and the standard library.
+"""
+import json
+import math
+import sys
+import time
+import traceback
+
+import bpy
+import fast_geometry as fg
+import mesh_analysis
+
+RESULT_MARKER = "---SWEEP_RESULT---"
+
+
+def run_variant(variant: dict, blueprint: dict) -> dict:
+    """Builds, exports and analyzes one variant in a clean scene."""
+    t0 = time.perf_counter()
+    try:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+    except Exception:
+        pass
+    namespace = {
+        "__name__": "__main__",
+        "bpy": bpy,
+        "math": math,
+        "json": json,
+        "fg": fg,
+        "output_path": variant["output_path"],
+        "blueprint": blueprint,
+    }
+    error, mesh = None, []
+    try:
+        exec(compile(variant["script"], f"<variant {variant['index']}>", "exec"), namespace)
+        mesh = mesh_analysis.analyze_scene()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"SystemExit: {e.code}"
+    except BaseException:
+        error = traceback.format_exc()
+    return {"index": variant["index"], "error": error, "mesh": mesh, "seconds": time.perf_counter() - t0}
+
+
+def run(jobs_path: str):
+    with open(jobs_path, encoding="utf-8") as f:
+        jobs = json.load(f)
+    fg.CACHE_DIR = jobs.get("cache_dir")
+    blueprint = jobs.get("blueprint") or {}
+    for variant in jobs["variants"]:
+        result = run_variant(variant, blueprint)
+        sys.stdout.flush()
+        print(RESULT_MARKER + json.dumps(result), flush=True)
+    print("---MESH_CACHE_START---")
+    print(json.dumps(fg.CACHE_STATS))
+    print("---MESH_CACHE_END---", flush=True)
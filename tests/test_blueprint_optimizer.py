@@ -0,0 +1,74 @@
+import math
+import numpy as np
+from src.utils.blueprint import optimize_blueprint
+from src.utils.sdf_preview import mesh_blueprint
+
+
+def _cube(location, size, op="UNION", rotation=(0, 0, 0)):
+    return {"primitive_type": "cube", "size": list(size), "location": list(location),
+            "rotation": list(rotation), "boolean_op": op}
+
+
+def _cylinder(location, radius, depth, op="UNION", rotation=(0, 0, 0)):
+    return {"primitive_type": "cylinder", "dimensions": {"radius": radius, "depth": depth},
+            "location": list(location), "rotation": list(rotation), "boolean_op": op}
+
+
+def _volume(blueprint, resolution=40):
+    """Enclosed volume of the blueprint's SDF preview mesh (divergence theorem)."""
+    triangles, _ = mesh_blueprint(blueprint, resolution)
+    return abs(float(np.einsum("ij,ij->i", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum()) / 6)
+
+
+def _assert_same_volume(blueprint):
+    optimized, report = optimize_blueprint(blueprint)
+    assert math.isclose(_volume(optimized), _volume(blueprint), rel_tol=0.02)
+    return optimized, report
+
+
+def test_stacked_cubes_are_merged():
+    blueprint = {"primitives": [_cube((0, 0, 0.5), (1, 1, 1)), _cube((0, 0, 1.5), (1, 1, 1))]}
+    optimized, report = _assert_same_volume(blueprint)
+    assert report["merged"] == 1
+    assert len(optimized["primitives"]) == 1
+    assert optimized["primitives"][0]["size"] == [1.0, 1.0, 2.0]
+
+
+def test_coaxial_cylinders_are_merged():
+    blueprint = {"primitives": [_cylinder((0, 0, 0), 0.5, 1), _cylinder((0, 0, 1), 0.5, 1)]}
+    optimized, report = _assert_same_volume(blueprint)
+    assert report["primitives_after"] == 1
+
+
+def test_noops_and_contained_primitives_are_removed():
+    blueprint = {"primitives": [
+        _cube((0, 0, 0), (2, 2, 2)),
+        _cube((0, 0, 0), (0.5, 0.5, 0.5)),           # hidden inside the first cube
+        _cube((5, 5, 5), (0, 1, 1)),                 # zero size
+        _cube((9, 9, 9), (1, 1, 1), "DIFFERENCE"),   # cuts nothing
+        _cube((1, 0, 0), (1, 1, 1), "DIFFERENCE"),
+    ]}
+    optimized, report = _assert_same_volume(blueprint)
+    assert report["removed_contained"] == 1
+    assert report["removed_noops"] == 2
+    assert [n["boolean_op"] for n in optimized["primitives"]] == ["UNION", "DIFFERENCE"]
+
+
+def test_unions_move_ahead_of_unrelated_cutters():
+    blueprint = {"primitives": [
+        _cube((0, 0, 0), (1, 1, 1)),
+        _cube((0.5, 0, 0), (0.4, 0.4, 0.4), "DIFFERENCE"),
+        _cube((3, 0, 0), (1, 1, 1)),
+    ]}
+    optimized, report = _assert_same_volume(blueprint)
+    assert report["boolean_steps_after"] < report["boolean_steps_before"]
+    assert [n["boolean_op"] for n in optimized["primitives"]] == ["UNION", "UNION", "DIFFERENCE"]
+
+
+def test_rotations_are_normalized_to_radians():
+    blueprint = {"primitives": [_cube((0, 0, 0), (1, 2, 3), rotation=(0, 0, 90))]}
+    optimized, _ = _assert_same_volume(blueprint)
+    node = optimized["primitives"][0]
+    assert optimized["rotation_unit"] == "radians"
+    assert node["rotation"] == [0.0, 0.0, 0.0]
+    assert [round(v, 6) for v in node["size"]] == [2.0, 1.0, 3.0]
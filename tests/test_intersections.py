@@ -0,0 +1,56 @@
+import numpy as np
+from src.utils.intersections import find_self_intersections
+
+
+def _box(center, size):
+    """Closed, consistently wound box mesh: (vertices, triangles)."""
+    corners = np.array([(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+    vertices = np.asarray(center) + corners * np.asarray(size)
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    triangles = [t for a, b, c, d in quads for t in ((a, b, c), (a, c, d))]
+    return vertices, np.array(triangles)
+
+
+def _combine(*meshes):
+    vertices, triangles, offset = [], [], 0
+    for v, t in meshes:
+        vertices.append(v)
+        triangles.append(t + offset)
+        offset += len(v)
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+
+def test_crossing_triangles_intersect():
+    vertices = [(0, 0, 0), (2, 0, 0), (0, 2, 0), (0.5, 0.5, -1), (0.5, 0.5, 1), (1.5, 1.5, 0)]
+    result = find_self_intersections(vertices, [(0, 1, 2), (3, 4, 5)])
+    assert result["count"] == 1
+    assert sorted(result["pairs"][0].tolist()) == [0, 1]
+    assert len(result["regions"]) == 1
+
+
+def test_closed_box_has_no_intersections():
+    vertices, triangles = _box((0, 0, 0), (1, 2, 3))
+    assert find_self_intersections(vertices, triangles)["count"] == 0
+
+
+def test_separate_boxes_do_not_intersect():
+    vertices, triangles = _combine(_box((0, 0, 0), (1, 1, 1)), _box((3, 0, 0), (1, 1, 1)))
+    assert find_self_intersections(vertices, triangles)["count"] == 0
+
+
+def test_overlapping_boxes_intersect():
+    vertices, triangles = _combine(_box((0, 0, 0), (1, 1, 1)), _box((0.5, 0.3, 0.2), (1, 1, 1)))
+    result = find_self_intersections(vertices, triangles)
+    assert result["count"] > 0
+    # Every reported pair has one triangle from each box
+    assert all((a < 12) != (b < 12) for a, b in result["pairs"].tolist())
+
+
+def test_touching_boxes_are_not_reported():
+    vertices, triangles = _combine(_box((0, 0, 0), (1, 1, 1)), _box((1, 0, 0), (1, 1, 1)))
+    assert find_self_intersections(vertices, triangles)["count"] == 0
+
+
+def test_degenerate_input():
+    assert find_self_intersections(np.zeros((0, 3)), np.zeros((0, 3), dtype=int))["count"] == 0
+    assert find_self_intersections([(0, 0, 0), (1, 0, 0), (2, 0, 0)], [(0, 1, 2), (0, 1, 2)])["count"] == 0
@@ -0,0 +1,78 @@
+import pytest
+from src.utils.parametric import (apply_parameters, extract_parameters, hoist_parameters,
+                                  parse_numeric_feedback, parse_value)
+
+SCRIPT = """import bpy
+seat_height = 0.45  # metres
+leg_size = (0.05, 0.05, 0.4)
+leg_count = 4
+angle_deg = 30
+for i in range(leg_count):
+    offset = i * 0.1
+fg.export_stl(output_path)
+"""
+
+
+def _params(code=SCRIPT):
+    return extract_parameters(code)
+
+
+def test_extract_parameters():
+    params = {p["name"]: p["value"] for p in _params()}
+    # `offset` is rebound in a loop, so it is not an editable parameter
+    assert params == {"seat_height": 0.45, "leg_size": (0.05, 0.05, 0.4), "leg_count": 4, "angle_deg": 30}
+
+
+def test_apply_round_trip_keeps_formatting():
+    code = apply_parameters(SCRIPT, {"seat_height": 0.5, "leg_size": (0.1, 0.1, 0.3)})
+    assert "seat_height = 0.5  # metres" in code
+    params = {p["name"]: p["value"] for p in _params(code)}
+    assert params["seat_height"] == 0.5 and params["leg_size"] == (0.1, 0.1, 0.3)
+    assert apply_parameters(code, {"seat_height": 0.45, "leg_size": (0.05, 0.05, 0.4)}) == SCRIPT
+
+
+def test_apply_unknown_parameter():
+    with pytest.raises(KeyError):
+        apply_parameters(SCRIPT, {"offset": 1.0})
+
+
+def test_parse_value():
+    assert parse_value("0.5") == 0.5
+    assert parse_value("[1, 2, 3]") == (1, 2, 3)
+    for text in ("abc", "True", "()"):
+        with pytest.raises(ValueError):
+            parse_value(text)
+
+
+def test_hoist_parameters():
+    assignments, code = hoist_parameters("width = 2\nfg.cube('a', size=(width, 1, 1))\n", "part_1")
+    assert assignments == "part_1_width = 2\n"
+    assert code.startswith("width = part_1_width\n")
+
+
+@pytest.mark.parametrize("feedback, expected", [
+    ("make it 20% taller", {"seat_height": 0.54, "leg_size": (0.05, 0.05, 0.48)}),
+    ("scale it down by 2", {"seat_height": 0.225, "leg_size": (0.025, 0.025, 0.2)}),
+    ("scale up by a factor of 2", {"seat_height": 0.9, "leg_size": (0.1, 0.1, 0.8)}),
+    ("set seat height to 0.5", {"seat_height": 0.5}),
+    ("set leg count to 3", {"leg_count": 3}),
+    ("increase the seat height by 10%", {"seat_height": 0.495}),
+])
+def test_numeric_feedback(feedback, expected):
+    assert parse_numeric_feedback(feedback, _params()) == expected
+
+
+@pytest.mark.parametrize("feedback", [
+    "make it red",
+    "make it 20% taller and add a backrest",
+    "set seat height to -1",
+    "reduce the seat height by 1",
+    "set the size to 2",  # ambiguous target
+])
+def test_feedback_needing_an_agent(feedback):
+    assert parse_numeric_feedback(feedback, _params()) is None
+
+
+def test_relative_changes_skip_counts_and_angles():
+    values = parse_numeric_feedback("make it twice as big", _params())
+    assert "leg_count" not in values and "angle_deg" not in values
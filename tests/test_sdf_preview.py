@@ -0,0 +1,52 @@
+import math
+import os
+import numpy as np
+from src.utils.sdf_preview import mesh_blueprint, preview_blueprint
+
+
+def _edge_counts(triangles):
+    """How many triangles share each undirected edge (vertices matched by position)."""
+    _, ids = np.unique(np.round(triangles.reshape(-1, 3), 9), axis=0, return_inverse=True)
+    ids = ids.reshape(-1, 3)
+    edges = np.sort(np.concatenate([ids[:, [0, 1]], ids[:, [1, 2]], ids[:, [2, 0]]]), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    return counts
+
+
+def _volume(triangles):
+    return float(np.einsum("ij,ij->i", triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum()) / 6
+
+
+def test_sphere_mesh_is_closed_and_outward():
+    blueprint = {"primitives": [{"primitive_type": "sphere", "dimensions": {"radius": 1.0}, "location": [0, 0, 0]}]}
+    triangles, cell = mesh_blueprint(blueprint, resolution=24)
+    assert len(triangles) and cell > 0
+    assert (_edge_counts(triangles) == 2).all()
+    # Positive signed volume means consistent outward winding
+    assert math.isclose(_volume(triangles), 4 / 3 * math.pi, rel_tol=0.05)
+
+
+def test_difference_mesh_is_closed():
+    blueprint = {"primitives": [
+        {"primitive_type": "cube", "size": [2, 2, 1], "location": [0, 0, 0]},
+        {"primitive_type": "cylinder", "dimensions": {"radius": 0.4, "depth": 2}, "location": [0, 0, 0],
+         "boolean_op": "DIFFERENCE"},
+    ]}
+    triangles, _ = mesh_blueprint(blueprint, resolution=32)
+    assert (_edge_counts(triangles) == 2).all()
+    assert math.isclose(_volume(triangles), 4 - math.pi * 0.4 ** 2, rel_tol=0.05)
+
+
+def test_empty_blueprint_has_no_preview(tmp_path):
+    assert len(mesh_blueprint({"primitives": []})[0]) == 0
+    assert preview_blueprint({"primitives": []}, out_dir=str(tmp_path)) is None
+
+
+def test_preview_writes_binary_stl(tmp_path):
+    blueprint = {"primitives": [{"primitive_type": "cube", "size": [1, 1, 1], "location": [0, 0, 0]}]}
+    path = preview_blueprint(blueprint, resolution=16, out_dir=str(tmp_path))
+    with open(path, "rb") as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    assert os.path.getsize(path) == 84 + 50 * count
+    assert preview_blueprint(blueprint, resolution=16, out_dir=str(tmp_path)) == path
@@ -0,0 +1,44 @@
+import csv
+import pytest
+from src.utils.sweep import expand_grid, parse_grid, parse_grid_spec, run_sweep, write_csv
+
+
+def test_parse_value_list():
+    assert parse_grid_spec("seat_height = 0.4, 0.45") == ("seat_height", [0.4, 0.45])
+    assert parse_grid_spec("leg_size=(1, 1, 2), (1, 1, 3)") == ("leg_size", [(1, 1, 2), (1, 1, 3)])
+
+
+def test_parse_range_is_inclusive():
+    assert parse_grid_spec("count=3:5:1") == ("count", [3, 4, 5])
+    name, values = parse_grid_spec("wall=1:2:0.25")
+    assert values == [1.0, 1.25, 1.5, 1.75, 2.0]
+
+
+@pytest.mark.parametrize("spec", ["wall", "wall=", "wall=1:2", "wall=1:2:0", "wall=a, b"])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        parse_grid_spec(spec)
+
+
+def test_expand_grid_order():
+    grid = parse_grid("a = 1, 2; b = 10, 20, 30")
+    combos = expand_grid(grid)
+    assert len(combos) == 6
+    assert combos[:2] == [{"a": 1, "b": 10}, {"a": 1, "b": 20}]
+
+
+def test_run_sweep_rejects_bad_grids(monkeypatch):
+    code = "width = 1.0\nheight = 2.0\n"
+    with pytest.raises(KeyError):
+        run_sweep(code, {"depth": [1, 2]})
+    monkeypatch.setenv("SWEEP_MAX_VARIANTS", "3")
+    with pytest.raises(ValueError):
+        run_sweep(code, {"width": [1, 2], "height": [1, 2]})
+
+
+def test_write_csv_unions_columns(tmp_path):
+    path = write_csv([{"variant": 0, "success": True}, {"variant": 1, "error": "boom"}], str(tmp_path / "r.csv"))
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["variant", "success", "error"]
+    assert rows[1]["error"] == "boom"